@@ -0,0 +1,91 @@
+"""
+Synthetic chemical reaction networks for the benchmark suite.
+
+Every generator returns a CRN document (str) in the crnsimulator input
+format, including initial concentrations, such that the whole pipeline
+(starting with parsing) can be benchmarked.
+
+Test using tests/test_benchmarks.py.
+"""
+
+import numpy as np
+
+def random_mass_action(n, reactions_per_species = 2, window = 50, seed = 0):
+    """ A random mass-action network with n species.
+
+    Reactions are uni- or bimolecular and never produce more molecules
+    than they consume, such that the trajectories stay bounded. Every
+    species is a reactant of at least one reaction. The partners of a
+    species are drawn from its neighborhood (window) in a ring of species.
+    Without the window, the sparse LU decompositions of implicit solvers
+    fill in almost completely, which dominates the integration of large
+    random networks.
+
+    Args:
+        n (int): The number of species.
+        reactions_per_species (int, optional): Defaults to 2.
+        window (int, optional): The maximum distance of reaction partners.
+            None draws partners from all species. Defaults to 50.
+        seed (int, optional): The seed of the random number generator.
+
+    Returns:
+        The CRN document (str).
+    """
+    rng = np.random.default_rng(seed)
+    w = n if window is None else min(window, n)
+    lines = [f'S{i} @i {x:.3g}' for i, x in enumerate(rng.uniform(0.1, 1, size = n))]
+    for j in range(reactions_per_species * n):
+        nr = rng.integers(1, 3)
+        reactants = (j + rng.integers(0, w, size = nr)) % n
+        reactants[0] = j % n
+        products = (j + rng.integers(0, w, size = rng.integers(0, nr + 1))) % n
+        k = 10 ** rng.uniform(-2, 1)
+        lines.append(' + '.join(f'S{i}' for i in reactants) + ' -> ' +
+                     ' + '.join(f'S{i}' for i in products) + f' [k = {k:.3g}]')
+    return '\n'.join(lines) + '\n'
+
+def cascade(n):
+    """ A signaling cascade with n species (n // 2 stages).
+
+    The active form Z{i} of every stage catalyzes the activation of the next
+    stage, Z{i-1} + Y{i} -> Z{i-1} + Z{i}, and decays back, Z{i} -> Y{i}.
+    The first stage is activated by a constant input signal.
+
+    Args:
+        n (int): The number of species (at least 2).
+
+    Returns:
+        The CRN document (str).
+    """
+    m = max(n // 2, 1)
+    lines = ['Z0 @c 1', 'Y1 @i 1']
+    for i in range(1, m):
+        lines.append(f'Y{i + 1} @i 1')
+        lines.append(f'Z{i - 1} + Y{i} -> Z{i - 1} + Z{i} [k = 1]')
+        lines.append(f'Z{i} -> Y{i} [k = 0.5]')
+    lines.append(f'Z{m - 1} + Y{m} -> Z{m - 1} + Z{m} [k = 1]')
+    lines.append(f'Z{m} -> Y{m} [k = 0.5]')
+    return '\n'.join(lines) + '\n'
+
+def oscillator(n):
+    """ A ring of n species, generalizing the rock-paper-scissors oscillator
+    (tests/crns/oscillator.crn) with reactions S{i} + S{i+1} -> 2 S{i+1}.
+
+    Args:
+        n (int): The number of species (at least 3).
+
+    Returns:
+        The CRN document (str).
+    """
+    rates = (0.2, 0.4, 0.7)
+    lines = [f'S{i} @i {10 ** -(i % 3 + 1):g}' for i in range(n)]
+    for i in range(n):
+        j = (i + 1) % n
+        lines.append(f'S{i} + S{j} -> 2 S{j} [k = {rates[i % 3]}]')
+    return '\n'.join(lines) + '\n'
+
+GENERATORS = {
+    'random': random_mass_action,
+    'cascade': cascade,
+    'oscillator': oscillator,
+}
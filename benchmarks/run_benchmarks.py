@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmarks for every stage of the crnsimulator pipeline.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 10 100 1000 -o results.json
+    python benchmarks/run_benchmarks.py --sizes 10 100 1000 --compare results.json
+
+Every stage is timed (wall-clock and CPU time, best of --repeat runs) and,
+in a separate run, its peak memory is recorded (see peak_memory()):
+
+    parse           parse_crn_string()
+    reaction_graph  ReactionGraph() construction
+    ode_system      ReactionGraph.ode_system() without Jacobian
+    ode_jacobian    ReactionGraph.ode_system() with Jacobian (fresh graph)
+    write_odelib    writeODElib() of the symbolic system
+    import          get_integrator() import of the generated library
+    mass_action     ReactionGraph.mass_action_system() (numpy backend)
+    integrate       simulate() of the generated (or numpy backend) library
+    output          write_nxy() of the time course
+
+The symbolic stages are skipped for networks larger than --sympy-limit
+species, where the numpy backend is integrated instead. The results are
+written as JSON, such that they can be compared between releases.
+
+In addition, the startup time of fresh Python processes is measured for
+importing crnsimulator, the crnsimulator --help message and a generated
+ODE library that prints a short time course (--nxy). Startup times that
+exceed STARTUP_TARGETS are reported as regressions.
+
+Test using tests/test_benchmarks.py.
+"""
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import numpy as np
+
+from crnsimulator import __version__
+from crnsimulator import parse_crn_string, ReactionGraph, writeODElib, get_integrator
+from crnsimulator.simulator import irreversible_reactions, natural_sort
+from crnsimulator.output import write_nxy
+from crnsimulator.profiling import memory_status, reset_peak_memory
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generators import GENERATORS
+
+STAGES = ('parse', 'reaction_graph', 'ode_system', 'ode_jacobian', 'write_odelib',
+          'import', 'mass_action', 'integrate', 'output')
+SYMBOLIC = ('ode_system', 'ode_jacobian', 'write_odelib', 'import')
+
+# Startup times (seconds, including the Python interpreter).
+STARTUP_TARGETS = {'python': None, 'import': 0.25, 'cli_help': 1.0, 'odelib_nxy': 1.0}
+
+def pipeline(document, workdir, sympy = True, method = 'BDF', t8 = 100, points = 100):
+    """ Yields (stage, function) pairs, every function runs one stage.
+
+    The stages are executed in order, each one uses the results of the
+    previous stages (which are stored in a shared state dictionary). The
+    setup of a stage (e.g. a fresh ReactionGraph) is not part of its
+    function, and hence not measured.
+    """
+    state = dict()
+
+    def parse():
+        state['crn'], state['species'] = parse_crn_string(document)
+    yield 'parse', parse
+
+    def reaction_graph():
+        state['RG'] = ReactionGraph(irreversible_reactions(state['crn']))
+    yield 'reaction_graph', reaction_graph
+
+    species = state['species']
+    V = natural_sort(species)
+    C = [species[s][1] for s in V]
+    const = [species[s][0][0] == 'c' for s in V]
+    const = const if any(const) else None
+    state['p0'] = C
+
+    if sympy:
+        def ode_system():
+            state['ode'] = state['RG'].ode_system(V, const)
+        yield 'ode_system', ode_system
+
+        RG = ReactionGraph(irreversible_reactions(state['crn']))
+        def ode_jacobian():
+            RG.ode_system(V, const, jacobian = True)
+        yield 'ode_jacobian', ode_jacobian
+
+        filename = os.path.join(workdir, 'odesystem.py')
+        def write_odelib():
+            _, M, _, R = state['ode']
+            writeODElib(V, M, const = const, rdict = R, concvect = C, filename = filename,
+                        reactions = state['RG'].indexed_reactions(V))
+        yield 'write_odelib', write_odelib
+
+        def import_odelib():
+            state['simulate'] = get_integrator(filename, function = 'simulate')
+        yield 'import', import_odelib
+
+    def mass_action():
+        state['system'] = state['RG'].mass_action_system(V, const)
+    yield 'mass_action', mass_action
+
+    if 'simulate' not in state:
+        state['simulate'] = state['RG'].compile(V, concvect = C, const = const,
+                                                backend = 'numpy').simulate
+    times = np.linspace(0, t8, points)
+    def integrate():
+        state['ny'] = state['simulate'](state['p0'], times, method = method)
+    yield 'integrate', integrate
+
+    def output():
+        write_nxy(io.StringIO(), times, state['ny'], V)
+    yield 'output', output
+
+def peak_memory(func):
+    """ Returns the peak memory (bytes) allocated while running func().
+
+    On Linux, the peak resident set size of the process is reset before
+    func() is called, and the peak above the resident memory at that time
+    is reported. Otherwise, the peak of Python allocations is traced with
+    tracemalloc, which can be orders of magnitude slower for the large
+    functions of generated ODE libraries.
+    """
+    rss = memory_status('VmRSS') if reset_peak_memory() else None
+    if rss is None:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+    func()
+    return max(memory_status('VmHWM') - rss, 0)
+
+def run_pipeline(document, workdir, memory = False, **kwargs):
+    """ Run all stages once, returns a dictionary of measurements per stage. """
+    results = dict()
+    for stage, func in pipeline(document, workdir, **kwargs):
+        if memory:
+            results[stage] = {'peak_memory': peak_memory(func)}
+        else:
+            w0, c0 = time.perf_counter(), time.process_time()
+            func()
+            results[stage] = {'wall': time.perf_counter() - w0,
+                              'cpu': time.process_time() - c0}
+    return results
+
+def benchmark(generator, size, repeat = 3, memory = True, sympy_limit = 1000, **kwargs):
+    """ Benchmark all stages of the pipeline for one synthetic network.
+
+    Args:
+        generator (str): The name of the generator (see generators.GENERATORS).
+        size (int): The (approximate) number of species.
+        repeat (int, optional): The best wall-clock time of repeat runs is reported.
+        memory (bool, optional): Measure the peak memory of every stage.
+        sympy_limit (int, optional): Skip the symbolic stages for larger networks.
+        **kwargs: Integration parameters of pipeline().
+
+    Returns:
+        A list of dictionaries, one per stage.
+    """
+    document = GENERATORS[generator](size)
+    crn, species = parse_crn_string(document)
+    sympy = len(species) <= sympy_limit
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # The memory is measured first, before the timing runs leave memory
+        # in the allocator pools that is reused without increasing the RSS.
+        peaks = run_pipeline(document, workdir, memory = True, sympy = sympy,
+                             **kwargs) if memory else dict()
+        for _ in range(repeat):
+            runs.append(run_pipeline(document, workdir, sympy = sympy, **kwargs))
+
+    results = []
+    for stage in STAGES:
+        record = {'generator': generator, 'size': size, 'species': len(species),
+                  'reactions': sum(len(k) for _, _, k in crn), 'stage': stage}
+        if stage not in runs[0]:
+            record['skipped'] = f'more than {sympy_limit} species'
+        else:
+            best = min(runs, key = lambda r: r[stage]['wall'])[stage]
+            record.update(best)
+            record['peak_memory'] = peaks[stage]['peak_memory'] if memory else None
+        results.append(record)
+    return results
+
+def startup(repeat = 5):
+    """ Benchmark the startup time of fresh Python processes.
+
+    Args:
+        repeat (int, optional): The best wall-clock time of repeat runs is reported.
+
+    Returns:
+        A list of dictionaries, one per command (see STARTUP_TARGETS).
+    """
+    import crnsimulator
+    root = os.path.dirname(os.path.dirname(os.path.abspath(crnsimulator.__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (root, env.get('PYTHONPATH')) if p)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        crn, species = parse_crn_string(GENERATORS['oscillator'](3))
+        V = natural_sort(species)
+        RG = ReactionGraph(irreversible_reactions(crn))
+        filename, _ = RG.write_ODE_lib(V, [species[s][1] for s in V],
+                                       filename = os.path.join(workdir, 'odesystem.py'))
+        commands = {'python': ['-c', 'pass'],
+                    'import': ['-c', 'import crnsimulator'],
+                    'cli_help': ['-m', 'crnsimulator.simulator', '--help'],
+                    'odelib_nxy': [filename, '--nxy', '--t-lin', '10']}
+        for stage, command in commands.items():
+            times = []
+            for _ in range(repeat):
+                w0 = time.perf_counter()
+                subprocess.run([sys.executable] + command, env = env, check = True,
+                               stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+                times.append(time.perf_counter() - w0)
+            results.append({'generator': 'startup', 'size': None, 'stage': stage,
+                            'wall': min(times), 'target': STARTUP_TARGETS[stage]})
+    return results
+
+def compare(results, reference, threshold = 1.25):
+    """ Compare wall-clock times with a reference (e.g. a previous release).
+
+    Returns:
+        A list of (generator, size, stage, old, new) for every stage that
+        got slower than threshold * old.
+    """
+    def key(r):
+        return (r['generator'], r['size'], r['stage'])
+    old = {key(r): r for r in reference['results'] if 'wall' in r}
+    slower = []
+    for r in results['results']:
+        if 'wall' in r and key(r) in old and r['wall'] > threshold * old[key(r)]['wall']:
+            slower.append(key(r) + (old[key(r)]['wall'], r['wall']))
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--generators", nargs='+', default=sorted(GENERATORS),
+            choices=sorted(GENERATORS), help="The synthetic networks.")
+    parser.add_argument("--sizes", nargs='+', type=int, default=[10, 100, 1000, 10000, 100000],
+            metavar='<int>', help="The number of species of the synthetic networks.")
+    parser.add_argument("--repeat", type=int, default=3, metavar='<int>',
+            help="Report the best time of --repeat runs.")
+    parser.add_argument("--no-memory", action='store_true',
+            help="Do not measure the peak memory of every stage.")
+    parser.add_argument("--sympy-limit", type=int, default=1000, metavar='<int>',
+            help="Skip the symbolic stages for networks with more species.")
+    parser.add_argument("--no-startup", action='store_true',
+            help="Do not measure the startup times.")
+    parser.add_argument("--method", default='BDF', metavar='<str>',
+            help="The integration method, see simulate() of the ODE library.")
+    parser.add_argument("--t8", type=float, default=100, metavar='<flt>',
+            help="End point of simulation time.")
+    parser.add_argument("--points", type=int, default=100, metavar='<int>',
+            help="The number of time points of the output.")
+    parser.add_argument("-o", "--output", default=None, metavar='<str>',
+            help="Write the results to a JSON file.")
+    parser.add_argument("--compare", default=None, metavar='<str>',
+            help="Report stages that are slower than in a previous JSON file.")
+    parser.add_argument("--threshold", type=float, default=1.25, metavar='<flt>',
+            help="Relative slowdown that is reported by --compare.")
+    args = parser.parse_args()
+
+    results = {'crnsimulator': __version__,
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'results': []}
+    print(f"{'generator':>10s} {'species':>8s} {'stage':>15s} {'wall [s]':>10s} "
+          f"{'cpu [s]':>10s} {'peak [MB]':>10s}", file = sys.stderr)
+    for generator in args.generators:
+        for size in args.sizes:
+            for r in benchmark(generator, size, repeat = args.repeat,
+                               memory = not args.no_memory, sympy_limit = args.sympy_limit,
+                               method = args.method, t8 = args.t8, points = args.points):
+                results['results'].append(r)
+                if 'skipped' in r:
+                    continue
+                peak = r['peak_memory'] / 2**20 if r['peak_memory'] is not None else np.nan
+                print(f"{generator:>10s} {r['species']:>8d} {r['stage']:>15s} "
+                      f"{r['wall']:>10.4f} {r['cpu']:>10.4f} {peak:>10.2f}", file = sys.stderr)
+
+    slow = []
+    if not args.no_startup:
+        for r in startup():
+            results['results'].append(r)
+            target = f"(target {r['target']:.2f}s)" if r['target'] else ''
+            print(f"{'startup':>10s} {'':>8s} {r['stage']:>15s} {r['wall']:>10.4f} {target}",
+                  file = sys.stderr)
+            if r['target'] and r['wall'] > r['target']:
+                slow.append(r)
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent = 1)
+    else:
+        json.dump(results, sys.stdout, indent = 1)
+
+    for r in slow:
+        print(f"Regression: startup {r['stage']}: {r['wall']:.4f}s " + \
+              f"exceeds the target of {r['target']:.4f}s", file = sys.stderr)
+
+    slower = []
+    if args.compare:
+        with open(args.compare) as fh:
+            slower = compare(results, json.load(fh), threshold = args.threshold)
+        for (generator, size, stage, old, new) in slower:
+            print(f'Regression: {generator} ({size}) {stage}: {old:.4f}s -> {new:.4f}s',
+                  file = sys.stderr)
+    if slow or slower:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
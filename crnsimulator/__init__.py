@@ -1,5 +1,9 @@
 """
 Simulate formal chemical reaction networks using ODEs (library interface).
+
+The submodules are imported on first use of their attributes, such that
+importing the package (e.g. from a generated ODE library) does not load
+sympy, pyparsing or scipy.integrate.
 """
 
 __version__ = "v0.9"
@@ -7,6 +11,27 @@ __version__ = "v0.9"
 import logging
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
-from crnsimulator.crn_parser import parse_crn_string, parse_crn_file
-from crnsimulator.reactiongraph import ReactionGraph
-from crnsimulator.solver import writeODElib, get_integrator
+import importlib
+
+_lazy = {
+    'parse_crn_string': 'crnsimulator.crn_parser',
+    'parse_crn_file': 'crnsimulator.crn_parser',
+    'iter_crn': 'crnsimulator.crn_parser',
+    'ReactionGraph': 'crnsimulator.reactiongraph',
+    'MassActionSystem': 'crnsimulator.massaction',
+    'writeODElib': 'crnsimulator.solver',
+    'get_integrator': 'crnsimulator.solver',
+    'compileODElib': 'crnsimulator.solver',
+}
+
+__all__ = list(_lazy)
+
+def __getattr__(name):
+    if name in _lazy:
+        value = getattr(importlib.import_module(_lazy[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,129 @@
+"""
+A content-addressed cache for autogenerated ODE libraries.
+
+Test using tests/test_cache.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+import re
+import json
+import hashlib
+import importlib.util
+
+import crnsimulator.odelib_template
+
+DIGEST = re.compile(r"^crn_digest = '([0-9a-f]+)'$", re.MULTILINE)
+
+def default_cache_dir():
+    """ The default cache directory: $XDG_CACHE_HOME/crnsimulator. """
+    root = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(root, 'crnsimulator')
+
+def crn_digest(crn, svars, concvect = None, const = None, jacobian = False,
+               template = None, **kwargs):
+    """ A canonical hash of everything that determines an ODE library.
+
+    Args:
+        crn (list): A list of irreversible reactions [reactants, products, rate].
+        svars (list[str]): The sorted species vector.
+        concvect (list[float], optional): The default concentrations.
+        const (list[bool], optional): The constant species flags.
+        jacobian (bool, optional): Whether the jacobian is written.
+        template (str, optional): The template file. Defaults to the
+            crnsimulator.odelib_template file.
+        **kwargs: Any further (json serializable) settings that affect the library.
+
+    Returns:
+        [str]: A hexadecimal sha256 digest.
+    """
+    if not template:
+        template = crnsimulator.odelib_template.__file__
+    with open(template, 'rb') as tfile:
+        tdigest = hashlib.sha256(tfile.read()).hexdigest()
+
+    canon = {'crn': [[sorted(r), sorted(p), str(k)] for [r, p, k] in crn],
+             'svars': list(map(str, svars)),
+             'concvect': [float(c) if c is not None else None for c in concvect] \
+                     if concvect else None,
+             'const': [bool(c) for c in const] if const and any(const) else None,
+             'jacobian': bool(jacobian),
+             'template': tdigest,
+             'crnsimulator': crnsimulator.__version__}
+    canon.update(kwargs)
+    data = json.dumps(canon, sort_keys = True, separators = (',', ':'))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+def read_digest(filename):
+    """ Returns the digest stored in an ODE library file, or None. """
+    with open(filename, 'r') as lfile:
+        match = DIGEST.search(lfile.read())
+    return match.group(1) if match else None
+
+class ODELibCache(object):
+    """ A directory of ODE libraries, keyed by crn_digest(), with LRU eviction.
+
+    Args:
+        directory (str, optional): The cache directory. Defaults to default_cache_dir().
+        maxsize (int, optional): The maximum size of all cached files in bytes.
+    """
+    def __init__(self, directory = None, maxsize = 256 * 2**20):
+        self.directory = directory if directory else default_cache_dir()
+        self.maxsize = maxsize
+        os.makedirs(self.directory, exist_ok = True)
+
+    def path(self, key):
+        """ The filename corresponding to a key (the file may not exist). """
+        return os.path.join(self.directory, 'odelib_' + key + '.py')
+
+    def lookup(self, key):
+        """ Returns the filename of a cached library (and marks it as used), or None. """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        logger.info(f'Cache hit: {path}')
+        return path
+
+    def store(self, key, filename):
+        """ Move a library file into the cache and return its new filename. """
+        path = self.path(key)
+        os.replace(filename, path)
+        logger.info(f'Cache store: {path}')
+        self.evict(keep = path)
+        return path
+
+    def entries(self):
+        """ Returns a list of (mtime, size, filename) of all cached libraries. """
+        entries = []
+        for fn in os.listdir(self.directory):
+            if fn.startswith('odelib_') and fn.endswith('.py'):
+                path = os.path.join(self.directory, fn)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self, keep = None):
+        """ Remove the least recently used libraries until the size bound holds. """
+        entries = sorted(self.entries())
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, path) in entries:
+            if total <= self.maxsize:
+                break
+            if path == keep:
+                continue
+            logger.info(f'Cache evict: {path}')
+            for fn in (path, importlib.util.cache_from_source(path)):
+                try:
+                    os.remove(fn)
+                except FileNotFoundError:
+                    pass
+            total -= size
+        return total
+
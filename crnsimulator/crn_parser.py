@@ -8,16 +8,23 @@ Note: This file was adapted from the python package: `Nuskell`, which is
 Test using tests/test_crn_parser.py.
 """
 
+import re
+from functools import lru_cache
 from pyparsing import (Word, Literal, Group, Suppress, Combine, Optional, ParseException,
                        alphas, nums, alphanums, delimitedList, StringStart, StringEnd, LineEnd,
-                       ZeroOrMore, OneOrMore, pythonStyleComment, ParseElementEnhance)
+                       ZeroOrMore, OneOrMore, pythonStyleComment, ParseElementEnhance,
+                       ParserElement)
 
 class CRNParseError(Exception):
     pass
 
+@lru_cache(maxsize = None)
 def crn_document_setup(modular=False):
     """Parse a formal chemical reaction network.
 
+    The grammar is built only once (per value of modular) and then cached,
+    packrat parsing is enabled on the first call.
+
     Args:
       modular <optional:bool>: Adds an additional nesting for modules within a
         CRN. Use one line per module (';' separates reactions).
@@ -51,6 +58,8 @@ def crn_document_setup(modular=False):
             return lambda s, l, t: [tag] + t.asList()
         return x.setParseAction(TPA(tag))
 
+    ParserElement.enablePackrat()
+
     crn_DWC = "".join(
         [x for x in ParseElementEnhance.DEFAULT_WHITE_CHARS if x != "\n"])
     ParseElementEnhance.setDefaultWhitespaceChars(crn_DWC)
@@ -95,6 +104,116 @@ def crn_document_setup(modular=False):
     document.ignore(pythonStyleComment)
     return document
 
+# Regular expressions for the line-oriented fast path of the parser. They
+# accept a subset of the pyparsing grammar above, everything else is left
+# to pyparsing.
+_WS = r'[ \t\r]*'
+_NUM = r'[0-9]+(?:\.[0-9]+)?(?:e[-+]?[0-9]+)?'
+_SPE = rf'{_WS}(?:([0-9]+){_WS})?([A-Za-z][A-Za-z0-9_]*){_WS}'
+_SPECIES = re.compile(_SPE)
+_CONCENTRATION = re.compile(rf'{_SPE}@{_WS}(initial|i|constant|c){_WS}({_NUM}){_WS}')
+_REACTION = re.compile(rf'([^-<>@\[\]]*)(->|<=>)([^-<>@\[\]]*)(?:\[([^\]]*)\]{_WS})?')
+_RATE = re.compile(rf'{_WS}(?:k{_WS}={_WS})?({_NUM}){_WS}')
+_REVRATE = re.compile(rf'{_WS}(?:kf|fw){_WS}={_WS}({_NUM}){_WS},{_WS}(?:kr|bw|rv){_WS}={_WS}({_NUM}){_WS}'
+                      rf'|{_WS}({_NUM}){_WS},{_WS}({_NUM}){_WS}')
+
+def _fast_species(side):
+    """ Returns the species of one side of a reaction (or None). """
+    if not side.strip(' \t\r'):
+        return []
+    species = []
+    for s in side.split('+'):
+        m = _SPECIES.fullmatch(s)
+        if m is None:
+            return None
+        species.append([m.group(2)] if m.group(1) is None else list(m.groups()))
+    return species
+
+def _fast_expression(expr):
+    """ Returns the parse tree of a single reaction or concentration (or None). """
+    m = _REACTION.fullmatch(expr)
+    if m:
+        r, arrow, p, k = m.groups()
+        r, p = _fast_species(r), _fast_species(p)
+        if r is None or p is None:
+            return None
+        tag = 'irreversible' if arrow == '->' else 'reversible'
+        if k is None:
+            return [tag, r, p]
+        m = (_RATE if tag == 'irreversible' else _REVRATE).fullmatch(k)
+        if m is None:
+            return None
+        return [tag, r, p, [x for x in m.groups() if x is not None]]
+    m = _CONCENTRATION.fullmatch(expr)
+    if m:
+        mult, name, mode, num = m.groups()
+        return ['concentration', [name] if mult is None else [mult, name], [mode], [num]]
+    return None
+
+def _parse_line(line):
+    """ Returns the parse trees of all expressions in one line of a CRN.
+
+    Uses the fast path if possible and the pyparsing grammar otherwise.
+    Raises a ParseException if the line cannot be parsed.
+    """
+    text = line.split('#', 1)[0]
+    if not text.strip(' \t\r'):
+        return []
+    exprs = [_fast_expression(e) for e in text.split(';')]
+    if all(e is not None for e in exprs):
+        return exprs
+    return crn_document_setup().parseString(line).asList()
+
+def parse_crn_document(data):
+    """Parses a CRN string into the (unprocessed) pyparsing output format.
+
+    Every line is first handled by a hand-written tokenizer for the common
+    reaction and concentration formats. Lines it cannot handle are parsed
+    with the pyparsing grammar. If a line cannot be parsed at all, or the
+    document is empty, the whole document is parsed with pyparsing to raise
+    the usual ParseException.
+
+    Args:
+      data (<str>): The CRN.
+
+    Returns:
+      crn (<lol>): List of list representation of a CRN (see crn_document_setup).
+    """
+    crn = []
+    try:
+        for line in data.split('\n'):
+            crn.extend(_parse_line(line))
+    except ParseException:
+        crn = None
+    if not crn:
+        return crn_document_setup().parseString(data).asList()
+    return crn
+
+def iter_crn_document(handle):
+    """Parses a CRN line by line and yields one expression at a time.
+
+    The output format corresponds to parse_crn_document(), but only a
+    single line of the input is held in memory. Parse errors refer to the
+    line number and column of the whole input.
+
+    Args:
+      handle (<iterable>): A file handle (or any other iterable of lines).
+
+    Yields:
+      The parse tree of every reaction or concentration specification.
+    """
+    empty = True
+    for lineno, line in enumerate(handle, 1):
+        try:
+            exprs = _parse_line(line.rstrip('\n'))
+        except ParseException as ex:
+            raise ParseException('\n' * (lineno - 1) + ex.pstr,
+                                 lineno - 1 + ex.loc, ex.msg) from None
+        empty = empty and not exprs
+        yield from exprs
+    if empty: # raise the usual error for empty documents.
+        crn_document_setup().parseString('')
+
 def post_process(crn, defaultrate = 1, defaultmode = 'initial', defaultconc = 0):
     """Process a parsed CRN.
 
@@ -114,6 +233,22 @@ def post_process(crn, defaultrate = 1, defaultmode = 'initial', defaultconc = 0)
         species: dictionary species[name]=('initial', float)
 
     """
+    species = dict()
+    new = list(post_process_iter(crn, species, defaultrate = defaultrate,
+                                 defaultmode = defaultmode, defaultconc = defaultconc))
+    return new, species
+
+def post_process_iter(crn, species, defaultrate = 1, defaultmode = 'initial', defaultconc = 0):
+    """Process a parsed CRN one expression at a time (see post_process).
+
+    Args:
+        crn (<iterable>): The parsed CRN, e.g. from iter_crn_document().
+        species (<dict>): A dictionary that is updated with the species
+            information species[name]=('initial', float) while iterating.
+
+    Yields:
+        The reactions in format [[r],[p],k].
+    """
     def remove_multipliers(species):
         flat = []
         for s in species:
@@ -124,8 +259,6 @@ def post_process(crn, defaultrate = 1, defaultmode = 'initial', defaultconc = 0)
                 flat.extend(ss)
         return flat
 
-    new = []
-    species = dict()
     for line in crn:
         if line[0] == 'concentration':
             spe = line[1][0]
@@ -139,9 +272,9 @@ def post_process(crn, defaultrate = 1, defaultmode = 'initial', defaultconc = 0)
             r = remove_multipliers(r)
             p = remove_multipliers(p)
             if t == 'reversible':
-                new.append([r, p, [defaultrate, defaultrate]])
+                rxn = [r, p, [defaultrate, defaultrate]]
             elif t == 'irreversible':
-                new.append([r, p, [defaultrate]])
+                rxn = [r, p, [defaultrate]]
             else:
                 raise CRNParseError('Wrong CRN format!')
         elif len(line) == 4:
@@ -150,10 +283,10 @@ def post_process(crn, defaultrate = 1, defaultmode = 'initial', defaultconc = 0)
             p = remove_multipliers(p)
             if t == 'reversible':
                 assert len(k) == 2
-                new.append([r, p, k])
+                rxn = [r, p, k]
             elif t == 'irreversible':
                 assert len(k) == 1
-                new.append([r, p, k])
+                rxn = [r, p, k]
             else:
                 raise CRNParseError('Wrong CRN format!')
         else:
@@ -161,8 +294,7 @@ def post_process(crn, defaultrate = 1, defaultmode = 'initial', defaultconc = 0)
         for s in r + p:
             if s not in species:
                 species[s] = (defaultmode, defaultconc)
-
-    return new, species
+        yield rxn
 
 def parse_crn_file(filename, process = True, **kwargs):
     """Parses a CRN from a file.
@@ -176,12 +308,24 @@ def parse_crn_file(filename, process = True, **kwargs):
       species (<set()>): A set of all involved species (only when process=True)
 
     """
-    crn_document = crn_document_setup()
-    if process:
-        return post_process(crn_document.parseFile(
-            filename, parseAll=True).asList(), **kwargs)
-    else:
-        return crn_document.parseFile(filename, parseAll=True).asList()
+    with open(filename) as fh:
+        crn = parse_crn_document(fh.read())
+    return post_process(crn, **kwargs) if process else crn
+
+def iter_crn(handle, species, **kwargs):
+    """Parses and processes a CRN line by line (streaming).
+
+    Args:
+      handle (<iterable>): A file handle (or any other iterable of lines).
+      species (<dict>): A dictionary that is updated with the species
+        information species[name]=('initial', float). It is complete once
+        the generator is exhausted.
+      **kwargs: The default values of post_process().
+
+    Yields:
+      The reactions in format [[r],[p],k].
+    """
+    return post_process_iter(iter_crn_document(handle), species, **kwargs)
 
 def parse_crn_string(data, process = True, **kwargs):
     """Parses a CRN from a string.
@@ -195,10 +339,7 @@ def parse_crn_string(data, process = True, **kwargs):
       species (<set()>): A set of all involved species (only when process=True)
 
     """
-    crn_document = crn_document_setup()
-    if process:
-        return post_process(crn_document.parseString(data).asList(), **kwargs)
-    else:
-        return crn_document.parseString(data).asList()
+    crn = parse_crn_document(data)
+    return post_process(crn, **kwargs) if process else crn
 
 
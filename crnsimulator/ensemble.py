@@ -0,0 +1,104 @@
+"""
+Batched integration of many parameter sets as one stacked ODE system.
+
+Test using tests/test_ensemble.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from scipy import sparse
+from scipy.integrate import odeint, solve_ivp
+
+class EnsembleError(Exception):
+    pass
+
+class Ensemble(object):
+    """ B copies of a MassActionSystem, stacked into one state vector of size B*n.
+
+    The state vector is ordered by ensemble member, i.e. y.reshape(B, n)
+    returns the states of all members. The right-hand side is evaluated for
+    all members at once, and the Jacobian is block-diagonal.
+
+    Args:
+        system (:obj:`crnsimulator.MassActionSystem()`): The ODE system.
+        p0s (numpy.ndarray): The initial concentrations with shape (B, n).
+        rates (list[dict], optional): The rates of every member (see
+            MassActionSystem.rate_vector()). Defaults to the default rates.
+    """
+    def __init__(self, system, p0s, rates = None):
+        self.system = system
+        self.p0s = np.array(p0s, dtype = float, ndmin = 2)
+        self.B, self.n = self.p0s.shape
+        if self.n != len(system.svars):
+            raise EnsembleError('Initial concentrations cannot be mapped to species!')
+        if rates is None:
+            rates = [None] * self.B
+        elif len(rates) != self.B:
+            raise EnsembleError('Rates cannot be mapped to ensemble members!')
+        self.k = np.column_stack([system.rate_vector(r) for r in rates]) \
+                if len(system.k) else np.zeros((0, self.B))
+
+        # The block-diagonal structure of the stacked Jacobian.
+        J = system.jacobian_sparsity
+        nnz, offsets = J.nnz, np.arange(self.B)[:, None]
+        indices = (J.indices[None, :] + self.n * offsets).ravel()
+        indptr = np.append((J.indptr[:-1][None, :] + nnz * offsets).ravel(), self.B * nnz)
+        self._jac = sparse.csr_matrix((np.zeros(self.B * nnz), indices, indptr),
+                                      shape = (self.B * self.n, self.B * self.n))
+
+    def __call__(self, y, t0 = None):
+        X = y.reshape(self.B, self.n).T
+        return (self.system.stoichiometry @ self.system.flux(X, self.k)).T.ravel()
+
+    def jacobian(self, y, t0 = None):
+        """ Returns the sparse block-diagonal Jacobian (filled in place). """
+        X = y.reshape(self.B, self.n).T
+        self._jac.data[:] = self.system.jacobian_values(X, self.k).T.ravel()
+        return self._jac
+
+    def integrate(self, time, method = 'BDF', atol = None, rtol = None, mxstep = 0):
+        """ Integrate all ensemble members in one solver call.
+
+        Args:
+            time (list[flt]): The time points for which the solution is returned.
+            method (str, optional): 'odeint' or 'LSODA' (with a banded Jacobian, since
+                the bandwidth of the stacked system is n-1) or a solve_ivp method.
+                BDF and Radau use the sparse block-diagonal Jacobian. Defaults to 'BDF'.
+            atol (flt, optional): Absolute tolerance of the solver.
+            rtol (flt, optional): Relative tolerance of the solver.
+            mxstep (int, optional): Maximum number of steps per time point (odeint only).
+
+        Returns:
+            A numpy.ndarray of trajectories with shape (B, n, len(time)).
+        """
+        y0 = self.p0s.ravel()
+        if method == 'odeint':
+            ny = odeint(lambda y, t: self(y, t), y0, time, ml = self.n - 1, mu = self.n - 1,
+                        atol = atol, rtol = rtol, mxstep = mxstep)
+            return ny.T.reshape(self.B, self.n, len(time))
+
+        kwargs = {'atol': atol if atol else 1.49012e-8,
+                  'rtol': rtol if rtol else 1.49012e-8}
+        if method in ('BDF', 'Radau'):
+            kwargs['jac'] = lambda t, y: self.jacobian(y, t).copy()
+        elif method == 'LSODA':
+            kwargs.update(lband = self.n - 1, uband = self.n - 1)
+        sol = solve_ivp(lambda t, y: self(y, t), (time[0], time[-1]), y0,
+                        method = method, t_eval = time, **kwargs)
+        if not sol.success:
+            raise EnsembleError(f'Integration failed: {sol.message}')
+        return sol.y.reshape(self.B, self.n, len(time))
+
+def simulate_ensemble(system, p0s, time, rates = None, method = 'BDF', **kwargs):
+    """ Integrate a batch of initial concentrations and rates as one stacked system.
+
+    This function has the batched signature of the simulate function used
+    by crnsimulator.sweep.sweep(batch = B).
+
+    Returns:
+        A numpy.ndarray of trajectories with shape (B, n, len(time)).
+    """
+    return Ensemble(system, p0s, rates).integrate(time, method = method, **kwargs)
+
@@ -0,0 +1,116 @@
+"""
+JIT-compiled (Numba) right-hand side and Jacobian for mass-action ODE systems.
+
+Test using tests/test_jit.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+from crnsimulator.massaction import MassActionSystem
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+def _jit(func):
+    """ Compile a kernel in nopython mode with on-disk caching (if numba is available). """
+    return numba.njit(cache = True)(func) if numba else func
+
+@_jit
+def mass_action_rhs(x, k, fptr, fidx, sptr, sidx, sdat, v, out):
+    """ Computes the fluxes v and out = S @ v.
+
+    The reactants of reaction j are fidx[fptr[j]:fptr[j+1]] (with
+    repetition), S is given in CSR format (sptr, sidx, sdat).
+    """
+    for j in range(len(fptr) - 1):
+        vj = k[j]
+        for e in range(fptr[j], fptr[j + 1]):
+            vj *= x[fidx[e]]
+        v[j] = vj
+    for i in range(len(sptr) - 1):
+        dx = 0.0
+        for e in range(sptr[i], sptr[i + 1]):
+            dx += sdat[e] * v[sidx[e]]
+        out[i] = dx
+    return out
+
+@_jit
+def mass_action_jacobian(x, k, erxn, espe, ecnt, optr, oidx, jptr, jidx, jdat, pf, out):
+    """ Computes the partial fluxes pf and the nonzero Jacobian entries out = Jmap @ pf.
+
+    See MassActionSystem.partial_flux() for the meaning of the arrays, the
+    segments of oidx are given by optr (with len(oidx) as the last entry).
+    """
+    for e in range(len(erxn)):
+        c = ecnt[e]
+        p = k[erxn[e]] * c * x[espe[e]] ** (c - 1)
+        for f in range(optr[e], optr[e + 1]):
+            p *= x[espe[oidx[f]]] ** ecnt[oidx[f]]
+        pf[e] = p
+    for i in range(len(jptr) - 1):
+        val = 0.0
+        for e in range(jptr[i], jptr[i + 1]):
+            val += jdat[e] * pf[jidx[e]]
+        out[i] = val
+    return out
+
+class NumbaMassActionSystem(MassActionSystem):
+    """ A MassActionSystem that evaluates the RHS and Jacobian with compiled kernels.
+
+    The kernels do not depend on the reaction network, i.e. they are compiled
+    only once and then loaded from the numba cache. Single states (1-D) are
+    evaluated by the kernels, batches of states use the vectorized numpy
+    implementation of MassActionSystem.
+    """
+    def __init__(self, svars, reactions, const = None):
+        super().__init__(svars, reactions, const)
+        n = len(self.svars)
+        # Reactant segments without the padding entries of _ridx.
+        keep = self._ridx != n
+        self._fidx = self._ridx[keep].astype(np.int64)
+        self._fptr = np.append(self._rptr - np.arange(len(self._rptr)),
+                               len(self._fidx)).astype(np.int64)
+        S = self.stoichiometry
+        self._S = (S.indptr.astype(np.int64), S.indices.astype(np.int64),
+                   S.data.astype(float))
+
+        # Other entries of the same reaction without padding entries.
+        nent = len(self._erxn)
+        keep = self._oidx != nent
+        self._oidx_ = self._oidx[keep].astype(np.int64)
+        self._optr_ = np.append(self._optr - np.arange(len(self._optr)),
+                                len(self._oidx_)).astype(np.int64)
+        self._erxn_ = self._erxn.astype(np.int64)
+        self._espe_ = self._espe.astype(np.int64)
+        J = self._jmap.tocsr()
+        self._J = (J.indptr.astype(np.int64), J.indices.astype(np.int64),
+                   J.data.astype(float))
+        self._v = np.zeros(len(self.k))
+        self._pf = np.zeros(nent)
+
+    def __call__(self, p0, t0 = None, r = None):
+        x = np.asarray(p0, dtype = float)
+        k = self.rate_vector(r)
+        if x.ndim != 1 or k.ndim != 1:
+            return super().__call__(x, t0, r)
+        return mass_action_rhs(x, np.asarray(k, dtype = float), self._fptr, self._fidx,
+                               *self._S, self._v, np.empty(len(x)))
+
+    def jacobian_values(self, p0, r = None):
+        x = np.asarray(p0, dtype = float)
+        k = self.rate_vector(r)
+        if x.ndim != 1 or k.ndim != 1:
+            return super().jacobian_values(x, r)
+        return mass_action_jacobian(x, np.asarray(k, dtype = float), self._erxn_,
+                                    self._espe_, self._ecnt,
+                                    self._optr_, self._oidx_, *self._J, self._pf,
+                                    np.empty(self._jac.nnz))
+
+def jit_available():
+    """ Returns True if numba is installed. """
+    return numba is not None
@@ -0,0 +1,185 @@
+"""
+Vectorized mass-action ODE systems (no sympy, no code generation).
+
+Test using tests/test_massaction.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from scipy import sparse
+
+class MassActionSystem(object):
+    """ A numeric mass-action ODE system built from stoichiometry matrices.
+
+    The right-hand side is evaluated as S @ (k * prod(x**R)), where R and P
+    are the integer reactant and product stoichiometry matrices and S = P - R.
+    An instance has the same call signature as the autogenerated odesystem
+    function, i.e. it can be passed directly to scipy.integrate.odeint:
+
+        >>> ny = odeint(system, p0, time, (None, ))
+
+    Args:
+        svars (list[str]): Sorted list of species. The sorting defines the
+            order of the state vector.
+        reactions (list): A list of reactions in the format [reactants,
+            products, rate], where reactants and products are lists of indices
+            with respect to svars. Stoichiometry is expressed by repetition.
+        const (list[bool], optional): Species with constant concentrations.
+    """
+    def __init__(self, svars, reactions, const = None):
+        self.svars = list(svars)
+        n, m = len(self.svars), len(reactions)
+
+        # Rate names correspond to ReactionGraph.get_odes(rate_dict = True).
+        self.rnames = ['k' + str(j) for j in range(m)]
+        self._rindex = {k: j for j, k in enumerate(self.rnames)}
+        self.k = np.array([float(rxn[2]) for rxn in reactions], dtype = float)
+        self.const = np.array(const if const else [False] * n, dtype = bool)
+
+        rr, rc, pr, pc = [], [], [], []
+        for j, (reac, prod, _) in enumerate(reactions):
+            rr.extend(reac)
+            rc.extend([j] * len(reac))
+            pr.extend(prod)
+            pc.extend([j] * len(prod))
+        self.reactants = sparse.csr_matrix((np.ones(len(rr), dtype = int), (rr, rc)),
+                                           shape = (n, m), dtype = int)
+        self.products = sparse.csr_matrix((np.ones(len(pr), dtype = int), (pr, pc)),
+                                          shape = (n, m), dtype = int)
+        dynamic = sparse.diags((~self.const).astype(int), dtype = int)
+        self.stoichiometry = (dynamic @ (self.products - self.reactants)).tocsr()
+        self.stoichiometry.eliminate_zeros()
+
+        # Flattened reactant indices for the vectorized product over reactants.
+        # Every segment starts with the index n, which points to a padding
+        # entry of 1.0, so that reactions without reactants yield a flux of k.
+        ridx, rptr = [], []
+        for reac, _, _ in reactions:
+            rptr.append(len(ridx))
+            ridx.append(n)
+            ridx.extend(reac)
+        self._ridx = np.array(ridx, dtype = int)
+        self._rptr = np.array(rptr, dtype = int)
+
+        self._setup_jacobian()
+
+    def _setup_jacobian(self):
+        """ Precompute the sparsity structure of the Jacobian.
+
+        Every unique (reaction, reactant) pair e contributes a partial flux
+        dv[r]/dx[j] to all Jacobian entries J[i, j] with S[i, r] != 0. The
+        nonzero structure of J and the mapping from contributions to J.data are
+        computed once, such that evaluation scales with the number of nonzeros.
+        """
+        n = len(self.svars)
+        Rt = self.reactants.T.tocsr()
+        Rt.sort_indices()
+        nent = Rt.nnz
+        self._erxn = np.repeat(np.arange(Rt.shape[0]), np.diff(Rt.indptr))
+        self._espe = Rt.indices.astype(int)
+        self._ecnt = Rt.data.astype(float)
+
+        # For every entry, the indices of the other entries of the same reaction.
+        # Every segment starts with the index nent, which points to a padding 1.0.
+        oidx, optr = [], []
+        for r in range(Rt.shape[0]):
+            entries = range(Rt.indptr[r], Rt.indptr[r + 1])
+            for e in entries:
+                optr.append(len(oidx))
+                oidx.append(nent)
+                oidx.extend(f for f in entries if f != e)
+        self._oidx = np.array(oidx, dtype = int)
+        self._optr = np.array(optr, dtype = int)
+
+        St = self.stoichiometry.T.tocsr()
+        cent, crow, ccoef = [], [], []
+        for e, r in enumerate(self._erxn):
+            rows = St.indices[St.indptr[r]:St.indptr[r + 1]]
+            cent.extend([e] * len(rows))
+            crow.extend(rows)
+            ccoef.extend(St.data[St.indptr[r]:St.indptr[r + 1]])
+        cent = np.array(cent, dtype = int)
+        ccoef = np.array(ccoef, dtype = float)
+        crow = np.array(crow, dtype = int)
+        ccol = self._espe[cent]
+
+        keys, cpos = np.unique(crow * n + ccol, return_inverse = True)
+        rows, cols = np.divmod(keys, n)
+        indptr = np.searchsorted(rows, np.arange(n + 1))
+        self._jac = sparse.csr_matrix((np.zeros(len(keys)), cols, indptr), shape = (n, n))
+        # Maps partial fluxes to the data array of the Jacobian.
+        self._jmap = sparse.csr_matrix((ccoef, (cpos.ravel(), cent)), 
+                                       shape = (len(keys), nent))
+
+    @property
+    def jacobian_sparsity(self):
+        """ scipy.sparse.csr_matrix: The nonzero structure of the Jacobian. """
+        J = self._jac.copy()
+        J.data[:] = 1
+        return J.astype(int)
+
+    def partial_flux(self, p0, r = None):
+        """ Returns the partial derivatives dv[r]/dx[j] of all (reaction, reactant) pairs. """
+        x = np.asarray(p0, dtype = float)
+        xj = x[self._espe]
+        cnt = self._ecnt.reshape(self._ecnt.shape + (1,) * (x.ndim - 1))
+        te = np.concatenate((xj ** cnt, np.ones((1,) + x.shape[1:])))
+        others = np.multiply.reduceat(te[self._oidx], self._optr, axis = 0) \
+                if len(self._optr) else te[:0]
+        k = self.rate_vector(r)
+        k = k.reshape(k.shape + (1,) * (x.ndim - k.ndim))
+        return k[self._erxn] * cnt * xj ** (cnt - 1) * others
+
+    @property
+    def rates(self):
+        """ dict: The default rate constants, mapping rate names to values. """
+        return dict(zip(self.rnames, self.k))
+
+    def rate_vector(self, r = None):
+        """ Returns the vector of rate constants, updated by the dictionary r. 
+
+        If r is a numpy.ndarray, it is interpreted as the vector of rate
+        constants (or a matrix of shape (reactions, B) for B systems).
+        """
+        if isinstance(r, np.ndarray):
+            return r
+        if not r:
+            return self.k
+        k = self.k.copy()
+        k[list(map(self._rindex.__getitem__, r.keys()))] = list(r.values())
+        return k
+
+    def flux(self, p0, r = None):
+        """ Returns the flux vector v = k * prod(x**R) of all reactions. """
+        x = np.asarray(p0, dtype = float)
+        xe = np.concatenate((x, np.ones((1,) + x.shape[1:])))
+        v = np.multiply.reduceat(xe[self._ridx], self._rptr, axis = 0)
+        k = self.rate_vector(r)
+        return v * k.reshape(k.shape + (1,) * (v.ndim - k.ndim))
+
+    def __call__(self, p0, t0 = None, r = None):
+        return self.stoichiometry @ self.flux(p0, r)
+
+    def jacobian_values(self, p0, r = None):
+        """ Returns the nonzero entries of the Jacobian in the order of jacobian_sparsity.
+
+        For a state matrix p0 with shape (species, B), this returns the
+        values for every column, i.e. a matrix with shape (nonzeros, B).
+        """
+        return self._jmap @ self.partial_flux(p0, r)
+
+    def jacobian(self, p0, t0 = None, r = None):
+        """ Returns the sparse Jacobian matrix (scipy.sparse.csr_matrix).
+
+        Note: The returned matrix is filled in place, i.e. it is overwritten
+        by the next call of this function.
+        """
+        self._jac.data[:] = self.jacobian_values(p0, r)
+        return self._jac
+
+    def dense_jacobian(self, p0, t0 = None, r = None):
+        """ Returns the Jacobian as numpy.ndarray, e.g. for odeint(Dfun = ...). """
+        return self.jacobian(p0, t0, r).toarray()
+
@@ -19,24 +19,293 @@ Usage:
 import logging
 logger = logging.getLogger(__name__)
 
+import sys
 import argparse
+import contextlib
 import numpy as np
-from scipy.integrate import odeint
 
 class ODETemplateError(Exception):
     pass
 
+#<&>DIGEST<&>#
+
 rates = {
     #<&>RATES<&>#
 }
 
+reactions = None
+#<&>REACTIONS<&>#
+
+#<&>SORTEDVARS<&>#
+
+const = None
+#<&>CONSTANT_SPECIES_INFO<&>#
+
+# Conservation laws (L, pivots): if specified, only independent species are integrated.
+conservation = None
+#<&>CONSERVATION<&>#
+
 #<&>ODECALL<&>#
 
 #<&>JACOBIAN<&>#
 
+def jacobian_sparsity():
+    """ Returns the sparsity pattern of the Jacobian, derived from the reactions.
+
+    Returns:
+      A scipy.sparse.csr_matrix, or None if the reactions are not known.
+    """
+    if reactions is None:
+        return None
+    from scipy.sparse import csr_matrix
+    rows, cols = [], []
+    for (reactants, products, _) in reactions:
+        for i in set(reactants) | set(products):
+            if const and const[i]:
+                continue
+            for j in set(reactants):
+                rows.append(i)
+                cols.append(j)
+    pattern = csr_matrix((np.ones(len(rows), dtype = int), (rows, cols)),
+                         shape = (len(svars), len(svars)))
+    pattern.data[:] = 1
+    return pattern
+
+def _profiler():
+    """ Returns the active profiler of crnsimulator.profiling (or None). """
+    profiling = sys.modules.get('crnsimulator.profiling')
+    return profiling.active() if profiling else None
+
+def _phase(name):
+    """ A phase of the active profiler, or a context that does nothing. """
+    prof = _profiler()
+    return prof.phase(name) if prof else contextlib.nullcontext()
+
+def initial_concentrations():
+    """ Returns the default initial concentrations in the order of svars. """
+    p0 = [0] * len(svars)
+    #<&>DEFAULTCONCENTRATIONS<&>#
+    return p0
+
+def simulate(p0, time, r = None, method = 'odeint', atol = None, rtol = None, mxstep = 0,
+             seed = None, stop_at_steady_state = None, truncate = False):
+    """Integrate the ODE system (or simulate the CRN stochastically).
+
+    Args:
+      p0 (list[flt]): The initial concentrations in the order of svars.
+      time (list[flt]): The time points for which the solution is returned.
+      r (dict, optional): The rates used by the ODE system. Defaults to None,
+        which uses the hard-coded default rates.
+      method (str, optional): 'odeint' (default), or one of the 
+        scipy.integrate.solve_ivp methods, e.g. 'LSODA', 'BDF', 'Radau'.
+        BDF and Radau use sparse Jacobians if possible. 'ssa', 'tau-leap' and
+        'implicit-tau' simulate the CRN stochastically, where p0 are
+        interpreted as molecule counts.
+      atol (flt, optional): Absolute tolerance of the solver.
+      rtol (flt, optional): Relative tolerance of the solver.
+      mxstep (int, optional): Maximum number of steps per time point (odeint only).
+      seed (int, optional): Seed of the random number generator (stochastic only).
+      stop_at_steady_state (flt, optional): Stop the integration as soon as the
+        largest absolute derivative |dx/dt| drops below this tolerance (uses
+        solve_ivp event detection, 'odeint' is replaced by 'LSODA').
+      truncate (bool, optional): If the integration stops early, return only
+        the time points up to the stop and the state at the stop. Defaults to
+        False, which pads the remaining time points with the final state.
+
+    Returns:
+      A numpy.ndarray of trajectories with shape (len(svars), len(time)). With
+      stop_at_steady_state and truncate, a tuple (time, trajectories) that
+      ends at the stop.
+    """
+    truncate = truncate and stop_at_steady_state is not None
+    if method in ('ssa', 'tau-leap', 'implicit-tau'):
+        if reactions is None:
+            raise ODETemplateError('Stochastic simulation requires the reactions of the ODE system.')
+        if stop_at_steady_state is not None:
+            raise ODETemplateError('Stochastic simulations cannot stop at steady state.')
+        from crnsimulator.stochastic import StochasticSystem, simulate_stochastic
+        return simulate_stochastic(StochasticSystem(svars, reactions, const), 
+                                   p0, time, r, method = method, seed = seed)
+
+    reduce = conservation is not None or (const and any(const))
+    if reduce:
+        try:
+            from crnsimulator.reduction import ReducedSystem, constant_laws
+        except ImportError:
+            # A standalone library: the full system is integrated, where
+            # constant species have zero derivatives.
+            logger.info('Cannot import crnsimulator.reduction, integrating all species.')
+            reduce = False
+    if reduce:
+        # Integrate only the dynamic (independent) species, constant species are
+        # bound to p0 and pivot species follow from the conservation laws.
+        odesys = globals()['#<&>ODENAME<&>#']
+        jac = globals().get('sparse_jacobian') or globals().get('jacobian')
+        system = ReducedSystem(lambda x, t: odesys(x, t, r),
+                               (lambda x, t: jac(x, t, r)) if jac else None, 
+                               conservation if conservation is not None else constant_laws(const),
+                               p0)
+        return system.integrate(time, method = method, atol = atol, rtol = rtol, mxstep = mxstep,
+                                stop_at_steady_state = stop_at_steady_state, truncate = truncate)
+
+    if stop_at_steady_state is not None and method == 'odeint':
+        method = 'LSODA' # odeint does not support events.
+    prof = _profiler()
+    if method == 'odeint':
+        from scipy.integrate import odeint
+        return (prof.odeint if prof else odeint)(#<&>ODENAME<&>#,
+            np.array(p0), time, (r, ), #<&>JCALL<&>#,
+            atol=atol, rtol=rtol, mxstep=mxstep).T
+
+    from scipy.integrate import solve_ivp
+    from scipy.sparse import csr_matrix
+    # Use the same default tolerances as odeint.
+    kwargs = {'atol': atol if atol else 1.49012e-8,
+              'rtol': rtol if rtol else 1.49012e-8}
+
+    dense = globals().get('jacobian')
+    sparse = globals().get('sparse_jacobian')
+    if method in ('BDF', 'Radau'):
+        if sparse:
+            kwargs['jac'] = lambda t, y: sparse(y, t, r).copy()
+        elif dense and reactions is not None:
+            pattern = jacobian_sparsity()
+            rows, cols = pattern.nonzero()
+            kwargs['jac'] = lambda t, y: csr_matrix(
+                    (dense(y, t, r)[rows, cols], (rows, cols)), shape = pattern.shape)
+        elif dense:
+            kwargs['jac'] = lambda t, y: dense(y, t, r)
+        else:
+            kwargs['jac_sparsity'] = jacobian_sparsity()
+    elif method == 'LSODA' and dense:
+        kwargs['jac'] = lambda t, y: dense(y, t, r)
+
+    if stop_at_steady_state is not None:
+        tol, dydt = stop_at_steady_state, globals()['#<&>ODENAME<&>#']
+        rhs = lambda y: np.max(np.abs(dydt(y, None, r)), initial = 0)
+        if rhs(np.array(p0, dtype = float)) <= tol:
+            y0 = np.array(p0, dtype = float)[:, None]
+            if truncate:
+                return np.asarray(time[:1], dtype = float), y0
+            return np.repeat(y0, len(time), axis = 1)
+        event = lambda t, y: rhs(y) - tol
+        event.terminal, event.direction = True, -1
+        kwargs['events'] = event
+
+    solver = prof.solve_ivp if prof else solve_ivp
+    sol = solver(lambda t, y: #<&>ODENAME<&>#(y, t, r), (time[0], time[-1]), 
+                 np.array(p0, dtype = float), method = method, t_eval = time, **kwargs)
+    if not sol.success:
+        raise ODETemplateError(f'Integration failed: {sol.message}')
+    t, ny = sol.t, sol.y
+    if sol.status == 1: # terminated by the steady state event.
+        logger.info(f'Reached steady state at t = {sol.t_events[0][0]}.')
+        if truncate and (len(t) == 0 or t[-1] < sol.t_events[0][0]):
+            # Append the state at the stop, which is between two time points.
+            t = np.append(t, sol.t_events[0][:1])
+            ny = np.concatenate((ny, sol.y_events[0][:1].T), axis = 1)
+        elif not truncate:
+            pad = np.repeat(sol.y_events[0][:1].T, len(time) - ny.shape[1], axis = 1)
+            ny = np.concatenate((ny, pad), axis = 1)
+    return (t, ny) if truncate else ny
+
+def steady_state(p0, r = None, method = 'newton', atol = None, rtol = None):
+    """Solve odesystem(x) = 0, instead of integrating the ODE system.
+
+    Uses Newton iterations with the (sparse) Jacobian of the ODE system,
+    where conservation laws and constant species are enforced for the
+    initial concentrations p0. Falls back to pseudo-transient continuation if
+    Newton fails or finds an unstable steady state.
+
+    Args:
+      p0 (list[flt]): The initial concentrations in the order of svars.
+      r (dict, optional): The rates used by the ODE system.
+      method (str, optional): 'newton' (default) or 'ptc' (pseudo-transient
+        continuation, which follows the dynamics to a stable steady state).
+      atol (flt, optional): Absolute tolerance of the solution.
+      rtol (flt, optional): Relative tolerance of the solution.
+
+    Returns:
+      A numpy.ndarray with the steady state concentrations.
+    """
+    if reactions is None:
+        raise ODETemplateError('Steady states require the reactions of the ODE system.')
+    from crnsimulator.massaction import MassActionSystem
+    from crnsimulator.reduction import conservation_laws
+    from crnsimulator.steadystate import steady_state as solve
+    system = MassActionSystem(svars, reactions, const)
+    sparse = globals().get('sparse_jacobian')
+    dense = globals().get('jacobian')
+    if sparse:
+        jac = lambda x: sparse(x, None, r)
+    elif dense:
+        jac = lambda x: dense(x, None, r)
+    else:
+        jac = lambda x: system.jacobian(x, None, r)
+    kwargs = {'atol': atol, 'rtol': rtol}
+    laws = conservation if conservation is not None else conservation_laws(system.stoichiometry)
+    return solve(lambda x: #<&>ODENAME<&>#(x, None, r),
+                 jac, p0, laws = laws, method = method,
+                 **{k: v for k, v in kwargs.items() if v is not None})
+
+def sensitivity(p0, time, r = None, params = None, method = 'odeint', 
+                atol = None, rtol = None, mxstep = 0):
+    """Integrate the ODE system together with its sensitivities to rate constants.
+
+    Args:
+      p0 (list[flt]): The initial concentrations in the order of svars.
+      time (list[flt]): The time points for which the solution is returned.
+      r (dict, optional): The rates used by the ODE system.
+      params (list[str], optional): Rate names (keys of rates) of the
+        sensitivities. Defaults to all rates.
+      method (str, optional): 'odeint' (default) or a solve_ivp method.
+      atol (flt, optional): Absolute tolerance of the solver.
+      rtol (flt, optional): Relative tolerance of the solver.
+      mxstep (int, optional): Maximum number of steps per time point (odeint only).
 
-def add_integrator_args(parser):
-    """ODE integration aruments."""
+    Returns:
+      A numpy.ndarray of trajectories with shape (len(svars), len(time)) and 
+      a numpy.ndarray of sensitivities with shape (len(time), len(svars), len(params)).
+    """
+    if reactions is None:
+        raise ODETemplateError('Sensitivities require the reactions of the ODE system.')
+    from crnsimulator.massaction import MassActionSystem
+    from crnsimulator.sensitivity import forward_sensitivity
+    return forward_sensitivity(MassActionSystem(svars, reactions, const), p0, time, r, 
+                               params = params, method = method, 
+                               atol = atol, rtol = rtol, mxstep = mxstep)
+
+def write_nxy(fh, time, ny, svars = None, header = False, chunksize = 2**16):
+    """Write a time course in nxy format (one time point per line).
+
+    The output is identical to printing every row using "{:.9e}".format,
+    but the values are formatted in bulk, one chunk of rows at a time.
+
+    Args:
+      fh (file): A file handle opened for writing text.
+      time (list[flt]): The time points.
+      ny (numpy.ndarray): The trajectories with shape (species, time points).
+      svars (list[str], optional): The species names (for the header).
+      header (bool, optional): Write a header line. Defaults to False.
+      chunksize (int, optional): The (approximate) number of values per chunk.
+    """
+    if header:
+        fh.write(' '.join(['{:15s}'.format(x) for x in ['time'] + list(svars)]) + '\n')
+    data = np.column_stack((time, np.asarray(ny).T))
+    rowfmt = ' '.join(['%.9e'] * data.shape[1]) + '\n'
+    step = max(1, chunksize // data.shape[1])
+    for i in range(0, len(data), step):
+        chunk = data[i:i + step]
+        fh.write((rowfmt * len(chunk)) % tuple(chunk.ravel()))
+
+def add_integrator_args(parser, rate_sweeps = True):
+    """ODE integration aruments.
+
+    Args:
+      parser (argparse.ArgumentParser): The parser.
+      rate_sweeps (bool, optional): Whether --sweep tables may specify rates. This
+        requires an ODE library with rate names (rate_dict = True).
+    """
     solver = parser.add_argument_group('odeint parameters')
     plotter = parser.add_argument_group('plotting parameters')
 
@@ -63,6 +332,62 @@ def add_integrator_args(parser):
             help="Specify relative tolerance for the solver.")
     solver.add_argument("--mxstep", type=int, default=0, metavar='<int>',
             help="Maximum number of steps allowed for each integration point in t.")
+    solver.add_argument("--method", default='odeint', 
+            choices=('odeint', 'LSODA', 'BDF', 'Radau', 'RK45', 'RK23', 'DOP853', 'ssa',
+                     'tau-leap', 'implicit-tau'),
+            help="""Choose the solver: scipy.integrate.odeint or a scipy.integrate.solve_ivp
+            method. BDF and Radau use sparse Jacobians derived from the reaction network.
+            'ssa' is an exact stochastic simulation (Gillespie's next reaction method),
+            where initial concentrations are molecule counts. 'tau-leap' and 'implicit-tau'
+            are approximate (adaptive) stochastic simulations for large molecule counts.""")
+    solver.add_argument("--steady-state", default=None, choices=('newton', 'ptc'),
+            help="""Compute and print the steady state reached from the initial
+            concentrations instead of a time course: 'newton' iterations (with
+            pseudo-transient continuation as fallback, e.g. for unstable roots) 
+            or 'ptc' only.""")
+    solver.add_argument("--stop-at-steady-state", type=float, default=None, metavar='<flt>',
+            help="""Stop the integration early when the largest absolute derivative 
+            |dx/dt| drops below this tolerance. The remaining time points are
+            padded with the final state (see --truncate).""")
+    solver.add_argument("--truncate", action='store_true',
+            help="Omit the time points after an early stop (--stop-at-steady-state).")
+    solver.add_argument("--sensitivity", default=None, metavar='<str>',
+            help="""Integrate the forward sensitivities dx/dk to all rate constants
+            (see --sensitivity-rates) and write time, species, rates and sensitivities
+            with shape (time, species, rates) to a .npz file.""")
+    solver.add_argument("--sensitivity-rates", nargs='+', default=None, metavar='<str>+',
+            help="Rate names (e.g. k0 k1) for --sensitivity. (Defaults to all rates.)")
+    solver.add_argument("--profile", nargs='?', const='-', default=None, metavar='<str>',
+            help="""Record wall-clock time, CPU time and peak memory of every phase,
+            the number of RHS and Jacobian evaluations and solver statistics, and
+            write them as JSON report to a file (or to STDERR if no file is given).""")
+    solver.add_argument("--seed", type=int, default=None, metavar='<int>',
+            help="Seed of the random number generator for stochastic simulations.")
+    solver.add_argument("--replicates", type=int, default=1, metavar='<int>',
+            help="""Number of stochastic simulations. The output is the mean trajectory,
+            use --ensemble-output to write mean, variance and quantiles.""")
+    solver.add_argument("--replicate-workers", type=int, default=None, metavar='<int>',
+            help="Number of worker processes for the replicates. (Defaults to all CPUs.)")
+    solver.add_argument("--ensemble-output", default=None, metavar='<str>',
+            help="""Write time, mean, variance and quantiles (0.05, 0.5, 0.95) of the
+            replicates to a .npz file.""")
+
+    # optional: parameter sweeps
+    sweep = parser.add_argument_group('parameter sweeps')
+    sweep.add_argument("--sweep", default=None, metavar='<str>',
+            help="""A tab separated table with one simulation per line. The header
+            specifies species (names or 1-based indices){}.""".format(
+                ' and rates (e.g. k0 k1)' if rate_sweeps else ''))
+    sweep.add_argument("--sweep-workers", type=int, default=None, metavar='<int>',
+            help="Number of worker processes for the sweep. (Defaults to all CPUs.)")
+    sweep.add_argument("--sweep-chunksize", type=int, default=1, metavar='<int>',
+            help="Number of simulations that are sent to a worker at once.")
+    sweep.add_argument("--sweep-batch", type=int, default=1, metavar='<int>',
+            help="""Number of simulations that are integrated together as one stacked 
+            (ensemble) system with a vectorized right-hand side.""")
+    sweep.add_argument("--sweep-output", default=None, metavar='<str>',
+            help="""Stream the sweep results into a .npy file with shape 
+            (simulations, species, time points).""")
 
     # optional: choose output formats
     plotter.add_argument("--list-labels", action='store_true',
@@ -78,6 +403,14 @@ def add_integrator_args(parser):
             help="Print time course to STDOUT in nxy format.")
     plotter.add_argument("--header", action='store_true',
             help="Print header for trajectories.")
+    plotter.add_argument("--save", default='', metavar='<str>',
+            help="""Write the time course to a file. The format is chosen by the file
+            extension: .nxy/.txt (text), .npy, .npz, .f64/.f32 (raw memory-mapped
+            float64/float32 array with shape (time, 1 + species)), .h5 (requires h5py),
+            .parquet (requires pyarrow).""")
+    plotter.add_argument("--save-format", default=None, 
+            choices=('nxy', 'npy', 'npz', 'raw64', 'raw32', 'hdf5', 'parquet'),
+            help="Override the output format chosen by the --save file extension.")
 
     plotter.add_argument("--pyplot", default='', metavar='<str>',
             help="Specify a filename to plot the ODE simulation.")
@@ -89,6 +422,65 @@ def add_integrator_args(parser):
             help=argparse.SUPPRESS)
     return
 
+def integrate_sweep(args, p0, time):
+    """Simulate the ODE system for every row of the --sweep table.
+
+    Returns:
+      A numpy.ndarray with shape (simulations, len(svars), len(time)).
+    """
+    from crnsimulator.sweep import read_sweep_table, sweep_jobs, sweep
+    header, table = read_sweep_table(args.sweep)
+    jobs = sweep_jobs(header, table, svars, p0, rates)
+    logger.info(f'Sweep: {len(jobs)} simulations, {args.sweep_workers or "all"} workers.')
+
+    simfun, kwargs = simulate, dict()
+    if args.stop_at_steady_state is not None:
+        # Every simulation is padded to the full time course.
+        kwargs['stop_at_steady_state'] = args.stop_at_steady_state
+    if args.sweep_batch > 1:
+        # Integrate batches of simulations as one stacked (ensemble) system.
+        if reactions is None:
+            raise ODETemplateError('Batched sweeps require the reactions of the ODE system.')
+        if kwargs:
+            raise ODETemplateError('Batched sweeps cannot stop at steady state.')
+        from functools import partial
+        from crnsimulator.massaction import MassActionSystem
+        from crnsimulator.ensemble import simulate_ensemble
+        simfun = partial(simulate_ensemble, MassActionSystem(svars, reactions, const))
+
+    result = sweep(simfun, jobs, time, 
+                   workers = args.sweep_workers, 
+                   chunksize = args.sweep_chunksize,
+                   batch = args.sweep_batch,
+                   out = args.sweep_output, 
+                   method = args.method, atol = args.atol, rtol = args.rtol, mxstep = args.mxstep,
+                   **kwargs)
+    if args.sweep_output:
+        logger.info(f'Sweep: wrote results to file: {args.sweep_output}')
+    return result
+
+def integrate_replicates(args, p0, time):
+    """Simulate --replicates stochastic trajectories and summarize them.
+
+    Returns:
+      A numpy.ndarray of mean trajectories with shape (len(svars), len(time)).
+    """
+    from crnsimulator.stochastic import stochastic_ensemble
+    logger.info(f'Ensemble: {args.replicates} replicates, ' + \
+                f'{args.replicate_workers or "all"} workers.')
+    stats = stochastic_ensemble(simulate, p0, time, args.replicates, 
+                                seed = args.seed,
+                                workers = args.replicate_workers,
+                                method = args.method)
+    if args.ensemble_output:
+        quantiles = stats.quantiles
+        np.savez(args.ensemble_output, time = time, svars = np.array(svars),
+                 mean = stats.mean, variance = stats.variance,
+                 quantiles = np.array(list(quantiles)),
+                 quantile_values = np.array(list(quantiles.values())))
+        logger.info(f'Ensemble: wrote statistics to file: {args.ensemble_output}')
+    return stats.mean
+
 def flint(inp):
     return int(float(inp)) if float(inp) == int(float(inp)) else float(inp)
 
@@ -128,15 +520,23 @@ def integrate(args, setlogger = False):
     if setlogger:
         set_logger(args.verbose, args.logfile)
 
+    if args.profile is None:
+        return _integrate(args)
+
+    from crnsimulator import profiling
+    prof = profiling.active() or profiling.start(memory = True)
+    try:
+        return _integrate(args)
+    finally:
+        profiling.stop()
+        prof.write(args.profile)
+
+def _integrate(args):
+    """The simulation and output of integrate(), see integrate()."""
     if args.pyplot_labels:
         logger.warning('Deprecated argument: --pyplot_labels.')
 
-    #<&>SORTEDVARS<&>#
-
-    p0 = [0] * len(svars)
-    #<&>DEFAULTCONCENTRATIONS<&>#
-    const = None
-    #<&>CONSTANT_SPECIES_INFO<&>#
+    p0 = initial_concentrations()
     if args.p0:
         for term in args.p0:
             p, o = term.split('=')
@@ -163,8 +563,19 @@ def integrate(args, setlogger = False):
             print(f'{e} {v} {p0[e-1]} {"constant" if const and const[e-1] else ""}')
         raise SystemExit('Initial concentrations can be overwritten by --p0 argument')
 
-    if not args.nxy and not args.pyplot:
-        logger.warning('Use --pyplot and/or --nxy to plot your results.')
+    if args.steady_state:
+        with _phase('integration'):
+            xs = steady_state(p0, method = args.steady_state, atol = args.atol, rtol = args.rtol)
+        end = len(args.labels) if args.labels_strict else len(svars)
+        for v, x in zip(svars[:end], xs[:end]):
+            print(f'{v} {x:.9e}')
+        return zip(svars, xs)
+
+    if args.sweep and not args.sweep_output:
+        logger.warning('Use --sweep-output to write the results of the sweep.')
+    elif not args.sweep and not args.nxy and not args.pyplot and not args.save \
+            and not args.sensitivity:
+        logger.warning('Use --pyplot, --nxy and/or --save to plot your results.')
 
     if not args.t8:
         raise ODETemplateError('Specify a valid end-time for the simulation: --t8 <flt>')
@@ -178,39 +589,60 @@ def integrate(args, setlogger = False):
     else:
         raise ODETemplateError('Please specify either --t-lin or --t-log. (see --help)')
 
-    # It would be nice if it is possible to read alternative rates from a file instead.
+    if args.sweep:
+        with _phase('integration'):
+            return integrate_sweep(args, p0, time)
+
     # None triggers the default-rates that are hard-coded in the (this) library file.
+    # Use --sweep to read alternative rates from a file instead.
     rates = None
 
     logger.info(f'Initial concentrations: {list(zip(svars, p0))}')
     # TODO: logging should report more info on parameters.
 
-    ny = odeint(#<&>ODENAME<&>#,
-        np.array(p0), time, (rates, ), #<&>JCALL<&>#,
-        atol=args.atol, rtol=args.rtol, mxstep=args.mxstep).T
+    with _phase('integration'):
+        if args.sensitivity:
+            params = args.sensitivity_rates or [f'k{j}' for j in range(len(reactions or []))]
+            ny, sens = sensitivity(p0, time, rates, params = params, method = args.method,
+                                   atol = args.atol, rtol = args.rtol, mxstep = args.mxstep)
+            np.savez(args.sensitivity, time = time, svars = np.array(svars), 
+                     rates = np.array(params), sensitivity = sens)
+            logger.info(f'Wrote sensitivities to file: {args.sensitivity}')
+        elif args.replicates > 1:
+            if args.method not in ('ssa', 'tau-leap', 'implicit-tau'):
+                raise ODETemplateError('Replicates require a stochastic --method.')
+            ny = integrate_replicates(args, p0, time)
+        else:
+            truncate = args.truncate and args.stop_at_steady_state is not None
+            ny = simulate(p0, time, rates, method = args.method,
+                          atol = args.atol, rtol = args.rtol, mxstep = args.mxstep,
+                          seed = args.seed,
+                          stop_at_steady_state = args.stop_at_steady_state,
+                          truncate = truncate)
+            if truncate:
+                time, ny = ny
 
     # Output
-    if args.nxy and args.labels_strict:
-        end = len(args.labels)
-        if args.header:
-            print(' '.join(['{:15s}'.format(x) for x in ['time'] + svars[:end]]))
-        for i in zip(time, *ny[:end]):
-            print(' '.join(map("{:.9e}".format, i)))
-    elif args.nxy:
-        if args.header:
-            print(' '.join(['{:15s}'.format(x) for x in ['time'] + svars]))
-        for i in zip(time, *ny):
-            print(' '.join(map("{:.9e}".format, i)))
-
-    if args.pyplot:
-        from crnsimulator.plotting import ode_plotter
-        plotfile = ode_plotter(args.pyplot, time, ny, svars,
-                               log=True if args.t_log else False,
-                               labels=set(args.labels),
-                               xlim = args.pyplot_xlim,
-                               ylim = args.pyplot_ylim,
-                               labels_strict = args.labels_strict)
-        logger.info(f"Plotting successfull. Wrote plot to file: {plotfile}")
+    with _phase('output'):
+        end = len(args.labels) if args.labels_strict else len(svars)
+        if args.nxy:
+            write_nxy(sys.stdout, time, ny[:end], svars[:end], header = args.header)
+
+        if args.save:
+            from crnsimulator.output import write_time_course
+            savefile = write_time_course(args.save, time, ny[:end], svars[:end], 
+                                         fmt = args.save_format)
+            logger.info(f"Wrote time course to file: {savefile}")
+
+        if args.pyplot:
+            from crnsimulator.plotting import ode_plotter
+            plotfile = ode_plotter(args.pyplot, time, ny, svars,
+                                   log=True if args.t_log else False,
+                                   labels=set(args.labels),
+                                   xlim = args.pyplot_xlim,
+                                   ylim = args.pyplot_ylim,
+                                   labels_strict = args.labels_strict)
+            logger.info(f"Plotting successfull. Wrote plot to file: {plotfile}")
 
     return zip(time, *ny)
 
@@ -221,7 +653,7 @@ if __name__ == '__main__':
         help = "Print logging output. (-vv increases verbosity.)")
     parser.add_argument('--logfile', default = '', action = 'store', metavar = '<str>',
         help = """Redirect logging information to a file.""")
-    add_integrator_args(parser)
+    add_integrator_args(parser, rate_sweeps = bool(rates))
     args = parser.parse_args()
     integrate(args, setlogger = True)
 
@@ -0,0 +1,95 @@
+"""
+Write simulation time courses in text (nxy) and binary formats.
+
+Test using tests/test_output.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+import numpy as np
+
+# The nxy writer is part of the template, such that ODE libraries can
+# write nxy output without crnsimulator.
+from crnsimulator.odelib_template import write_nxy
+
+class OutputError(Exception):
+    pass
+
+# File extensions and the corresponding output formats.
+FORMATS = {'.txt': 'nxy',
+           '.nxy': 'nxy',
+           '.npy': 'npy',
+           '.npz': 'npz',
+           '.f64': 'raw64',
+           '.f32': 'raw32',
+           '.h5': 'hdf5',
+           '.hdf5': 'hdf5',
+           '.parquet': 'parquet'}
+
+def write_time_course(filename, time, ny, svars, fmt = None):
+    """ Write a time course to a file.
+
+    Formats (chosen by file extension, unless fmt is specified):
+      - nxy (.txt, .nxy): Text, one time point per line, see write_nxy().
+      - npy (.npy): A float64 array with shape (time points, 1 + species),
+        where the first column is the time.
+      - npz (.npz): Compressed arrays 'time', 'ny' (species x time) and 'svars'.
+      - raw64/raw32 (.f64/.f32): A memory-mapped raw float64/float32 array with
+        shape (time points, 1 + species) in C order, without any header.
+      - hdf5 (.h5, .hdf5): Datasets 'time', 'ny' and 'svars' (requires h5py).
+      - parquet (.parquet): One column per species and a 'time' column (requires pyarrow).
+
+    Returns:
+        [str]: The name of the file.
+    """
+    if fmt is None:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in FORMATS:
+            raise OutputError(f'Unknown output format: "{filename}" ' + \
+                    f'(supported: {", ".join(sorted(FORMATS))}).')
+        fmt = FORMATS[ext]
+
+    time = np.asarray(time, dtype = float)
+    ny = np.asarray(ny, dtype = float)
+    svars = list(map(str, svars))
+    if fmt == 'nxy':
+        with open(filename, 'w') as fh:
+            write_nxy(fh, time, ny, svars, header = True)
+    elif fmt == 'npy':
+        data = np.lib.format.open_memmap(filename, mode = 'w+', dtype = float,
+                                         shape = (len(time), 1 + len(ny)))
+        data[:, 0] = time
+        data[:, 1:] = ny.T
+        data.flush()
+    elif fmt == 'npz':
+        np.savez_compressed(filename, time = time, ny = ny, svars = np.array(svars))
+    elif fmt in ('raw64', 'raw32'):
+        dtype = np.float64 if fmt == 'raw64' else np.float32
+        data = np.memmap(filename, mode = 'w+', dtype = dtype,
+                         shape = (len(time), 1 + len(ny)))
+        data[:, 0] = time
+        data[:, 1:] = ny.T
+        data.flush()
+    elif fmt == 'hdf5':
+        try:
+            import h5py
+        except ImportError as err:
+            raise OutputError('HDF5 output requires the h5py package.') from err
+        with h5py.File(filename, 'w') as hf:
+            hf.create_dataset('time', data = time)
+            hf.create_dataset('ny', data = ny)
+            hf.create_dataset('svars', data = np.array(svars, dtype = 'S'))
+    elif fmt == 'parquet':
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as err:
+            raise OutputError('Parquet output requires the pyarrow package.') from err
+        table = pyarrow.table([time] + list(ny), names = ['time'] + svars)
+        pyarrow.parquet.write_table(table, filename)
+    else:
+        raise OutputError(f'Unknown output format: {fmt}.')
+    return filename
+
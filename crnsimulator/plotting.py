@@ -1,7 +1,16 @@
 
-import matplotlib.pyplot as plt
-import seaborn as sns
-sns.set(style="darkgrid", font_scale=1, rc={"lines.linewidth": 2.0})
+# matplotlib and seaborn are imported on the first call of ode_plotter(),
+# as importing them takes much longer than most simulations.
+plt = None
+
+def _pyplot():
+    global plt
+    if plt is None:
+        import matplotlib.pyplot
+        import seaborn as sns
+        sns.set(style="darkgrid", font_scale=1, rc={"lines.linewidth": 2.0})
+        plt = matplotlib.pyplot
+    return plt
 
 def ode_plotter(name, t, ny, svars, log = False, labels = None,
         xlim = None, ylim = None, plim = None, labels_strict = False):
@@ -25,6 +34,7 @@ def ode_plotter(name, t, ny, svars, log = False, labels = None,
     Returns:
       [str]: Name of the file containing the plot
     """
+    plt = _pyplot()
     fig, ax = plt.subplots(1, 1, figsize=(8, 4.5))
 
     # b : blue.
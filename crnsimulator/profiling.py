@@ -0,0 +1,210 @@
+"""
+Profiling of simulations: time and peak memory per phase, RHS and Jacobian
+evaluations, and solver statistics.
+
+A profiler is activated with start() (or the profile() context manager).
+Library functions report their phases with phase(), which does nothing if
+no profiler is active, and the ODE libraries pass their solver calls
+through the active profiler to count evaluations and record diagnostics.
+
+Test using tests/test_profiling.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import sys
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+class ProfilingError(Exception):
+    pass
+
+def memory_status(field):
+    """ Returns a memory field of /proc/self/status (e.g. VmRSS) in bytes (or None). """
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def reset_peak_memory():
+    """ Resets the peak resident set size (VmHWM) of the process (Linux only).
+
+    Note that this resets a process-wide counter, which is also visible to
+    other code that monitors the peak memory of the process.
+
+    Returns:
+        True if the peak was reset.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+        return True
+    except OSError:
+        return False
+
+def _max_rss():
+    """ Returns the peak resident set size of the process in bytes (or None). """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+class Profiler(object):
+    """ Records phases, call counts and solver statistics of a simulation.
+
+    The peak memory of a phase is the peak resident set size above the
+    resident memory at the start of the phase. It is only recorded with
+    memory = True on Linux, where the peak of the process is reset for every
+    phase (see reset_peak_memory()). Phases may be nested.
+
+    Args:
+        memory (bool, optional): Record the peak memory of every phase.
+    """
+    def __init__(self, memory = False):
+        self.memory = memory
+        self.phases = []
+        self.calls = dict()
+        self.solvers = []
+        self._stack = []
+        self._t0 = (time.perf_counter(), time.process_time())
+
+    @contextmanager
+    def phase(self, name):
+        """ Record wall-clock time, CPU time and peak memory of a block. """
+        hwm = memory_status('VmHWM') if self.memory else None
+        for entry in self._stack:
+            entry['hwm'] = max(entry['hwm'], hwm) if hwm is not None else None
+        reset = self.memory and reset_peak_memory()
+        entry = {'name': name, 'rss': memory_status('VmRSS') if reset else None, 'hwm': 0,
+                 'wall': time.perf_counter(), 'cpu': time.process_time()}
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - entry['wall'], time.process_time() - entry['cpu']
+            self._stack.pop()
+            hwm = memory_status('VmHWM') if self.memory else None
+            peak = None
+            if entry['rss'] is not None and hwm is not None:
+                peak = max(max(entry['hwm'], hwm) - entry['rss'], 0)
+            for outer in self._stack:
+                outer['hwm'] = max(outer['hwm'], hwm) if hwm is not None else None
+            self.phases.append({'name': name, 'depth': len(self._stack),
+                                'wall': wall, 'cpu': cpu, 'peak_memory': peak})
+
+    def count(self, name, func):
+        """ Returns func wrapped such that its calls are counted as name. """
+        if func is None:
+            return None
+        self.calls.setdefault(name, 0)
+        calls = self.calls
+        def counted(*args, **kwargs):
+            calls[name] += 1
+            return func(*args, **kwargs)
+        return counted
+
+    def odeint(self, func, y0, t, args = (), Dfun = None, **kwargs):
+        """ scipy.integrate.odeint with counted calls and solver statistics.
+
+        Returns only the solution (as odeint without full_output).
+        """
+        from scipy.integrate import odeint
+        y, info = odeint(self.count('rhs', func), y0, t, args,
+                         Dfun = self.count('jacobian', Dfun), full_output = True, **kwargs)
+        last = lambda key: info[key][-1].item() if len(info[key]) else 0
+        mused = info['mused']
+        self.solvers.append({
+            'solver': 'odeint',
+            'steps': last('nst'),
+            'rhs_evaluations': last('nfe'),
+            'jacobian_evaluations': last('nje'),
+            'method_switches': int((mused[1:] != mused[:-1]).sum()),
+            'final_method': {1: 'adams', 2: 'bdf'}.get(last('mused')),
+            'last_step_size': last('hu'),
+            'message': info['message']})
+        return y
+
+    def solve_ivp(self, fun, t_span, y0, **kwargs):
+        """ scipy.integrate.solve_ivp with counted calls and solver statistics. """
+        from scipy.integrate import solve_ivp
+        if callable(kwargs.get('jac')):
+            kwargs['jac'] = self.count('jacobian', kwargs['jac'])
+        sol = solve_ivp(self.count('rhs', fun), t_span, y0, **kwargs)
+        self.solvers.append({
+            'solver': kwargs.get('method', 'RK45'),
+            'rhs_evaluations': int(sol.nfev),
+            'jacobian_evaluations': int(sol.njev),
+            'lu_decompositions': int(sol.nlu),
+            'status': int(sol.status),
+            'message': sol.message})
+        return sol
+
+    def report(self):
+        """ Returns the profile as a dictionary (see write()). """
+        return {'phases': list(self.phases),
+                'total': {'wall': time.perf_counter() - self._t0[0],
+                          'cpu': time.process_time() - self._t0[1],
+                          'max_rss': _max_rss()},
+                'calls': dict(self.calls),
+                'solvers': list(self.solvers)}
+
+    def write(self, filename = '-'):
+        """ Write the profile as JSON report to a file ('-' is stderr). """
+        if filename == '-':
+            json.dump(self.report(), sys.stderr, indent = 1)
+            sys.stderr.write('\n')
+        else:
+            with open(filename, 'w') as fh:
+                json.dump(self.report(), fh, indent = 1)
+            logger.info(f'Wrote profile to file: {filename}')
+
+_active = None
+
+def active():
+    """ Returns the active profiler (or None). """
+    return _active
+
+def start(memory = False):
+    """ Activate and return a new profiler, see Profiler. """
+    global _active
+    if _active is not None:
+        raise ProfilingError('A profiler is already active.')
+    _active = Profiler(memory = memory)
+    return _active
+
+def stop():
+    """ Deactivate and return the active profiler. """
+    global _active
+    prof, _active = _active, None
+    return prof
+
+@contextmanager
+def profile(filename = None, memory = False):
+    """ Profile a block of code, e.g. simulations of an ODE library.
+
+    Args:
+        filename (str, optional): Write the JSON report to this file ('-' is stderr).
+        memory (bool, optional): Record the peak memory of every phase, see Profiler.
+
+    Yields:
+        The active Profiler.
+    """
+    prof = start(memory = memory)
+    try:
+        yield prof
+    finally:
+        stop()
+        if filename:
+            prof.write(filename)
+
+def phase(name):
+    """ A phase of the active profiler, or a context that does nothing. """
+    return _active.phase(name) if _active is not None else nullcontext()
@@ -7,9 +7,13 @@ Test using tests/test_reactiongraph.py.
 import logging
 logger = logging.getLogger(__name__)
 
-from sympy import sympify, Matrix, Symbol
-from typing import Dict, List, Tuple, Sequence, TypeVar, Union
-from crnsimulator.solver import writeODElib
+import numpy as np
+from array import array
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Tuple, Sequence, TypeVar, Union
+from crnsimulator.solver import writeODElib, renderODElib, compileODElib
+from crnsimulator.massaction import MassActionSystem
+from crnsimulator.profiling import phase
 
 # Type hints
 SPE = List[str]
@@ -22,45 +26,149 @@ class CRNSimulatorError(Exception):
 
 class ReactionNode(object):
     """ A Reaction-Node in the ReactionGraph class. """
+    __slots__ = ('name', 'index')
     rid = 0
-    def __init__(self, prefix: str = 'RXN:'):
-        self.name = prefix + str(ReactionNode.rid)
-        ReactionNode.rid += 1
+    def __init__(self, prefix: str = 'RXN:', rid: int = None):
+        if rid is None:
+            rid = ReactionNode.rid
+            ReactionNode.rid += 1
+        self.name = prefix + str(rid)
+        self.index = None
+
+class ODETerms(object):
+    """ The symbolic ODE terms of a ReactionGraph, maintained incrementally.
+
+    Every reaction contributes one mass-action term to the ODE of each of
+    its reactants and products (and the corresponding partial derivatives
+    to the Jacobian). Only reactions added since the last update are
+    processed, and only the rows (and Jacobian entries) they touch are
+    summed up and printed again.
+
+    Args:
+        rate_dict (bool): Use rate names k0, k1, ... instead of the rate values.
+    """
+    def __init__(self, rate_dict: bool = False):
+        self.rate_dict = rate_dict
+        self.rdict = dict()
+        self.size = 0          # number of reactions processed
+        self.jacobian = False  # whether Jacobian terms are maintained
+        self._rterms = []      # reaction index -> (reactant species IDs, term)
+        self._terms = dict()   # species ID -> list of terms
+        self._rows = dict()    # species ID -> [expression, string]
+        self._jterms = dict()  # (species ID, species ID) -> list of derivatives
+        self._jrows = dict()   # (species ID, species ID) -> [expression, string]
+
+    def update(self, graph, jacobian: bool = False) -> None:
+        """ Process all reactions that were added to the graph since the last update. """
+        # sympy is imported on first use (here and below), such that the numpy
+        # backend and cached ODE libraries do not pay for the import.
+        from sympy import sympify, Symbol
+        if jacobian and not self.jacobian:
+            self.jacobian = True
+            for j in range(self.size):
+                self._add_derivatives(graph, j)
+        for j in range(self.size, graph.number_of_reactions):
+            k = graph._rates[j]
+            if self.rate_dict:
+                rate = 'k' + str(len(self.rdict))
+                self.rdict[rate] = k
+            else:
+                rate = str(k)
+            reactants = [graph._species[sid] for sid, cnt in graph._reactants(j) for _ in range(cnt)]
+            ns = {x: Symbol(x) for x in reactants}
+            term = sympify('*'.join([rate] + reactants), locals = ns)
+            self._rterms.append(term)
+            for sid, cnt in graph._reactants(j):
+                self._terms.setdefault(sid, []).extend([-term] * cnt)
+                self._rows.pop(sid, None)
+            for sid, cnt in graph._products(j):
+                self._terms.setdefault(sid, []).extend([term] * cnt)
+                self._rows.pop(sid, None)
+            if self.jacobian:
+                self._add_derivatives(graph, j)
+        self.size = graph.number_of_reactions
+
+    def _add_derivatives(self, graph, j):
+        from sympy import Symbol
+        term = self._rterms[j]
+        derivatives = [(s, term.diff(Symbol(graph._species[s]))) for s, _ in graph._reactants(j)]
+        for sign, pairs in ((-1, graph._reactants(j)), (1, graph._products(j))):
+            for sid, cnt in pairs:
+                for s, df in derivatives:
+                    self._jterms.setdefault((sid, s), []).extend([sign * df] * cnt)
+                    self._jrows.pop((sid, s), None)
+
+    def row(self, sid: int):
+        """ Returns [expression, string] of the ODE of species sid. """
+        if sid not in self._rows:
+            from sympy import Add
+            expr = Add(*self._terms.get(sid, []))
+            self._rows[sid] = [expr, None]
+        return self._rows[sid]
+
+    def entry(self, key: Tuple[int, int]):
+        """ Returns [expression, string] of the Jacobian entry (sid, sid). """
+        if key not in self._jrows:
+            from sympy import Add
+            expr = Add(*self._jterms[key])
+            self._jrows[key] = [expr, None]
+        return self._jrows[key]
+
+    def jacobian_keys(self):
+        return self._jterms.keys()
 
 class ReactionGraph(object):
-    """ Basic Reaction Graph Object. """
-    def __init__(self, crn: CRN = None):
-        self._nodes = dict()
-        self._edges = dict()
-
-        self._in_edges = dict()  # list(x.in_edges(node))
-        self._out_edges = dict() # list(x.out_edges(node))
-        if crn: 
+    """ Basic Reaction Graph Object.
+
+    Species are interned as integer IDs (in order of appearance) and reactions
+    are stored with contiguous indices. Reactant and product stoichiometries
+    are kept as CSR arrays (one row per reaction), together with the
+    transposed per-species adjacency. ReactionNode objects and the networkx
+    style views (nodes, edges, predecessors, ...) are only created on demand
+    and cached until the next reaction is added.
+    """
+    def __init__(self, crn: Iterable[RXN] = None):
+        self._species = []          # species ID -> name
+        self._sindex = dict()       # name -> species ID
+        self._first = array('q')    # species ID -> reaction of first appearance
+        self._consumers = []        # species ID -> reactions consuming it
+        self._producers = []        # species ID -> reactions producing it
+
+        self._rates = []            # reaction index -> rate
+        self._rid0 = []             # reaction index -> ReactionNode.rid
+        self._rptr = array('q', [0])
+        self._ridx = array('q')
+        self._rcnt = array('q')
+        self._pptr = array('q', [0])
+        self._pidx = array('q')
+        self._pcnt = array('q')
+
+        self._rnodes = []           # lazily created ReactionNode objects
+        self._cache = dict()        # cached views, cleared by add_reaction
+        self._odes = dict()         # rate_dict -> ODETerms
+        if crn is not None:
             self.add_reactions(crn)
 
-    def add_reactions(self, crn: CRN) -> None:
-        assert isinstance(crn, list)
+    def add_reactions(self, crn: Iterable[RXN]) -> None:
+        """Add reactions from a list or any other iterable (e.g. a parser stream)."""
         for rxn in crn:
             self.add_reaction(rxn)
 
     def add_reaction(self, rxn: RXN) -> None:
-        def add_node(node, **kwargs):
-            assert node not in self._nodes
-            self._nodes[node] = kwargs
-            self._in_edges[node] = set()
-            self._out_edges[node] = set()
-        def add_edge(n1, n2):
-            if n1 not in self.nodes:
-                add_node(n1)
-            if n2 not in self.nodes:
-                add_node(n2)
-            count = self._edges.get((n1, n2), 0)
-            self._edges[(n1, n2)] = count + 1
-
-            self._out_edges[n1].add(n2)
-            self._in_edges[n2].add(n1)
+        def intern(species, j):
+            counts = dict()
+            for s in species:
+                assert isinstance(s, str)
+                if s not in self._sindex:
+                    self._sindex[s] = len(self._species)
+                    self._species.append(s)
+                    self._first.append(j)
+                    self._consumers.append([])
+                    self._producers.append([])
+                sid = self._sindex[s]
+                counts[sid] = counts.get(sid, 0) + 1
+            return counts
         assert len(rxn) == 3
-        n = ReactionNode()
         if isinstance(rxn[2], list):
             # TODO: maybe we should enforce a consistent format here.
             #
@@ -70,49 +178,149 @@ class ReactionGraph(object):
             # logger.warning('Using deprecated format for irreversible reactions.')
             rxn[2] = rxn[2][0]
 
-        add_node(n, rate = rxn[2])
-        for r in rxn[0]:
-            assert isinstance(r, str)
-            add_edge(r, n)
-        for p in rxn[1]:
-            assert isinstance(p, str)
-            add_edge(n, p)
+        j = len(self._rates)
+        reactants = intern(rxn[0], j)
+        products = intern(rxn[1], j)
+        self._rates.append(rxn[2])
+        self._rid0.append(ReactionNode.rid)
+        ReactionNode.rid += 1
+        for sid, cnt in reactants.items():
+            self._ridx.append(sid)
+            self._rcnt.append(cnt)
+            self._consumers[sid].append(j)
+        self._rptr.append(len(self._ridx))
+        for sid, cnt in products.items():
+            self._pidx.append(sid)
+            self._pcnt.append(cnt)
+            self._producers[sid].append(j)
+        self._pptr.append(len(self._pidx))
+        self._cache.clear()
         return
 
+    def _cached(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def _reaction_node(self, j):
+        while len(self._rnodes) <= j:
+            n = ReactionNode(rid = self._rid0[len(self._rnodes)])
+            n.index = len(self._rnodes)
+            self._rnodes.append(n)
+        return self._rnodes[j]
+
+    def _reaction_index(self, node):
+        j = node.index
+        if j is None or j >= len(self._rnodes) or self._rnodes[j] is not node:
+            raise KeyError(node)
+        return j
+
+    def _reactants(self, j):
+        """ Returns the (species ID, count) pairs of reactants of reaction j. """
+        return zip(self._ridx[self._rptr[j]:self._rptr[j + 1]],
+                   self._rcnt[self._rptr[j]:self._rptr[j + 1]])
+
+    def _products(self, j):
+        """ Returns the (species ID, count) pairs of products of reaction j. """
+        return zip(self._pidx[self._pptr[j]:self._pptr[j + 1]],
+                   self._pcnt[self._pptr[j]:self._pptr[j + 1]])
+
+    @property
+    def number_of_reactions(self) -> int:
+        return len(self._rates)
+
+    @property
+    def number_of_species(self) -> int:
+        return len(self._species)
+
+    @property
+    def species_index(self) -> Dict[str, int]:
+        """ A read-only mapping from species names to the interned species IDs. """
+        return MappingProxyType(self._sindex)
+
+    @property
+    def rates(self) -> list:
+        """ The rates in reaction order. """
+        return list(self._rates)
+
+    @property
+    def reactant_csr(self):
+        """ The reactant stoichiometry as CSR arrays (indptr, species IDs, counts). """
+        return self._cached('reactant_csr', lambda: tuple(
+            np.frombuffer(a, dtype = np.int64).copy() for a in (self._rptr, self._ridx, self._rcnt)))
+
+    @property
+    def product_csr(self):
+        """ The product stoichiometry as CSR arrays (indptr, species IDs, counts). """
+        return self._cached('product_csr', lambda: tuple(
+            np.frombuffer(a, dtype = np.int64).copy() for a in (self._pptr, self._pidx, self._pcnt)))
+
     @property
     def reactions(self):
-        return [n for n in self.nodes if isinstance(n, ReactionNode)]
+        return self._cached('reactions', lambda: [
+            self._reaction_node(j) for j in range(len(self._rates))])[:]
 
     @property
     def species(self):
-        return [n for n in self.nodes if not isinstance(n, ReactionNode)]
+        return self._species[:]
 
     @property
     def reactants(self):
-        return [n for n in self.nodes if not isinstance(n, ReactionNode)
-                and self.successors(n)]
+        return self._cached('reactants', lambda: [
+            s for e, s in enumerate(self._species) if self._consumers[e]])[:]
 
     @property
     def products(self):
-        return [n for n in self.nodes if not isinstance(n, ReactionNode)
-                and self.predecessors(n)]
+        return self._cached('products', lambda: [
+            s for e, s in enumerate(self._species) if self._producers[e]])[:]
 
     @property
     def nodes(self):
-        return self._nodes
+        """ A (read-only) dictionary of all nodes and their attributes. """
+        def nodes():
+            nodes, sid = dict(), 0
+            for j, rxn in enumerate(self.reactions):
+                nodes[rxn] = {'rate': self._rates[j]}
+                while sid < len(self._species) and self._first[sid] == j:
+                    nodes[self._species[sid]] = {}
+                    sid += 1
+            return nodes
+        return self._cached('nodes', nodes)
 
     @property
     def edges(self):
-        return self._edges
+        """ A (read-only) dictionary of all edges and their multiplicities. """
+        def edges():
+            edges = dict()
+            for j, rxn in enumerate(self.reactions):
+                for sid, cnt in self._reactants(j):
+                    edges[(self._species[sid], rxn)] = cnt
+                for sid, cnt in self._products(j):
+                    edges[(rxn, self._species[sid])] = cnt
+            return edges
+        return self._cached('edges', edges)
 
     def predecessors(self, node):
-        return self._in_edges[node]
+        if isinstance(node, ReactionNode):
+            j = self._reaction_index(node)
+            return set(self._species[sid] for sid, _ in self._reactants(j))
+        return set(self._reaction_node(j) for j in self._producers[self._sindex[node]])
 
     def successors(self, node):
-        return self._out_edges[node]
+        if isinstance(node, ReactionNode):
+            j = self._reaction_index(node)
+            return set(self._species[sid] for sid, _ in self._products(j))
+        return set(self._reaction_node(j) for j in self._consumers[self._sindex[node]])
 
     def number_of_edges(self, n1, n2):
-        return self._edges[(n1, n2)]
+        if isinstance(n2, ReactionNode):
+            sid, pairs = self._sindex[n1], self._reactants(self._reaction_index(n2))
+        else:
+            sid, pairs = self._sindex[n2], self._products(self._reaction_index(n1))
+        for s, cnt in pairs:
+            if s == sid:
+                return cnt
+        raise KeyError((n1, n2))
 
     def write_ODE_lib(self, 
             sorted_vars: List[str] = None, 
@@ -122,21 +330,181 @@ class ReactionGraph(object):
             rate_dict: bool = False,
             odename: str = 'odesystem', 
             filename: str = './odesystem', 
-            template: str = None):
+            template: str = None,
+            digest: str = None,
+            flux: bool = False,
+            reduce: bool = False):
         """
         Produce ODE system, load a template file and write an executable python script.
+
+        With flux = True, the generated code computes every reaction flux
+        (and partial flux of the Jacobian) only once, see _flux_source().
+        With reduce = True, the conservation laws are written into the script,
+        which then integrates only the independent species (see conservation_laws()).
+        """
+
+        if concvect and len(concvect) != len(sorted_vars):
+            raise CRNSimulatorError('Concentrations cannot be mapped to species!')
+
+        with phase('odes'):
+            if flux:
+                V, M, J, R, F, P = self._flux_source(sorted_vars, const, jacobian, rate_dict)
+            else:
+                V, M, J, R = self._ode_source(sorted_vars, const, jacobian, rate_dict)
+                F, P = None, None
+
+        with phase('codegen'):
+            laws = self.conservation_laws(V, const) if reduce else None
+            return writeODElib(V, M, const = const, jacobian = J, rdict = R, 
+                               concvect = concvect, odename = odename, filename = filename, 
+                               template = template, digest = digest, 
+                               reactions = self.indexed_reactions(V), 
+                               fluxes = F, partials = P, conservation = laws)
+
+    def compile(self, 
+            sorted_vars: List[str] = None, 
+            concvect: List[float] = None, 
+            const: List[bool] = None,
+            jacobian: bool = False, 
+            rate_dict: bool = False,
+            odename: str = 'odesystem', 
+            filename: str = None, 
+            template: str = None,
+            backend: str = 'sympy',
+            flux: bool = False,
+            reduce: bool = False):
         """
+        Produce ODE system and compile it together with the template into a module.
+
+        The module is built in memory, it provides the ODE function (odename),
+        the jacobian (if requested) and the integrate function of the template.
+        Writing the executable python script is optional (filename).
+
+        Backends:
+          - 'sympy': Symbolic derivation and code generation (same as write_ODE_lib).
+                     With flux = True, the code computes every reaction flux once.
+          - 'numpy': A vectorized MassActionSystem, no sympy and no code generation.
+          - 'numba': Same as 'numpy', but the RHS and Jacobian are evaluated by
+                     compiled (and cached) numba kernels, if numba is installed.
 
+        With reduce = True, the module integrates only the independent species
+        and reconstructs the others from the conservation laws.
+        """
+        if sorted_vars is None:
+            sorted_vars = sorted(self.species)
         if concvect and len(concvect) != len(sorted_vars):
             raise CRNSimulatorError('Concentrations cannot be mapped to species!')
 
-        V, M, J, R = self.ode_system(sorted_vars = sorted_vars, 
-                                     const = const,
-                                     jacobian = jacobian, 
-                                     rate_dict = rate_dict)
+        namespace = dict()
+        F, P = None, None
+        with phase('odes'):
+            if backend == 'sympy' and flux:
+                V, M, J, R, F, P = self._flux_source(sorted_vars, const, jacobian, rate_dict)
+            elif backend == 'sympy':
+                V, M, J, R = self._ode_source(sorted_vars, const, jacobian, rate_dict)
+            elif backend in ('numpy', 'numba'):
+                if filename:
+                    raise CRNSimulatorError(
+                            f'Cannot write an executable script with {backend} backend.')
+                system = self.mass_action_system(sorted_vars = sorted_vars, const = const,
+                                                 jit = backend == 'numba')
+                V, M, J, R = sorted_vars, None, jacobian, system.rates
+                namespace[odename] = system
+                namespace['sparse_jacobian'] = system.jacobian
+                if jacobian:
+                    namespace['jacobian'] = system.dense_jacobian
+            else:
+                raise CRNSimulatorError(f'Unknown backend: {backend}.')
+
+        with phase('codegen'):
+            laws = self.conservation_laws(V, const) if reduce else None
+            source = renderODElib(V, M, const = const, jacobian = J, rdict = R, 
+                                  concvect = concvect, odename = odename, 
+                                  filename = filename or odename, template = template, 
+                                  reactions = self.indexed_reactions(V),
+                                  fluxes = F, partials = P, conservation = laws)
+            if filename:
+                if filename[-3:] != '.py':
+                    filename += '.py'
+                with open(filename, 'w') as ofile:
+                    ofile.write(source)
+        with phase('compile'):
+            return compileODElib(source, name = odename, namespace = namespace)
+
+    def indexed_reactions(self, sorted_vars: List[str] = None) -> List[
+            Tuple[List[int], List[int], str]]:
+        """Translate the reaction graph into a list of indexed reactions.
+
+        Every reaction is returned as [reactants, products, rate], where
+        reactants and products are lists of indices with respect to
+        sorted_vars, and stoichiometry is expressed by repetition. The order of
+        reactions corresponds to the rate names of get_odes(rate_dict = True).
+        """
+        if sorted_vars is None:
+            sorted_vars = sorted(self.species)
+        elif len(sorted_vars) != len(self.species):
+            raise CRNSimulatorError('Species cannot be mapped to the reaction graph!')
+        index = {str(s): e for e, s in enumerate(sorted_vars)}
+        perm = np.array([index[s] for s in self._species], dtype = np.int64)
+
+        def expand(indptr, indices, counts):
+            # Repeat species by their counts and sort them within every reaction.
+            rows = np.repeat(np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)), counts)
+            vals = np.repeat(perm[indices], counts) if len(perm) else indices
+            vals = vals[np.lexsort((vals, rows))].tolist()
+            eptr = np.concatenate(([0], np.cumsum(counts)))[indptr].tolist()
+            return [vals[a:b] for a, b in zip(eptr, eptr[1:])]
+
+        return [list(x) for x in zip(expand(*self.reactant_csr),
+                                     expand(*self.product_csr), self._rates)]
+
+    def mass_action_system(self, 
+            sorted_vars: List[str] = None, 
+            const: List[bool] = None,
+            jit: bool = False) -> MassActionSystem:
+        """Translate the reaction graph into a numeric mass-action ODE system.
+
+        In contrast to ode_system(), this does neither use sympy nor code
+        generation. The returned object can be passed directly to odeint.
+        With jit = True, the RHS and Jacobian are evaluated by numba kernels
+        (falls back to numpy with a warning if numba is not installed).
+        """
+        if sorted_vars is None:
+            sorted_vars = sorted(self.species)
+        if const and len(const) != len(sorted_vars):
+            raise CRNSimulatorError('Constant flags cannot be mapped to species!')
+        reactions = self.indexed_reactions(sorted_vars)
+        if jit:
+            from crnsimulator.jit import NumbaMassActionSystem, jit_available
+            if jit_available():
+                return NumbaMassActionSystem(sorted_vars, reactions, const)
+            logger.warning('Numba is not installed, using the numpy backend instead.')
+        return MassActionSystem(sorted_vars, reactions, const)
+
+    def conservation_laws(self, 
+            sorted_vars: List[str] = None, 
+            const: List[bool] = None) -> Tuple[np.ndarray, List[int]]:
+        """Returns the conservation laws (L, pivots) of the reaction network.
+
+        The rows of L span the left null space of the stoichiometry matrix,
+        with L[:, pivots] = I, see crnsimulator.reduction.conservation_laws().
+        """
+        from crnsimulator.reduction import conservation_laws
+        return conservation_laws(self.mass_action_system(sorted_vars, const).stoichiometry)
+
+    def stochastic_system(self, 
+            sorted_vars: List[str] = None, 
+            const: List[bool] = None) -> MassActionSystem:
+        """Translate the reaction graph into a system for stochastic simulation.
 
-        return writeODElib(V, M, const = const, jacobian = J, rdict = R, concvect = concvect,
-                           odename = odename, filename = filename, template = None)
+        See crnsimulator.stochastic.StochasticSystem.
+        """
+        from crnsimulator.stochastic import StochasticSystem
+        if sorted_vars is None:
+            sorted_vars = sorted(self.species)
+        if const and len(const) != len(sorted_vars):
+            raise CRNSimulatorError('Constant flags cannot be mapped to species!')
+        return StochasticSystem(sorted_vars, self.indexed_reactions(sorted_vars), const)
 
     def ode_system(self, 
             sorted_vars: List[str] = None, 
@@ -147,43 +515,137 @@ class ReactionGraph(object):
                                               Union[sM, None], 
                                               Union[Dict[str, str], None]]:
 
-        odict, R = self.get_odes(rate_dict = rate_dict)
+        V, M, J, R = self._ode_terms(sorted_vars, const, jacobian, rate_dict)
+        from sympy import Matrix, SparseMatrix
+        M = Matrix([expr for expr, _ in M])
+        if jacobian:
+            J = SparseMatrix(len(V), len(V), {k: expr for k, (expr, _) in J.items()})
+        return V, M, J, R
+
+    def _ode_source(self, sorted_vars, const, jacobian, rate_dict):
+        """ The printed ODEs and Jacobian entries, as used by renderODElib(). """
+        V, M, J, R = self._ode_terms(sorted_vars, const, jacobian, rate_dict, printed = True)
+        M = [x for _, x in M]
+        J = {k: x for k, (_, x) in J.items()} if jacobian else None
+        return V, M, J, R
+
+    def _flux_source(self, sorted_vars, const, jacobian, rate_dict):
+        """ The flux-based ODEs and Jacobian entries, as used by renderODElib().
+
+        Every reaction flux _v{j} (and every partial flux _dv{j}_{i} with
+        respect to reactant i) is computed once, the ODEs and the Jacobian
+        entries are signed stoichiometric sums of (partial) fluxes. The code
+        is built directly from the stoichiometry arrays, i.e. without sympy.
+
+        Returns:
+            sorted_vars, ODE strings, Jacobian strings {(i, j): str} (or None),
+            rate dictionary, flux lines, partial flux lines (or None).
+        """
+        if sorted_vars is None:
+            sorted_vars = sorted(self._species)
+        sorted_vars = list(map(str, sorted_vars))
+        if len(sorted_vars) != len(self._species):
+            raise CRNSimulatorError('Species cannot be mapped to the reaction graph!')
+        index = {s: e for e, s in enumerate(sorted_vars)}
+        perm = [index[s] for s in self._species]
+
+        def monomial(factors):
+            return '*'.join(factors) if factors else '1'
+
+        def power(x, c):
+            return x if c == 1 else f'{x}**{c}'
+
+        def signed_sum(terms):
+            out = ''
+            for coef, name in terms:
+                sign = '-' if coef < 0 else '+'
+                mag = f'{abs(coef)}*{name}' if abs(coef) != 1 else name
+                out = f'{out} {sign} {mag}' if out else (f'-{mag}' if coef < 0 else mag)
+            return out if out else '0'
+
+        R, fluxes, partials = dict(), [], []
+        rows = [[] for _ in sorted_vars]
+        jrows = dict()
+        for j, k in enumerate(self._rates):
+            if rate_dict:
+                rate = 'k' + str(j)
+                R[rate] = k
+            else:
+                rate = str(k)
+            reactants = [(perm[sid], cnt) for sid, cnt in self._reactants(j)]
+            fluxes.append(f'_v{j} = ' + monomial([rate] + 
+                [power(sorted_vars[i], c) for i, c in reactants]))
+            net = dict()
+            for sid, cnt in self._reactants(j):
+                net[perm[sid]] = net.get(perm[sid], 0) - cnt
+            for sid, cnt in self._products(j):
+                net[perm[sid]] = net.get(perm[sid], 0) + cnt
+            net = [(i, c) for i, c in net.items() if c and not (const and const[i])]
+            for i, c in net:
+                rows[i].append((c, f'_v{j}'))
+            if jacobian and net:
+                for s, cs in reactants:
+                    name = f'_dv{j}_{s}'
+                    factors = [rate] if cs == 1 else [str(cs), rate]
+                    if cs > 1:
+                        factors.append(power(sorted_vars[s], cs - 1))
+                    factors.extend(power(sorted_vars[i], c) for i, c in reactants if i != s)
+                    partials.append(f'{name} = ' + monomial(factors))
+                    for i, c in net:
+                        jrows.setdefault((i, s), []).append((c, name))
+
+        M = ['0' if const and const[e] else signed_sum(rows[e]) for e in range(len(sorted_vars))]
+        J = {key: signed_sum(terms) for key, terms in jrows.items()} if jacobian else None
+        return sorted_vars, M, J, R, fluxes, partials if jacobian else None
+
+    def _ode_terms(self, sorted_vars, const, jacobian, rate_dict, printed = False):
+        """ Update the ODE terms and return them in order of sorted_vars.
+
+        Returns sorted_vars (as Symbols), a list of [expression, string] per
+        species, a dictionary {(i, j): [expression, string]} of nonzero
+        Jacobian entries (or None) and the rate dictionary. The strings are
+        only computed (and cached) if printed is True.
+        """
+        from sympy import sympify, Symbol
+        if rate_dict not in self._odes:
+            self._odes[rate_dict] = ODETerms(rate_dict)
+        odes = self._odes[rate_dict]
+        odes.update(self, jacobian = jacobian)
 
         if sorted_vars:
             sorted_vars = list(map(Symbol, sorted_vars))
-            assert len(sorted_vars) == len(list(odict.keys()))
+            assert len(sorted_vars) == len(self._species)
         else:
-            sorted_vars = sorted(list(odict.keys()), key=lambda x: str(x))
+            sorted_vars = sorted(map(Symbol, self._species), key=lambda x: str(x))
 
-        # Symbol namespace dictionary, translates every variable name into a Symbol,
-        #   even awkward names such as 'sin' or 'cos'
-        ns = dict(zip(map(str, sorted_vars), sorted_vars))
+        def printed_entry(entry):
+            if printed and entry[1] is None:
+                entry[1] = str(entry[0])
+            return entry
 
-        M = []
-        for e, dx in enumerate(sorted_vars):
-            if const and const[e]:
-                sfunc = sympify('0')
-            else:
-                sfunc = sympify(
-                    ' + '.join(['*'.join(map(str, xp)) for xp in odict[dx]]), locals=ns)
-            odict[dx] = sfunc
-            M.append(sfunc)
-        M = Matrix(M)
+        index = {str(x): e for e, x in enumerate(sorted_vars)}
+        sids = [self._sindex[str(x)] for x in sorted_vars]
+        zero = [sympify('0'), '0']
+        M = [zero if const and const[e] else printed_entry(odes.row(sid))
+                for e, sid in enumerate(sids)]
 
+        J = None
         if jacobian:
-            logger.debug('Calculate Jacobi matrix.')
+            logger.debug('Calculate sparse Jacobi matrix.')
             # NOTE: The sympy version breaks regularly:
             # J = M.jacobian(sorted_vars)
-            # ... so it is done per pedes:
-            J = []
-            for f in M:
-                for x in sorted_vars:
-                    J.append(f.diff(x))
-            J = Matrix(J)
-        else:
-            J = None
-
-        return sorted_vars, M, J, R 
+            # ... so it is done per pedes, using the partial derivatives of
+            # every mass-action term, i.e. only for entries that can be
+            # nonzero according to the reaction graph adjacency.
+            J = dict()
+            for (si, sj) in odes.jacobian_keys():
+                i, j = index[self._species[si]], index[self._species[sj]]
+                if const and const[i]:
+                    continue
+                entry = odes.entry((si, sj))
+                if entry[0] != 0:
+                    J[(i, j)] = printed_entry(entry)
+        return sorted_vars, M, J, dict(odes.rdict)
 
     def get_odes(self, rate_dict: bool = False) -> Tuple[
             Dict[str, List[str]], Union[Dict[str, str], None]]:
@@ -192,22 +654,17 @@ class ReactionGraph(object):
         rdict = dict()
         odes = dict()
 
-        for rxn in self.reactions:
+        from sympy import Symbol
+        names = [Symbol(s) for s in self._species]
+        for j, k in enumerate(self._rates):
             if rate_dict:
-                rate = 'k' + str(len(list(rdict.keys())))
-                rdict[rate] = self.nodes[rxn]['rate']
+                rate = 'k' + str(len(rdict))
+                rdict[rate] = k
             else:
-                rate = str(self.nodes[rxn]['rate'])
+                rate = str(k)
 
-            reactants = []
-            for reac in self.predecessors(rxn):
-                for i in range(self.number_of_edges(reac, rxn)):
-                    reactants.append(Symbol(reac))
-
-            products = []
-            for prod in self.successors(rxn):
-                for i in range(self.number_of_edges(rxn, prod)):
-                    products.append(Symbol(prod))
+            reactants = [names[sid] for sid, cnt in self._reactants(j) for _ in range(cnt)]
+            products = [names[sid] for sid, cnt in self._products(j) for _ in range(cnt)]
 
             for x in reactants:
                 if x in odes:
@@ -222,5 +679,3 @@ class ReactionGraph(object):
                     odes[x] = [[rate] + reactants]
 
         return odes, rdict
-
-
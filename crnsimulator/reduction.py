@@ -0,0 +1,209 @@
+"""
+Conservation laws and dimension reduction of ODE systems.
+
+Test using tests/test_reduction.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from scipy import sparse
+from scipy.linalg import null_space, qr
+from scipy.sparse.csgraph import connected_components
+from scipy.integrate import odeint, solve_ivp
+
+from crnsimulator import profiling
+
+class ReductionError(Exception):
+    pass
+
+def conservation_laws(stoichiometry, tol = 1e-10):
+    """ Returns a basis of the conservation laws of a stoichiometry matrix.
+
+    The conservation laws are the rows of L with L @ S = 0, i.e. L @ x is
+    constant for every solution x(t) of dx/dt = S @ v(x). Species with
+    constant concentrations have zero rows in S, and hence a trivial
+    conservation law each. The basis is in reduced row echelon form with
+    respect to the pivot species: L[:, pivots] is the identity matrix.
+
+    Args:
+        stoichiometry (scipy.sparse matrix or numpy.ndarray): The (n x m) matrix S.
+        tol (flt, optional): Entries smaller than tol are set to zero.
+
+    Returns:
+        L (numpy.ndarray) with shape (laws, n), pivots (list[int])
+    """
+    S = sparse.csr_matrix(stoichiometry, dtype = float, copy = True)
+    n = S.shape[0]
+    # Conservation laws decompose over the connected components of species
+    # that share reactions, hence the null space is computed per component.
+    A = abs(S) @ abs(S).T
+    ncomp, labels = connected_components(A, directed = False)
+    order = np.argsort(labels, kind = 'stable')
+    bounds = np.searchsorted(labels[order], np.arange(ncomp + 1))
+
+    L, pivots = [], []
+    for c in range(ncomp):
+        idx = order[bounds[c]:bounds[c + 1]]
+        Sc = S[idx].toarray()
+        Sc = Sc[:, np.any(Sc != 0, axis = 0)]
+        N = null_space(Sc.T).T if Sc.shape[1] else np.eye(len(idx))
+        if len(N) == 0:
+            continue
+        _, _, perm = qr(N, pivoting = True)
+        piv = np.sort(perm[:len(N)])
+        Lc = np.zeros((len(N), n))
+        Lc[:, idx] = np.linalg.solve(N[:, piv], N)
+        L.append(Lc)
+        pivots.extend(idx[piv].tolist())
+    if not L:
+        return np.zeros((0, n)), []
+    L = np.concatenate(L)
+    L[np.abs(L) < tol] = 0
+    R = np.rint(L)
+    L = np.where(np.abs(L - R) < tol, R, L)
+    # Sort the laws by their pivot species.
+    perm = np.argsort(pivots)
+    return L[perm], [pivots[i] for i in perm]
+
+def constant_laws(const):
+    """ Returns the trivial conservation laws (L, pivots) of constant species.
+
+    Args:
+        const (list[bool]): Species with constant concentrations.
+    """
+    const = np.asarray(const, dtype = bool)
+    pivots = np.flatnonzero(const).tolist()
+    L = np.zeros((len(pivots), len(const)))
+    L[np.arange(len(pivots)), pivots] = 1
+    return L, pivots
+
+class ReducedSystem(object):
+    """ An ODE system without the species that are determined by conservation laws.
+
+    For conservation laws L with L[:, pivots] = I (see conservation_laws()),
+    the pivot (dependent) species are x_p = T - L[:, free] @ x_free, where
+    T = L @ p0 are the conserved totals. The reduced system integrates only
+    the free species, and its Jacobian
+
+        J_red = J[free, free] - J[free, pivots] @ L[:, free]
+
+    is regular for systems whose singularity is only due to conservation
+    laws. Constant species have trivial conservation laws (see
+    constant_laws()), i.e. they are bound to their initial concentrations.
+
+    Args:
+        f (function): The right-hand side f(x, t) of the full system.
+        jac (function): The Jacobian jac(x, t) of the full system (dense or
+            sparse), or None.
+        laws (tuple): Conservation laws (L, pivots), see conservation_laws().
+        p0 (list[flt]): The initial concentrations of the full system.
+    """
+    def __init__(self, f, jac, laws, p0):
+        self.f, self.jac = f, jac
+        x0 = np.array(p0, dtype = float)
+        L, pivots = laws
+        L = np.array(L, dtype = float).reshape(-1, len(x0))
+        self.n = len(x0)
+        self.pivots = np.array(pivots, dtype = int)
+        self.free = np.setdiff1d(np.arange(self.n), self.pivots)
+        if len(self.pivots) != len(L) or not np.allclose(L[:, self.pivots], np.eye(len(L))):
+            raise ReductionError('Conservation laws must be in echelon form (see conservation_laws).')
+        self.totals = L @ x0
+        self.Lfree = L[:, self.free]
+        self._Lfree = sparse.csr_matrix(self.Lfree)
+        self.z0 = x0[self.free]
+
+    def expand(self, z):
+        """ Returns the full state(s) for reduced state(s) z with shape (free, ...). """
+        z = np.asarray(z, dtype = float)
+        x = np.empty((self.n,) + z.shape[1:])
+        x[self.free] = z
+        x[self.pivots] = self.totals.reshape((-1,) + (1,) * (z.ndim - 1)) - self.Lfree @ z
+        return x
+
+    def __call__(self, z, t0 = None):
+        return np.asarray(self.f(self.expand(z), t0))[self.free]
+
+    def jacobian(self, z, t0 = None):
+        """ Returns the Jacobian of the reduced system (dense or sparse, as jac). """
+        J = self.jac(self.expand(z), t0)
+        if sparse.issparse(J):
+            J = sparse.csr_matrix(J)[self.free]
+            return (J[:, self.free] - J[:, self.pivots] @ self._Lfree).tocsr()
+        J = np.asarray(J)[self.free]
+        return J[:, self.free] - J[:, self.pivots] @ self.Lfree
+
+    def dense_jacobian(self, z, t0 = None):
+        J = self.jacobian(z, t0)
+        return J.toarray() if sparse.issparse(J) else J
+
+    def integrate(self, time, method = 'odeint', atol = None, rtol = None, mxstep = 0,
+                  stop_at_steady_state = None, truncate = False):
+        """ Integrate the reduced system and return the trajectories of the full system.
+
+        Args:
+            time (list[flt]): The time points for which the solution is returned.
+            method (str, optional): 'odeint' or a solve_ivp method.
+            atol (flt, optional): Absolute tolerance of the solver.
+            rtol (flt, optional): Relative tolerance of the solver.
+            mxstep (int, optional): Maximum number of steps per time point (odeint only).
+            stop_at_steady_state (flt, optional): Stop as soon as the largest
+                absolute derivative drops below this tolerance ('odeint' is
+                replaced by 'LSODA').
+            truncate (bool, optional): Omit the time points after an early stop,
+                instead of padding them with the final state. The state at the
+                stop is appended as the last time point.
+
+        Returns:
+            A numpy.ndarray of trajectories with shape (n, len(time)). With
+            stop_at_steady_state and truncate, a tuple (time, trajectories)
+            that ends at the stop.
+        """
+        logger.info(f'Integrating {len(self.free)} of {self.n} species ' + \
+                    f'({len(self.pivots)} conservation laws).')
+        truncate = truncate and stop_at_steady_state is not None
+        steady = lambda z: np.max(np.abs(self(z)), initial = 0) <= stop_at_steady_state
+        if len(self.free) == 0 or (stop_at_steady_state is not None and steady(self.z0)):
+            y0 = self.expand(self.z0)[:, None]
+            if truncate:
+                return np.asarray(time[:1], dtype = float), y0
+            return np.repeat(y0, len(time), axis = 1)
+        if stop_at_steady_state is not None and method == 'odeint':
+            method = 'LSODA' # odeint does not support events.
+        prof = profiling.active()
+        if method == 'odeint':
+            Dfun = self.dense_jacobian if self.jac else None
+            solver = prof.odeint if prof else odeint
+            ny = solver(self, self.z0, time, Dfun = Dfun,
+                        atol = atol, rtol = rtol, mxstep = mxstep).T
+            return self.expand(ny)
+
+        kwargs = {'atol': atol if atol else 1.49012e-8,
+                  'rtol': rtol if rtol else 1.49012e-8}
+        if self.jac and method in ('BDF', 'Radau'):
+            kwargs['jac'] = lambda t, z: self.jacobian(z, t)
+        elif self.jac and method == 'LSODA':
+            kwargs['jac'] = lambda t, z: self.dense_jacobian(z, t)
+        if stop_at_steady_state is not None:
+            event = lambda t, z: np.max(np.abs(self(z)), initial = 0) - stop_at_steady_state
+            event.terminal, event.direction = True, -1
+            kwargs['events'] = event
+        solver = prof.solve_ivp if prof else solve_ivp
+        sol = solver(lambda t, z: self(z, t), (time[0], time[-1]), self.z0,
+                     method = method, t_eval = time, **kwargs)
+        if not sol.success:
+            raise ReductionError(f'Integration failed: {sol.message}')
+        nz = sol.y
+        if truncate:
+            t = sol.t
+            if sol.status == 1 and (len(t) == 0 or t[-1] < sol.t_events[0][0]):
+                # Append the state at the stop, which is between two time points.
+                t = np.append(t, sol.t_events[0][:1])
+                nz = np.concatenate((nz, sol.y_events[0][:1].T), axis = 1)
+            return t, self.expand(nz)
+        if sol.status == 1:
+            pad = np.repeat(sol.y_events[0][:1].T, len(time) - nz.shape[1], axis = 1)
+            nz = np.concatenate((nz, pad), axis = 1)
+        return self.expand(nz)
@@ -0,0 +1,125 @@
+"""
+Forward sensitivity analysis of mass-action ODE systems with respect to rate constants.
+
+Test using tests/test_sensitivity.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from scipy import sparse
+from scipy.integrate import odeint, solve_ivp
+
+class SensitivityError(Exception):
+    pass
+
+class Sensitivity(object):
+    """ The ODE system augmented by the forward sensitivities s_p = dx/dk_p.
+
+    The sensitivities of a mass-action system dx/dt = S @ (k * prod(x**R))
+    follow the linear ODEs
+
+        ds_p/dt = J(x) @ s_p + S[:, p] * prod(x**R[:, p]), s_p(0) = 0,
+
+    which are integrated together with x in one state vector [x, s_1, ...,
+    s_P]. The Jacobian used by implicit solvers is block-diagonal with the
+    Jacobian J(x) of the system in every block, i.e. the coupling of the
+    sensitivities to x is neglected. This approximation only affects the
+    convergence of the Newton iterations, not the accuracy of the solution.
+    The Jacobian values of the system are computed once per evaluation and
+    copied into every block.
+
+    Args:
+        system (:obj:`crnsimulator.MassActionSystem()`): The ODE system.
+        p0 (list[flt]): The initial concentrations.
+        r (dict, optional): The rates (see MassActionSystem.rate_vector()).
+        params (list[str], optional): The rate names (e.g. k0, k1) of the
+            sensitivities. Defaults to all rates.
+    """
+    def __init__(self, system, p0, r = None, params = None):
+        self.system = system
+        self.p0 = np.array(p0, dtype = float)
+        self.n = len(system.svars)
+        if len(self.p0) != self.n:
+            raise SensitivityError('Initial concentrations cannot be mapped to species!')
+        self.k = system.rate_vector(r)
+        self.params = list(system.rnames) if params is None else list(params)
+        try:
+            self.pidx = np.array([system.rnames.index(p) for p in self.params], dtype = int)
+        except ValueError as err:
+            raise SensitivityError(f'Unknown rate: {err}')
+        self.P = len(self.pidx)
+        self._S = system.stoichiometry[:, self.pidx].tocsr() if self.P else None
+        self._ones = np.ones(len(self.k))
+
+        # The block-diagonal structure of the augmented Jacobian.
+        J, B = system.jacobian_sparsity, self.P + 1
+        nnz, offsets = J.nnz, np.arange(B)[:, None]
+        indices = (J.indices[None, :] + self.n * offsets).ravel()
+        indptr = np.append((J.indptr[:-1][None, :] + nnz * offsets).ravel(), B * nnz)
+        self._jac = sparse.csr_matrix((np.zeros(B * nnz), indices, indptr),
+                                      shape = (B * self.n, B * self.n))
+
+    def __call__(self, y, t0 = None):
+        x, s = y[:self.n], y[self.n:].reshape(self.P, self.n)
+        dx = self.system(x, t0, self.k)
+        if not self.P:
+            return dx
+        J = self.system.jacobian(x, t0, self.k)
+        mono = self.system.flux(x, self._ones)[self.pidx]
+        ds = (J @ s.T + self._S.multiply(mono[None, :])).T
+        return np.concatenate((dx, np.asarray(ds).ravel()))
+
+    def jacobian(self, y, t0 = None):
+        """ Returns the sparse block-diagonal Jacobian (filled in place). """
+        values = self.system.jacobian_values(y[:self.n], self.k)
+        self._jac.data[:] = np.tile(values, self.P + 1)
+        return self._jac
+
+    def integrate(self, time, method = 'odeint', atol = None, rtol = None, mxstep = 0):
+        """ Integrate the system and its sensitivities in one solver call.
+
+        Args:
+            time (list[flt]): The time points for which the solution is returned.
+            method (str, optional): 'odeint' or 'LSODA' (with a banded Jacobian,
+                since the bandwidth of the augmented system is n-1) or a solve_ivp
+                method. BDF and Radau use the sparse block-diagonal Jacobian.
+                Defaults to 'odeint'.
+            atol (flt, optional): Absolute tolerance of the solver.
+            rtol (flt, optional): Relative tolerance of the solver.
+            mxstep (int, optional): Maximum number of steps per time point (odeint only).
+
+        Returns:
+            ny (numpy.ndarray): Trajectories with shape (n, len(time)).
+            sens (numpy.ndarray): Sensitivities dx/dk with shape (len(time), n, P).
+        """
+        y0 = np.concatenate((self.p0, np.zeros(self.P * self.n)))
+        if method == 'odeint':
+            y = odeint(lambda y, t: self(y, t), y0, time, ml = self.n - 1, mu = self.n - 1,
+                       atol = atol, rtol = rtol, mxstep = mxstep).T
+        else:
+            kwargs = {'atol': atol if atol else 1.49012e-8,
+                      'rtol': rtol if rtol else 1.49012e-8}
+            if method in ('BDF', 'Radau'):
+                kwargs['jac'] = lambda t, y: self.jacobian(y, t).copy()
+            elif method == 'LSODA':
+                kwargs.update(lband = self.n - 1, uband = self.n - 1)
+            sol = solve_ivp(lambda t, y: self(y, t), (time[0], time[-1]), y0,
+                            method = method, t_eval = time, **kwargs)
+            if not sol.success:
+                raise SensitivityError(f'Integration failed: {sol.message}')
+            y = sol.y
+        sens = y[self.n:].reshape(self.P, self.n, len(time)).transpose(2, 1, 0)
+        return y[:self.n], sens
+
+def forward_sensitivity(system, p0, time, r = None, params = None, method = 'odeint', **kwargs):
+    """ Integrate a MassActionSystem together with its sensitivities dx/dk.
+
+    See Sensitivity() and Sensitivity.integrate().
+
+    Returns:
+        ny (numpy.ndarray) with shape (n, len(time)),
+        sens (numpy.ndarray) with shape (len(time), n, len(params))
+    """
+    return Sensitivity(system, p0, r, params).integrate(time, method = method, **kwargs)
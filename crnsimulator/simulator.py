@@ -12,9 +12,11 @@ import sys
 import argparse
 
 from crnsimulator import __version__
-from crnsimulator import ReactionGraph, get_integrator, parse_crn_string
+from crnsimulator import ReactionGraph, get_integrator
 from crnsimulator.odelib_template import add_integrator_args
-from crnsimulator.crn_parser import ParseException
+from crnsimulator.crn_parser import ParseException, iter_crn
+from crnsimulator.cache import ODELibCache, crn_digest, read_digest
+from crnsimulator import profiling
 
 class SimulationSetupError(Exception):
     pass
@@ -32,6 +34,29 @@ def natural_sort(l):
 
     return sorted(l, key=alphanum_key)
 
+def irreversible_reactions(crn):
+    """Split a stream of (reversible) reactions into irreversible reactions."""
+    logger = logging.getLogger('crnsimulator')
+    for [r, p, k] in crn:
+        if None in k:
+            logger.error('Rate == None. This should not happen with the new default parameters.')
+            k[:] = [x if x is not None else 1 for x in k]
+
+        if len(k) == 2:
+            yield [r, p, k[0]]
+            yield [p, r, k[1]]
+        else:
+            yield [r, p, k[0]]
+
+def check_reaction_graph(RG, V):
+    """Make sure the ReactionGraph is consistent with the species vector."""
+    logger = logging.getLogger('crnsimulator')
+    if len(RG.species) != len(V):
+        logger.error(f'Species input: ({len(V)}): {sorted(V)}')
+        logger.error(f'Species in CRN: ({len(RG.species)}): {sorted(RG.species)}')
+        raise SimulationSetupError('Confusion about which species appear in the reaction network!')
+    return RG
+
 def main():
     """Translate a CRN into an ODE system. 
 
@@ -45,7 +70,8 @@ def main():
     parser.add_argument('--logfile', default = '', action = 'store', metavar = '<str>',
         help = """Redirect logging information to a file.""")
     parser.add_argument("--force", action='store_true',
-            help="Overwrite existing files")
+            help="""Overwrite existing files. (Existing files that do not match
+            the input CRN are overwritten anyway.)""")
     parser.add_argument("--dryrun", action='store_true',
             help="Do not run the simulation, only write the files.")
     parser.add_argument("-o", "--output", default='odesystem', metavar='<str>',
@@ -55,6 +81,27 @@ def main():
     parser.add_argument("--jacobian", action='store_true',
             help="""Symbolic calculation of Jacobi-Matrix. 
             This may generate a very large simulation file.""")
+    parser.add_argument("--flux", action='store_true',
+            help="""Generate code that computes every reaction flux (and partial flux
+            of the Jacobian) only once. This reduces the size of the ODE library for
+            large, highly connected networks.""")
+    parser.add_argument("--reduce", action='store_true',
+            help="""Detect conservation laws and integrate only the independent species.
+            The dependent (and constant) species are reconstructed from the conserved
+            totals.""")
+    parser.add_argument("--cache", nargs='?', const='', default=None, metavar='<str>',
+            help="""Store and reuse ODE libraries in a content-addressed cache directory,
+            (defaults to $XDG_CACHE_HOME/crnsimulator) instead of writing --output.""")
+    parser.add_argument("--cache-size", type=int, default=256, metavar='<int>',
+            help="Maximum size of the cache directory in MB (least recently used files are removed).")
+    parser.add_argument("--in-memory", action='store_true',
+            help="""Compile the ODE system in memory, i.e. do not write 
+            (or read) the executable python script.""")
+    parser.add_argument("--backend", default='sympy', choices=('sympy', 'numpy', 'numba'),
+            help="""Choose how the ODE system is built. The numpy backend uses vectorized
+            stoichiometry matrices, it skips sympy and code generation and implies --in-memory.
+            The numba backend evaluates the same system with JIT-compiled kernels (requires
+            numba, falls back to numpy otherwise).""")
     add_integrator_args(parser)
     args = parser.parse_args()
 
@@ -83,6 +130,9 @@ def main():
         args.labels = args.pyplot_labels
         args.pyplot_labels = None
 
+    # The report is written at the end of the simulation (see integrate).
+    prof = profiling.start(memory = True) if args.profile is not None else None
+
     # ********************* #
     # ARGUMENT PROCESSING 1 #
     # ..................... #
@@ -90,11 +140,11 @@ def main():
         '.py' if args.output[-3:] != '.py' else args.output
     odename = 'odesystem'
 
-    input_crn = sys.stdin.readlines()
-    input_crn = "".join(input_crn)
-
+    # The reaction graph is built while reading the input stream.
+    species = dict()
     try:
-        crn, species = parse_crn_string(input_crn)
+        with profiling.phase('parse'):
+            RG = ReactionGraph(irreversible_reactions(iter_crn(sys.stdin, species)))
     except ParseException as ex:
         logger.error('CRN-format parsing error:')
         logger.error('Cannot parse line {:5d}: "{}"'.format(ex.lineno, ex.line))
@@ -124,56 +174,85 @@ def main():
         const.append(False if species[s][0][0] == 'i' else True)
         seen.add(s)
 
-    # Split CRN into irreversible reactions
-    new = []
-    for [r, p, k] in crn:
-        if None in k:
-            logger.error('Rate == None. This should not happen with the new default parameters.')
-            k[:] = [x if x is not None else 1 for x in k]
-
-        if len(k) == 2:
-            new.append([r, p, k[0]])
-            new.append([p, r, k[1]])
-        else:
-            new.append([r, p, k[0]])
-    crn = new
+    check_reaction_graph(RG, V)
+    crn = [[[V[i] for i in r], [V[i] for i in p], k] for [r, p, k] in RG.indexed_reactions(V)]
 
     # **************** #
     # WRITE ODE SYSTEM #
     # ................ #
-    if not args.force and os.path.exists(filename):
-        logger.warning(f'Reading ODE system from existing file: {filename}')
-    else:
-        # ******************* #
-        # BUILD REACTIONGRAPH #
-        # ................... #
-        RG = ReactionGraph(crn)
-        if len(RG.species) != len(V):
-            logger.error(f'Species input: ({len(V)}): {sorted(V)}')
-            logger.error(f'Species in CRN: ({len(RG.species)}): {sorted(RG.species)}')
-            raise SimulationSetupError('Confusion about which species appear in the reaction network!')
+    const = const if any(const) else None
+    rate_dict = bool(args.sweep) # rates must be variables for sweeps.
+    digest = crn_digest(crn, V, C, const, args.jacobian, rate_dict = rate_dict, flux = args.flux,
+                        reduce = args.reduce)
 
+    odelib = None
+    if args.in_memory or args.backend != 'sympy':
         # ********************* #
-        # PRINT ODE TO TEMPLATE #
+        # COMPILE ODE IN MEMORY #
         # ..................... #
-        filename, odename = RG.write_ODE_lib(sorted_vars = V, concvect = C,
-                                             const = const if any(const) else None,
-                                             jacobian = args.jacobian, 
-                                             filename = filename,
-                                             odename = odename)
-        logger.info(f'CRN to ODE translation successful. Wrote file: {filename}')
+        odelib = RG.compile(sorted_vars = V, concvect = C,
+                            const = const,
+                            jacobian = args.jacobian, 
+                            rate_dict = rate_dict,
+                            flux = args.flux,
+                            reduce = args.reduce,
+                            odename = odename,
+                            backend = args.backend)
+        logger.info(f'CRN to ODE translation successful. Compiled {args.backend} backend in memory.')
+    else:
+        if args.cache is not None:
+            cache = ODELibCache(args.cache or None, maxsize = args.cache_size * 2**20)
+            cached = None if args.force else cache.lookup(digest)
+            write = cached is None
+            filename = cached if cached else os.path.join(cache.directory, 
+                                                          f'tmp_{os.getpid()}_{digest}.py')
+        elif not args.force and os.path.exists(filename):
+            stored = read_digest(filename)
+            write = stored is not None and stored != digest
+            if stored is None:
+                logger.warning(f'Reading ODE system from existing file: {filename}')
+            elif write:
+                logger.warning(f'Existing file {filename} does not match the input CRN, rewriting it.')
+            else:
+                logger.info(f'Reading ODE system from existing file: {filename}')
+        else:
+            write = True
+
+        if write:
+            # ********************* #
+            # PRINT ODE TO TEMPLATE #
+            # ..................... #
+            filename, odename = RG.write_ODE_lib(sorted_vars = V, concvect = C,
+                                                 const = const,
+                                                 jacobian = args.jacobian, 
+                                                 rate_dict = rate_dict,
+                                                 flux = args.flux,
+                                                 reduce = args.reduce,
+                                                 filename = filename,
+                                                 odename = odename,
+                                                 digest = digest)
+            if args.cache is not None:
+                filename = cache.store(digest, filename)
+            logger.info(f'CRN to ODE translation successful. Wrote file: {filename}')
 
     # ******************* #
     # SIMULATE ODE SYSTEM #
     # ................... #
     if args.dryrun:
-        logger.info('Dryrun: Simulate the ODE system using:')
-        logger.info(f"  python {filename} --help ")
+        if odelib is None:
+            logger.info('Dryrun: Simulate the ODE system using:')
+            logger.info(f"  python {filename} --help ")
+        if prof:
+            profiling.stop()
+            prof.write(args.profile)
     else:
-        logger.info('Simulating the ODE system, change parameters using:')
-        logger.info(f"  python {filename} --help ")
-
-        integrate = get_integrator(filename)
+        if odelib is None:
+            logger.info('Simulating the ODE system, change parameters using:')
+            logger.info(f"  python {filename} --help ")
+            with profiling.phase('import'):
+                integrate = get_integrator(filename)
+        else:
+            integrate = odelib.integrate
 
         # ********************* #
         # ARGUMENT PROCESSING 2 #
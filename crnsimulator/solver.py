@@ -38,15 +38,18 @@ def get_integrator(filename, function = 'integrate'):
     return getattr(mod, function)
 
 def writeODElib(svars, odeM, const = None, jacobian = None, rdict = None, concvect = None,
-                odename = 'odesystem', filename = './odesystem', template = None):
+                odename = 'odesystem', filename = './odesystem', template = None, digest = None,
+                reactions = None, fluxes = None, partials = None, conservation = None):
     """ Write an ODE system into an executable python script.
 
     Args:
       svars <list[str]>: Sorted list of variables. The sorting defines the order
         for specifying concentrations.
-      odeM <sympy.Matrix()>: A matrix that contains the ODE system.
-      jacobian <optional: sympy.Matrix()> : The jacobi Matrix corresponding to
-        odeM.
+      odeM <sympy.Matrix()>: A matrix (or list of expression strings) that 
+        contains the ODE system.
+      jacobian <optional: sympy.SparseMatrix()> : The (sparse) n x n jacobi Matrix
+        corresponding to odeM, or a dictionary {(i, j): entry} of its nonzero
+        entries. Only nonzero entries are written to the file.
       rdict <optional: dict()>: If your odeM contains rates in form of variable
         names, then you need to supply this dictionary mapping names to float values.
       concvect <optional: list(): Specify default initial species concentrations
@@ -54,11 +57,46 @@ def writeODElib(svars, odeM, const = None, jacobian = None, rdict = None, concve
       odename <optional: str>: Name of your ODE function (no special characters!)
       filename <optional: str>: Specify the name of the ODE library.
       template <optional: str>: Specify an alternative template library file.
+      digest <optional: str>: A hash identifying the ODE library (see crnsimulator.cache).
+      reactions <optional: list()>: The reactions in the format [reactants, products, rate],
+        where reactants and products are lists of indices with respect to svars.
+        This is used to derive the sparsity pattern of the jacobian.
+      fluxes <optional: list[str]>: Assignments (e.g. "_v0 = k0*A*B") that are
+        evaluated in the ODE function before the ODEs, which may use these names.
+      partials <optional: list[str]>: Same as fluxes, but for the jacobian.
+      conservation <optional: tuple>: Conservation laws (L, pivots), see 
+        crnsimulator.reduction.conservation_laws(). If specified, the ODE
+        library integrates only the independent species.
 
     Returns:
       filename<str>, odename<str>
 
     """
+    odetemp = renderODElib(svars, odeM, const = const, jacobian = jacobian, rdict = rdict,
+                           concvect = concvect, odename = odename, filename = filename, 
+                           template = template, digest = digest, reactions = reactions,
+                           fluxes = fluxes, partials = partials, conservation = conservation)
+
+    if filename[-3:] != '.py':
+        filename += '.py'
+    with open(filename, 'w') as ofile:
+        ofile.write(odetemp)
+
+    return filename, odename
+
+def renderODElib(svars, odeM, const = None, jacobian = None, rdict = None, concvect = None,
+                 odename = 'odesystem', filename = './odesystem', template = None, digest = None,
+                 reactions = None, fluxes = None, partials = None, conservation = None):
+    """ Fill the template file with an ODE system and return the source code.
+
+    Takes the same arguments as writeODElib(), but does not write a file.
+    If odeM is None, then the ODE function is not written, and has to be
+    provided otherwise, e.g. via the namespace argument of compileODElib().
+    The same holds for the jacobian, if it is True instead of a matrix.
+
+    Returns:
+      source<str>: The python source code of the ODE library.
+    """
     if not template:
         template = crnsimulator.odelib_template.__file__[:]
         if template[-1] == 'c':
@@ -74,69 +112,83 @@ def writeODElib(svars, odeM, const = None, jacobian = None, rdict = None, concve
     odetemp = odetemp.replace("#<&>ODENAME<&>#", odename)
     odetemp = odetemp.replace("#<&>FILENAME<&>#", filename)
 
+    if digest:
+        odetemp = odetemp.replace("#<&>DIGEST<&>#", f"crn_digest = '{digest}'")
+
+    if reactions is not None:
+        rxnstring = 'reactions = [\n' + ',\n'.join(
+            "    ({}, {}, {})".format(list(r), list(p), k) for [r, p, k] in reactions) + ']'
+        odetemp = odetemp.replace("#<&>REACTIONS<&>#", rxnstring)
+
     # DEFAULT RATES
+    rdict = rdict if rdict else dict()
     ratestring = ',\n'.join(
         "  '{}' : {}".format(k, rdict[k]) for k in sorted(rdict.keys()))
     odetemp = odetemp.replace("#<&>RATES<&>#", ratestring)
 
     # ODEINT FUNCTION
-    functionstring = "def {}(p0, t0, r):\n".format(odename)
-    # Initialize arguments
-    functionstring += "    {} = p0\n".format(', '.join(svars))
-    functionstring += "    if not r : r = rates\n\n"
-    for k in sorted(rdict.keys()):
-        functionstring += "    {} = r['{}']\n".format(k, k)
-    functionstring += "\n"
-    # Write the ODEs
-    for i in range(len(svars)):
-        functionstring += "    d{}dt = {}\n".format(svars[i], odeM[i])
-    # return
-    if len(svars) == 1:
-        functionstring += "    return np.array({})".format(
-            ', '.join(['d' + x + 'dt' for x in svars]))
-    else:
-        functionstring += "    return np.array([{}])".format(
-            ', '.join(['d' + x + 'dt' for x in svars]))
-    odetemp = odetemp.replace("#<&>ODECALL<&>#", functionstring)
-
-    if jacobian:
+    if odeM is not None:
+        functionstring = "def {}(p0, t0, r):\n".format(odename)
+        # Initialize arguments
+        functionstring += "    {} = p0\n".format(', '.join(svars))
+        functionstring += "    if not r : r = rates\n\n"
+        for k in sorted(rdict.keys()):
+            functionstring += "    {} = r['{}']\n".format(k, k)
+        functionstring += "\n"
+        if fluxes:
+            functionstring += ''.join("    {}\n".format(f) for f in fluxes) + "\n"
+        # Write the ODEs
+        for i in range(len(svars)):
+            functionstring += "    d{}dt = {}\n".format(svars[i], odeM[i])
+        # return
+        if len(svars) == 1:
+            functionstring += "    return np.array({})".format(
+                ', '.join(['d' + x + 'dt' for x in svars]))
+        else:
+            functionstring += "    return np.array([{}])".format(
+                ', '.join(['d' + x + 'dt' for x in svars]))
+        odetemp = odetemp.replace("#<&>ODECALL<&>#", functionstring)
+
+    if jacobian is True:
+        odetemp = odetemp.replace("#<&>JCALL<&>#", 'Dfun = jacobian')
+    elif isinstance(jacobian, dict) or jacobian:
         # JACOBIAN FUNCTION
-        jacobianstring = "def {}(p0, t0, r):\n".format('jacobian')
+        vl = len(svars)
+        if isinstance(jacobian, dict): # {(i, j): entry} of nonzero entries
+            entries = [(i, j, jacobian[(i, j)]) for (i, j) in sorted(jacobian)]
+        elif jacobian.shape == (vl, vl):
+            entries = jacobian.row_list()
+        else: # Legacy format: flat list of all n*n entries.
+            entries = [(e // vl, e % vl, x) for e, x in enumerate(jacobian) if x != 0]
+
+        # The dense Jacobi matrix is allocated once and filled in place.
+        jacobianstring = "jacobian_matrix = np.zeros(({}, {}))\n\n".format(vl, vl)
+        jacobianstring += "def {}(p0, t0, r):\n".format('jacobian')
         # Initialize arguments
-        jacobianstring += "    {} = p0\n".format(', '.join(svars))
+        jacobianstring += "    {}{} = p0\n".format(', '.join(svars), ',' if vl == 1 else '')
         jacobianstring += "    if not r : r = rates\n\n"
         for k in sorted(rdict.keys()):
             jacobianstring += "    {} = r['{}']\n".format(k, k)
         jacobianstring += "\n"
+        if partials:
+            jacobianstring += ''.join("    {}\n".format(f) for f in partials) + "\n"
 
-        # Write the jacobian
-        jacobianstring += "    J = [[[] for i in range(len(p0))] " + \
-            "for j in range(len(p0))]\n"
-
-        vl = len(svars)
-        i, j = 0, 0
-        for row in jacobian:
-            jacobianstring += "    J[{}][{}] = {}\n".format(i, j, row)
-            if j < vl - 1:
-                j += 1
-            else:
-                i += 1
-                j = 0
-
-        if len(svars) == 1:
-            jacobianstring += "    J = J[0]\n"
+        # Write only the nonzero entries of the jacobian
+        jacobianstring += "    J = jacobian_matrix\n"
+        for (i, j, x) in entries:
+            jacobianstring += "    J[{}, {}] = {}\n".format(i, j, x)
 
         # return
         jacobianstring += "    return J"
         odetemp = odetemp.replace("#<&>JACOBIAN<&>#", jacobianstring)
         odetemp = odetemp.replace("#<&>JCALL<&>#", 'Dfun = jacobian')
 
-    # SORTED VARIABLE NAMES in integrate()
+    # SORTED VARIABLE NAMES
     svarstring = 'svars = ' + '[{}]'.format(
         ', '.join([str('"' + x + '"') for x in svars]))
     odetemp = odetemp.replace("#<&>SORTEDVARS<&>#", svarstring)
 
-    # Default concentrations in integrate()
+    # DEFAULT CONCENTRATIONS in integrate()
     concstring = ''
 
     if concvect:
@@ -148,9 +200,32 @@ def writeODElib(svars, odeM, const = None, jacobian = None, rdict = None, concve
     if const:
         odetemp = odetemp.replace("#<&>CONSTANT_SPECIES_INFO<&>#", f"const = {const}\n")
 
-    if filename[-3:] != '.py':
-        filename += '.py'
-    with open(filename, 'w') as ofile:
-        ofile.write(odetemp)
+    if conservation is not None:
+        L, pivots = conservation
+        if len(L):
+            lawstring = 'conservation = ([\n' + ',\n'.join(
+                "    {}".format(list(map(float, row))) for row in L) + '],\n'
+        else:
+            lawstring = 'conservation = (np.zeros((0, {})),\n'.format(len(svars))
+        lawstring += '    {})\n'.format(list(map(int, pivots)))
+        odetemp = odetemp.replace("#<&>CONSERVATION<&>#", lawstring)
 
-    return filename, odename
+    return odetemp
+
+def compileODElib(source, name = 'odesystem', namespace = None):
+    """ Compile the source code of an ODE library into a module (in memory).
+
+    Args:
+        source (str): The source code, e.g. from renderODElib().
+        name (str, optional): The name of the module. Defaults to 'odesystem'.
+        namespace (dict, optional): Objects that are inserted into the module
+            namespace prior to execution, e.g. an externally provided odesystem.
+
+    Returns:
+        A module object providing the functions of the ODE library.
+    """
+    mod = types.ModuleType(name)
+    if namespace:
+        mod.__dict__.update(namespace)
+    exec(compile(source, '<{}>'.format(name), 'exec'), mod.__dict__)
+    return mod
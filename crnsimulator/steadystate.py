@@ -0,0 +1,168 @@
+"""
+Steady states of ODE systems with conservation laws (Newton and pseudo-transient continuation).
+
+Test using tests/test_steadystate.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+
+class SteadyStateError(Exception):
+    pass
+
+class _Residual(object):
+    """ The steady-state equations, where the (dependent) equations of pivot
+    species are replaced by the conservation laws. """
+    def __init__(self, f, jac, x0, laws):
+        self.f, self.jac = f, jac
+        n = len(x0)
+        L, pivots = laws if laws is not None else (np.zeros((0, n)), [])
+        L = np.array(L, dtype = float).reshape(-1, n)
+        self.L, self.pivots = sparse.csr_matrix(L), list(pivots)
+        self.totals = self.L @ x0
+        keep = np.ones(n)
+        keep[self.pivots] = 0
+        self.D = sparse.diags(keep)
+        E = sparse.csr_matrix((np.ones(len(self.pivots)), (self.pivots, range(len(self.pivots)))),
+                              shape = (n, len(self.pivots)))
+        self.PL = (E @ self.L).tocsr()
+        self.I = sparse.identity(n, format = 'csr')
+
+    def __call__(self, x):
+        F = np.array(self.f(x), dtype = float)
+        F[self.pivots] = self.L @ x - self.totals
+        return F
+
+    def jacobian(self, x, dt = None):
+        """ The Jacobian of the residual, or of the pseudo-transient step (dt). """
+        J = self.jac(x)
+        J = sparse.csr_matrix(J if sparse.issparse(J) else np.asarray(J, dtype = float))
+        if dt is not None:
+            J = J - self.I / dt
+        return (self.D @ J + self.PL).tocsc()
+
+    def stable(self, x, tol = 1e-8):
+        """ Whether x is a (linearly) stable steady state of the dynamics.
+
+        The eigenvalues of the reduced Jacobian J[free, free] - J[free, pivots] @
+        L[:, free] (see crnsimulator.reduction.ReducedSystem) must not have
+        positive real parts.
+        """
+        free = np.setdiff1d(np.arange(len(x)), self.pivots)
+        if len(free) == 0:
+            return True
+        J = self.jac(x)
+        J = J.toarray() if sparse.issparse(J) else np.asarray(J, dtype = float)
+        J = J[free]
+        Jred = J[:, free] - J[:, self.pivots] @ self.L[:, free].toarray()
+        ev = np.linalg.eigvals(Jred)
+        return np.all(ev.real <= tol * max(1, np.max(np.abs(ev))))
+
+def _converged(dx, x, atol, rtol):
+    return np.all(np.abs(dx) <= atol + rtol * np.abs(x))
+
+def _newton(F, x, atol, rtol, maxiter):
+    """ Damped Newton iterations, returns the solution or None. """
+    Fx = F(x)
+    for _ in range(maxiter):
+        if not np.any(Fx):
+            return x
+        dx = spsolve(F.jacobian(x), -Fx)
+        if not np.all(np.isfinite(dx)):
+            return None
+        if _converged(dx, x, atol, rtol):
+            # The residual is at round-off, no step would decrease it further.
+            return x
+        norm, lam = np.linalg.norm(Fx), 1.
+        while lam > 1e-4:
+            xn = x + lam * dx
+            Fn = F(xn)
+            if np.all(np.isfinite(Fn)) and np.linalg.norm(Fn) <= (1 - 1e-4 * lam) * norm:
+                break
+            lam /= 2
+        else:
+            return None
+        x, Fx = xn, Fn
+        if lam == 1 and _converged(dx, x, atol, rtol):
+            return x
+    return None
+
+def _physical(x, atol):
+    return x is not None and np.all(x >= -atol)
+
+def steady_state(f, jac, p0, laws = None, method = 'newton', atol = 1e-12, rtol = 1e-10,
+                 maxiter = 50, ptc_maxiter = 10000, dt0 = 1e-6, max_dense = 2000):
+    """ Solve f(x) = 0 subject to conservation laws.
+
+    First, the steady state is computed with damped Newton iterations, where
+    the equations of the pivot species are replaced by the conservation
+    laws L @ x = L @ p0. If Newton fails, converges to negative
+    concentrations, or converges to an unstable steady state (e.g. a
+    boundary state where an autocatalytic species is extinct), the steady
+    state is computed by pseudo-transient
+    continuation, i.e. implicit Euler steps (I/dt - J) dx = f(x) with step
+    sizes dt that are limited by the relative change of concentrations per
+    step, and grow quickly as the system approaches a steady state, where
+    it switches to Newton. The
+    pseudo-transient continuation follows the dynamics of the system, i.e.
+    it finds the (stable) steady state reached from p0, while Newton may
+    converge to any steady state close to p0. The stability of Newton roots
+    is tested with the eigenvalues of the dense reduced Jacobian, for larger
+    systems (see max_dense) pseudo-transient continuation is used directly.
+
+    Args:
+        f (function): The right-hand side f(x).
+        jac (function): The Jacobian jac(x) (dense or sparse).
+        p0 (list[flt]): The initial concentrations.
+        laws (tuple, optional): Conservation laws (L, pivots), see conservation_laws().
+        method (str, optional): 'newton' (with pseudo-transient continuation as
+            fallback) or 'ptc' (pseudo-transient continuation only).
+        atol (flt, optional): Absolute tolerance of the solution.
+        rtol (flt, optional): Relative tolerance of the solution.
+        maxiter (int, optional): Maximum number of Newton iterations.
+        ptc_maxiter (int, optional): Maximum number of pseudo-transient steps.
+        dt0 (flt, optional): The initial pseudo-time step.
+        max_dense (int, optional): The maximum number of species for which
+            Newton roots are tested for stability.
+
+    Returns:
+        The steady state (numpy.ndarray).
+    """
+    x0 = np.array(p0, dtype = float)
+    F = _Residual(f, jac, x0, laws)
+
+    if method not in ('newton', 'ptc'):
+        raise SteadyStateError(f'Unknown steady state method: {method}.')
+    if method == 'newton' and len(x0) > max_dense:
+        logger.info('Cannot test the stability of Newton roots for more than ' + \
+                    f'{max_dense} species, using pseudo-transient continuation.')
+    elif method == 'newton':
+        x = _newton(F, x0, atol, rtol, maxiter)
+        if _physical(x, atol) and F.stable(np.maximum(x, 0)):
+            return np.maximum(x, 0)
+        logger.info('Newton iterations failed (or found an unstable steady state), ' + \
+                    'using pseudo-transient continuation.')
+
+    x, dt = x0, dt0
+    floor = max(atol, 1e-6 * np.max(np.abs(x0), initial = 0))
+    for it in range(ptc_maxiter):
+        dx = spsolve(F.jacobian(x, dt), -F(x))
+        change = np.max(np.abs(dx) / (np.abs(x) + floor), initial = 0)
+        if not np.isfinite(change) or change > 1:
+            dt /= 4 # reject the step
+            continue
+        # Limit the relative change per step, such that the continuation
+        # follows the dynamics (and does not jump to an unstable steady state).
+        x = np.maximum(x + dx, 0)
+        dt = min(dt * (min(10, 0.25 / change) if change > 0 else 10), 1e20)
+        if _converged(dx, x, atol, rtol):
+            xn = _newton(F, x, atol, rtol, maxiter)
+            if _physical(xn, atol):
+                logger.info(f'Pseudo-transient continuation converged after {it + 1} steps.')
+                return np.maximum(xn, 0)
+            dt *= 10
+    raise SteadyStateError('Steady state computation did not converge.')
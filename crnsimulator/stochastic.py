@@ -0,0 +1,544 @@
+"""
+Stochastic simulation of CRNs (Gillespie's next reaction method and tau-leaping).
+
+Test using tests/test_stochastic.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+from crnsimulator.massaction import MassActionSystem
+from crnsimulator.sweep import fork_map
+
+class StochasticError(Exception):
+    pass
+
+class IndexedPriorityQueue(object):
+    """ A binary min-heap of keys, which can be updated by their index.
+
+    Args:
+        keys (list[flt]): The initial keys, key i belongs to index i.
+    """
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.heap = sorted(range(len(self.keys)), key = self.keys.__getitem__)
+        self.pos = [0] * len(self.heap)
+        for p, i in enumerate(self.heap):
+            self.pos[i] = p
+
+    def __len__(self):
+        return len(self.heap)
+
+    def top(self):
+        """ Returns the index with the smallest key and its key. """
+        i = self.heap[0]
+        return i, self.keys[i]
+
+    def update(self, i, key):
+        """ Changes the key of index i and restores the heap property in O(log n). """
+        old, self.keys[i] = self.keys[i], key
+        if key < old:
+            self._sift_up(self.pos[i])
+        elif key > old:
+            self._sift_down(self.pos[i])
+
+    def _swap(self, p, q):
+        heap, pos = self.heap, self.pos
+        heap[p], heap[q] = heap[q], heap[p]
+        pos[heap[p]], pos[heap[q]] = p, q
+
+    def _sift_up(self, p):
+        keys, heap = self.keys, self.heap
+        while p > 0:
+            q = (p - 1) >> 1
+            if keys[heap[q]] <= keys[heap[p]]:
+                break
+            self._swap(p, q)
+            p = q
+
+    def _sift_down(self, p):
+        keys, heap, n = self.keys, self.heap, len(self.heap)
+        while True:
+            q = 2 * p + 1
+            if q >= n:
+                break
+            if q + 1 < n and keys[heap[q + 1]] < keys[heap[q]]:
+                q += 1
+            if keys[heap[p]] <= keys[heap[q]]:
+                break
+            self._swap(p, q)
+            p = q
+
+class StochasticSystem(MassActionSystem):
+    """ A mass-action system for stochastic simulation with molecule counts.
+
+    The propensity of a reaction with rate k is k times the falling factorial
+    x(x-1)...(x-c+1) of every reactant x with stoichiometry c. Hence, the
+    mean behavior corresponds to the ODE system of MassActionSystem (with
+    concentrations measured in molecule counts). Constant species keep their
+    initial counts.
+
+    Args:
+        svars (list[str]): Sorted list of species.
+        reactions (list): Indexed reactions [reactants, products, rate], see
+            crnsimulator.ReactionGraph.indexed_reactions().
+        const (list[bool], optional): Species with constant counts.
+    """
+    def __init__(self, svars, reactions, const = None):
+        super().__init__(svars, reactions, const)
+        n, m = len(self.svars), len(self.k)
+
+        # Reactant stoichiometry and state changes of every reaction.
+        R, S = self.reactants.T.tocsr(), self.stoichiometry.T.tocsr()
+        self._reac = [list(zip(R.indices[R.indptr[j]:R.indptr[j + 1]].tolist(),
+                               R.data[R.indptr[j]:R.indptr[j + 1]].tolist())) for j in range(m)]
+        self._change = [list(zip(S.indices[S.indptr[j]:S.indptr[j + 1]].tolist(),
+                                 S.data[S.indptr[j]:S.indptr[j + 1]].tolist())) for j in range(m)]
+        self._change_vectors = np.zeros((m, n), dtype = np.int64)
+        for j, change in enumerate(self._change):
+            for s, d in change:
+                self._change_vectors[j, s] = d
+
+        # The dependency graph: reaction j affects the propensities of all
+        # reactions that consume a species whose count is changed by j.
+        consumers = [[] for _ in range(n)]
+        for j, reac in enumerate(self._reac):
+            for s, _ in reac:
+                consumers[s].append(j)
+        self.dependencies = []
+        for j, change in enumerate(self._change):
+            deps = set([j])
+            for s, _ in change:
+                deps.update(consumers[s])
+            self.dependencies.append(sorted(deps))
+
+        # Arrays for tau-leaping: the total order of every reaction, and for
+        # every species the highest order of reactions that consume it (hor)
+        # together with the highest stoichiometry within those reactions.
+        self._order = np.asarray(self.reactants.sum(axis = 0)).ravel().astype(np.int64)
+        self._hor = np.zeros(n, dtype = np.int64)
+        self._hstoich = np.zeros(n, dtype = np.int64)
+        for e, (j, s) in enumerate(zip(self._erxn, self._espe)):
+            c, o = int(self._ecnt[e]), self._order[j]
+            if o > self._hor[s] or (o == self._hor[s] and c > self._hstoich[s]):
+                self._hor[s], self._hstoich[s] = o, c
+        self._V = self.stoichiometry.tocsc()
+        self._V2 = self._V.multiply(self._V).tocsc()
+
+    def propensity(self, j, x, k):
+        """ Returns the propensity of reaction j for the counts x and rates k. """
+        a = k[j]
+        for s, c in self._reac[j]:
+            xs = x[s]
+            for i in range(c):
+                a *= xs - i
+        return a if a > 0 else 0.
+
+    def propensities(self, x, k = None):
+        """ Returns the propensities of all reactions (numpy.ndarray). """
+        k = self.rate_vector(k)
+        return np.array([self.propensity(j, x, k) for j in range(len(k))], dtype = float)
+
+    def _counts(self, p0):
+        x = np.asarray(p0, dtype = float)
+        if len(x) != len(self.svars):
+            raise StochasticError('Initial counts cannot be mapped to species!')
+        if np.any(x < 0):
+            raise StochasticError('Initial counts must not be negative!')
+        counts = np.rint(x)
+        if not np.allclose(counts, x):
+            logger.warning('Rounding initial concentrations to molecule counts.')
+        return [int(c) for c in counts]
+
+    def ssa(self, p0, time, r = None, seed = None, max_steps = None):
+        """ Simulate one trajectory with the next reaction method (Gibson & Bruck).
+
+        Every reaction has a putative firing time in an indexed priority queue.
+        After a reaction fires, only the firing times of reactions in its
+        dependency list are updated (and re-used by rescaling, except for
+        the reaction that fired), so every step costs O(log R) time.
+
+        Args:
+            p0 (list[int]): The initial counts in the order of svars.
+            time (list[flt]): The (increasing) time points for which the counts are returned.
+            r (dict, optional): Rates, see MassActionSystem.rate_vector().
+            seed (int, optional): Seed (or numpy.random.SeedSequence) of the random
+                number generator.
+            max_steps (int, optional): Raise a StochasticError after so many reactions.
+
+        Returns:
+            A numpy.ndarray of counts with shape (len(svars), len(time)).
+        """
+        rng = np.random.default_rng(seed)
+        x = self._counts(p0)
+        k = self.rate_vector(r).tolist()
+        time = np.asarray(time, dtype = float)
+        out = np.empty((len(x), len(time)))
+
+        draws, d = rng.standard_exponential(1024).tolist(), 0
+        t, inf = float(time[0]), float('inf')
+        a = [self.propensity(j, x, k) for j in range(len(k))]
+        taus = []
+        for aj in a:
+            taus.append(t + draws[d] / aj if aj > 0 else inf)
+            d += 1
+            if d == len(draws):
+                draws, d = rng.standard_exponential(1024).tolist(), 0
+        queue = IndexedPriorityQueue(taus) if taus else None
+
+        ti, steps = 0, 0
+        while ti < len(time):
+            mu, tmu = queue.top() if queue else (None, inf)
+            while ti < len(time) and time[ti] < tmu:
+                out[:, ti] = x
+                ti += 1
+            if ti == len(time):
+                break
+            steps += 1
+            if max_steps and steps > max_steps:
+                raise StochasticError(f'Maximum number of steps ({max_steps}) exceeded.')
+            t = tmu
+            for s, c in self._change[mu]:
+                x[s] += c
+            for j in self.dependencies[mu]:
+                aj = self.propensity(j, x, k)
+                tau = queue.keys[j]
+                if aj <= 0:
+                    tau = inf
+                elif j != mu and a[j] > 0:
+                    tau = t + (a[j] / aj) * (tau - t)
+                else:
+                    tau = t + draws[d] / aj
+                    d += 1
+                    if d == len(draws):
+                        draws, d = rng.standard_exponential(1024).tolist(), 0
+                a[j] = aj
+                queue.update(j, tau)
+        return out
+
+    def vector_propensities(self, x, k):
+        """ Returns the propensities of all reactions for the counts x (vectorized). """
+        x = np.asarray(x, dtype = float)
+        xs, cnt = x[self._espe], self._ecnt
+        ff = np.ones(len(xs))
+        for i in range(int(cnt.max()) if len(cnt) else 0):
+            ff *= np.where(cnt > i, xs - i, 1.)
+        a = np.array(k, dtype = float)
+        np.multiply.at(a, self._erxn, ff)
+        return np.maximum(a, 0)
+
+    def _limits(self, x):
+        """ The number of times every reaction can fire before a reactant is exhausted. """
+        x = np.asarray(x, dtype = float)
+        L = np.full(len(self.k), np.inf)
+        np.minimum.at(L, self._erxn, np.floor(x[self._espe] / self._ecnt))
+        return L
+
+    def _leap_size(self, x, a, noncrit, epsilon):
+        """ Cao-Gillespie-Petzold step size for the non-critical reactions. """
+        x = np.asarray(x, dtype = float)
+        anc = np.where(noncrit, a, 0.)
+        mu = self._V @ anc
+        sigma2 = self._V2 @ anc
+        hor, hs = self._hor, self._hstoich
+        xm1 = np.maximum(x - 1, 1)
+        xm2 = np.maximum(x - 2, 1)
+        g = hor.astype(float)
+        g = np.where((hor == 2) & (hs == 2), 2 + 1 / xm1, g)
+        g = np.where((hor == 3) & (hs == 2), 1.5 * (2 + 1 / xm1), g)
+        g = np.where((hor == 3) & (hs == 3), 3 + 1 / xm1 + 2 / xm2, g)
+        mask = (hor > 0) & ((mu != 0) | (sigma2 != 0))
+        if not np.any(mask):
+            return np.inf
+        bound = np.maximum(epsilon * x[mask] / g[mask], 1)
+        with np.errstate(divide = 'ignore'):
+            t1 = bound / np.abs(mu[mask])
+            t2 = bound ** 2 / sigma2[mask]
+        return float(min(t1.min(), t2.min()))
+
+    def _implicit_firings(self, x, a, k, tau, P, noncrit, maxiter = 10):
+        """ The (rounded) firings of an implicit tau-leap (Rathinam et al. 2003).
+
+        Solves y = x + V (P - a(x) tau + a(y) tau) for the non-critical
+        reactions with Newton's method and returns P - a(x) tau + a(y) tau.
+        """
+        from scipy.sparse import identity
+        from scipy.sparse.linalg import spsolve
+        x = np.asarray(x, dtype = float)
+        mask = noncrit.astype(float)
+        b = x + self._V @ ((P - a * tau) * mask)
+        y = b + self._V @ (a * tau * mask)
+        I = identity(len(x), format = 'csc')
+        emask = mask[self._erxn]
+        for _ in range(maxiter):
+            ay = self.vector_propensities(np.maximum(y, 0), k)
+            F = y - b - tau * (self._V @ (ay * mask))
+            if np.max(np.abs(F), initial = 0) < 1e-6 * max(1, np.max(np.abs(y), initial = 0)):
+                break
+            self._jac.data[:] = self._jmap @ (self.partial_flux(np.maximum(y, 0), k) * emask)
+            y = y - spsolve((I - tau * self._jac).tocsc(), F)
+        ay = self.vector_propensities(np.maximum(y, 0), k)
+        return np.maximum(np.rint(P - a * tau + ay * tau), 0) * mask
+
+    def tau_leap(self, p0, time, r = None, seed = None, implicit = False,
+                 epsilon = 0.03, ncritical = 10, nssa = 100, max_steps = None):
+        """ Simulate one trajectory with adaptive (explicit or implicit) tau-leaping.
+
+        The step size is chosen as by Cao, Gillespie & Petzold (2006), such
+        that the expected relative change of every propensity is bounded by
+        epsilon. Critical reactions, which can fire less than ncritical
+        times before one of their reactants is exhausted, are simulated
+        exactly: at most one of them fires per step, at an exponentially
+        distributed time. If the leap would be shorter than a few SSA steps,
+        nssa exact SSA steps (direct method) are taken instead. Hence, rare
+        channels stay exact, and fast channels switch to leaping.
+
+        Args:
+            p0 (list[int]): The initial counts in the order of svars.
+            time (list[flt]): The (increasing) time points for which the counts are returned.
+            r (dict, optional): Rates, see MassActionSystem.rate_vector().
+            seed (int, optional): Seed (or numpy.random.SeedSequence) of the random
+                number generator.
+            implicit (bool, optional): Use implicit tau-leaping (for stiff systems).
+            epsilon (flt, optional): The error control parameter. Defaults to 0.03.
+            ncritical (int, optional): The threshold for critical reactions. Defaults to 10.
+            nssa (int, optional): Number of SSA steps if leaping is inefficient.
+            max_steps (int, optional): Raise a StochasticError after so many steps.
+
+        Returns:
+            A numpy.ndarray of counts with shape (len(svars), len(time)).
+        """
+        rng = np.random.default_rng(seed)
+        x = np.array(self._counts(p0), dtype = np.int64)
+        k = self.rate_vector(r).astype(float)
+        time = np.asarray(time, dtype = float)
+        out = np.empty((len(x), len(time)))
+        Vt = self._change_vectors
+
+        t, ti, steps = float(time[0]), 0, 0
+        while ti < len(time):
+            while ti < len(time) and time[ti] <= t:
+                out[:, ti] = x
+                ti += 1
+            if ti == len(time):
+                break
+            steps += 1
+            if max_steps and steps > max_steps:
+                raise StochasticError(f'Maximum number of steps ({max_steps}) exceeded.')
+
+            a = self.vector_propensities(x, k)
+            a0 = a.sum()
+            if a0 <= 0:
+                out[:, ti:] = x[:, None]
+                break
+            dt = time[ti] - t
+
+            critical = (a > 0) & (self._limits(x) < ncritical)
+            noncrit = (a > 0) & ~critical
+            tau1 = self._leap_size(x, a, noncrit, epsilon) if noncrit.any() else np.inf
+            if tau1 < 10 / a0:
+                # Leaping is inefficient: exact SSA steps (direct method).
+                for _ in range(nssa):
+                    tau = rng.exponential(1 / a0)
+                    if t + tau > time[ti]:
+                        t = time[ti]
+                        break
+                    t += tau
+                    x += Vt[rng.choice(len(a), p = a / a0)]
+                    a = self.vector_propensities(x, k)
+                    a0 = a.sum()
+                    if a0 <= 0:
+                        break
+                continue
+
+            ac = a[critical].sum()
+            while True:
+                tau2 = rng.exponential(1 / ac) if ac > 0 else np.inf
+                tau = min(tau1, tau2, dt)
+                firings = np.zeros(len(a))
+                if tau == tau2:
+                    jc = np.flatnonzero(critical)
+                    firings[rng.choice(jc, p = a[jc] / ac)] = 1
+                P = rng.poisson(np.where(noncrit, a, 0) * tau).astype(float)
+                if implicit:
+                    P = self._implicit_firings(x, a, k, tau, P, noncrit)
+                firings += P
+                xn = x + (firings.astype(np.int64) @ Vt)
+                if np.all(xn >= 0):
+                    break
+                tau1 = tau / 2  # negative counts: halve the leap and try again.
+            x, t = xn, t + tau
+        return out
+
+def simulate_stochastic(system, p0, time, r = None, method = 'ssa', seed = None, **kwargs):
+    """ Simulate a trajectory of a StochasticSystem.
+
+    Args:
+        method (str, optional): 'ssa' (next reaction method), 'tau-leap'
+            (explicit) or 'implicit-tau' (implicit tau-leaping).
+        **kwargs: Further arguments of the simulation method.
+
+    Returns:
+        A numpy.ndarray of counts with shape (len(svars), len(time)).
+    """
+    if method == 'ssa':
+        return system.ssa(p0, time, r, seed = seed, **kwargs)
+    elif method in ('tau-leap', 'implicit-tau'):
+        return system.tau_leap(p0, time, r, seed = seed,
+                               implicit = method == 'implicit-tau', **kwargs)
+    raise StochasticError(f'Unknown stochastic simulation method: {method}.')
+
+class P2Quantile(object):
+    """ Streaming estimate of a quantile for every entry of an array (P-square algorithm).
+
+    Jain & Chlamtac (1985): five markers per entry track the minimum, the
+    p/2, p, (1+p)/2 quantiles and the maximum, and are adjusted by
+    piecewise-parabolic interpolation for every observation. The memory
+    does not depend on the number of observations.
+
+    Args:
+        p (flt): The quantile, 0 <= p <= 1.
+        shape (tuple): The shape of the observations.
+    """
+    def __init__(self, p, shape):
+        self.p = p
+        self.count = 0
+        self.q = np.zeros((5,) + tuple(shape))
+        self.n = np.tile(np.arange(1., 6.).reshape((5,) + (1,) * len(shape)), (1,) + tuple(shape))
+        self.np = np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])
+        self.dn = np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+    def update(self, x):
+        x = np.asarray(x, dtype = float)
+        q, n = self.q, self.n
+        if self.count < 5:
+            q[self.count] = x
+            self.count += 1
+            if self.count == 5:
+                q.sort(axis = 0)
+            return
+
+        self.count += 1
+        # The cell k with q[k] <= x < q[k+1], extending the extreme markers.
+        np.minimum(q[0], x, out = q[0])
+        np.maximum(q[4], x, out = q[4])
+        k = np.clip((x[None] >= q[1:4]).sum(axis = 0), 0, 3)
+        n += np.arange(5).reshape((5,) + (1,) * x.ndim) > k[None]
+        self.np += self.dn
+
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            up = (d >= 1) & (n[i + 1] - n[i] > 1)
+            down = (d <= -1) & (n[i - 1] - n[i] < -1)
+            move = up | down
+            if not np.any(move):
+                continue
+            d = np.where(up, 1., -1.)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                        (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                        (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                qn = np.where(up, q[i + 1], q[i - 1])
+                nn = np.where(up, n[i + 1], n[i - 1])
+                ql = q[i] + d * (qn - q[i]) / (nn - n[i])
+            qi = np.where((q[i - 1] < qp) & (qp < q[i + 1]), qp, ql)
+            q[i] = np.where(move, qi, q[i])
+            n[i] = np.where(move, n[i] + d, n[i])
+
+    @property
+    def value(self):
+        if self.count == 0:
+            raise StochasticError('No observations.')
+        if self.count < 5:
+            return np.quantile(self.q[:self.count], self.p, axis = 0)
+        return self.q[2].copy()
+
+class EnsembleStatistics(object):
+    """ Running mean, variance and quantiles of trajectories.
+
+    Mean and variance are updated with Welford's algorithm, the quantiles
+    with the P-square algorithm. Memory is O(species x time points),
+    independent of the number of trajectories.
+
+    Args:
+        shape (tuple): The shape of one trajectory (species, time points).
+        quantiles (list[flt], optional): The quantiles to be estimated.
+    """
+    def __init__(self, shape, quantiles = (0.05, 0.5, 0.95)):
+        self.count = 0
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self._quantiles = [P2Quantile(p, shape) for p in quantiles]
+
+    def update(self, y):
+        """ Add a trajectory with shape (species, time points). """
+        y = np.asarray(y, dtype = float)
+        self.count += 1
+        delta = y - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (y - self._mean)
+        for q in self._quantiles:
+            q.update(y)
+
+    @property
+    def mean(self):
+        return self._mean.copy()
+
+    @property
+    def variance(self):
+        """ The sample variance (ddof = 1). """
+        if self.count < 2:
+            return np.zeros(self._m2.shape)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def quantiles(self):
+        """ A dictionary {p: numpy.ndarray} of quantile estimates. """
+        return {q.p: q.value for q in self._quantiles}
+
+def stochastic_ensemble(simulate, p0, time, replicates, r = None, seed = None,
+                        workers = None, chunksize = 1, quantiles = (0.05, 0.5, 0.95),
+                        **kwargs):
+    """ Simulate many stochastic replicates in parallel and summarize them online.
+
+    Every replicate gets an independent random stream, spawned from
+    numpy.random.SeedSequence(seed). The trajectories are merged into
+    EnsembleStatistics in the order of the replicates as they finish, hence
+    the results are reproducible for a given seed and do not depend on the
+    number of workers.
+
+    Args:
+        simulate (function): A simulate function with signature
+            simulate(p0, time, r, seed = seed, **kwargs), e.g. the simulate
+            function of an ODE library or functools.partial(simulate_stochastic, system).
+        p0 (list[int]): The initial counts.
+        time (list[flt]): The time points of every trajectory.
+        replicates (int): The number of trajectories.
+        r (dict, optional): Rates of the simulate function.
+        seed (int, optional): The root seed. Defaults to None (fresh entropy).
+        workers (int, optional): The number of worker processes. Defaults to
+            None, which uses all CPUs. Use 1 to simulate in the current process.
+        chunksize (int, optional): The number of replicates sent to a worker at once.
+        quantiles (list[flt], optional): The quantiles to be estimated.
+        **kwargs: Keyword arguments for the simulate function, e.g. method.
+
+    Returns:
+        :obj:`EnsembleStatistics()`
+    """
+    if replicates < 1:
+        raise StochasticError('At least one replicate is required.')
+    seeds = np.random.SeedSequence(seed).spawn(replicates)
+    stats = EnsembleStatistics((len(p0), len(time)), quantiles)
+
+    def replicate(seed):
+        return simulate(p0, time, r, seed = seed, **kwargs)
+
+    for y in fork_map(replicate, seeds, workers = workers, chunksize = chunksize):
+        stats.update(y)
+    return stats
@@ -0,0 +1,177 @@
+"""
+Parallel parameter and initial-condition sweeps of an ODE library.
+
+Test using tests/test_sweep.py.
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+import multiprocessing
+import numpy as np
+
+class SweepError(Exception):
+    pass
+
+def read_sweep_table(filename):
+    """ Read a tab (or whitespace) separated table of sweep parameters.
+
+    The first (non-comment) line is the header, specifying species names (or
+    their 1-based index) and rate names (e.g. k0, k1). Every other line
+    specifies the values of one simulation. Lines starting with '#' are
+    ignored.
+
+    Returns:
+        header (list[str]), table (numpy.ndarray)
+    """
+    header, table = None, []
+    with open(filename, 'r') as sfile:
+        for line in sfile:
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+            if header is None:
+                header = line.split()
+                continue
+            row = line.split()
+            if len(row) != len(header):
+                raise SweepError(f'Wrong number of columns: "{line}"')
+            table.append([float(x) for x in row])
+    if header is None:
+        raise SweepError(f'Empty sweep table: {filename}')
+    return header, np.array(table, dtype = float).reshape(-1, len(header))
+
+def sweep_jobs(header, table, svars, p0, rates):
+    """ Translate a sweep table into a list of (p0, rates) tuples.
+
+    Args:
+        header (list[str]): Species names (or 1-based indices) and rate names.
+        table (numpy.ndarray): One row of values per simulation.
+        svars (list[str]): The species of the ODE library.
+        p0 (list[flt]): The default initial concentrations.
+        rates (dict): The default rates of the ODE library.
+
+    Returns:
+        list[(numpy.ndarray, dict)]
+    """
+    species, params = [], []
+    for e, name in enumerate(header):
+        if name in svars:
+            species.append((e, svars.index(name)))
+        elif name in rates:
+            params.append((e, name))
+        elif name.isdigit() and 0 < int(name) <= len(svars):
+            species.append((e, int(name) - 1))
+        elif not rates and name[:1] == 'k' and name[1:].isdigit():
+            raise SweepError(f'Sweep table column "{name}": the rates of this ODE library ' + \
+                              'are hard-coded, write it with --sweep (rate_dict = True) ' + \
+                              'to sweep rates.')
+        else:
+            raise SweepError(f'Sweep table column "{name}" is neither a species nor a rate.')
+
+    jobs = []
+    for row in table:
+        x0 = np.array(p0, dtype = float)
+        for (e, i) in species:
+            x0[i] = row[e]
+        r = dict(rates) if params else None
+        for (e, name) in params:
+            r[name] = row[e]
+        jobs.append((x0, r))
+    return jobs
+
+# The function of fork_map(), e.g. a closure of the simulate function of an
+# ODE library. This is set in the parent process and inherited by forked
+# worker processes, such that the ODE system is compiled only once.
+_worker = dict()
+
+def _call(task):
+    return _worker['func'](task)
+
+def fork_map(func, tasks, workers = None, chunksize = 1, ordered = True):
+    """ Map a function over tasks in forked worker processes.
+
+    The function is inherited by the worker processes (it is not pickled),
+    hence it may be a closure, e.g. of an ODE library compiled in memory.
+    If processes cannot be forked, the tasks are run in the current process.
+
+    Args:
+        func (function): The function, called with one task at a time.
+        tasks (iterable): The tasks.
+        workers (int, optional): The number of worker processes. Defaults to
+            None, which uses all CPUs. Use 1 to run in the current process.
+        chunksize (int, optional): The number of tasks sent to a worker at once.
+        ordered (bool, optional): Yield the results in the order of the tasks,
+            instead of as they finish. Defaults to True.
+
+    Yields:
+        The results of func(task).
+    """
+    _worker.update(func = func)
+    try:
+        if workers != 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            logger.warning('Cannot fork worker processes, simulating in the current process.')
+            workers = 1
+        if workers == 1:
+            yield from map(func, tasks)
+        else:
+            with multiprocessing.get_context('fork').Pool(processes = workers) as pool:
+                imap = pool.imap if ordered else pool.imap_unordered
+                yield from imap(_call, tasks, chunksize = chunksize)
+    finally:
+        _worker.clear()
+
+def sweep(simulate, jobs, time, workers = None, chunksize = 1, out = None, batch = 1, 
+          **kwargs):
+    """ Integrate an ODE library for many initial concentrations and rates.
+
+    Args:
+        simulate (function): The simulate function of an ODE library.
+        jobs (list[(p0, rates)]): The initial concentrations and rates, see sweep_jobs().
+        time (list[flt]): The time points of every simulation.
+        workers (int, optional): The number of worker processes. Defaults to
+            None, which uses all CPUs. Use 1 to simulate in the current process.
+        chunksize (int, optional): The number of simulations sent to a worker at once.
+        out (str, optional): Stream the results into a .npy file as they finish.
+        batch (int, optional): The number of simulations integrated by one call of
+            the simulate function. For batch > 1, simulate is called with initial
+            concentrations of shape (batch, n) and a list of rates, and has to
+            return trajectories with shape (batch, n, len(time)), see
+            crnsimulator.ensemble.simulate_ensemble().
+        **kwargs: Keyword arguments for the simulate function, e.g. method, atol, rtol.
+
+    Returns:
+        A numpy.ndarray with shape (len(jobs), len(svars), len(time)), which is
+        memory-mapped to the file `out`, if specified.
+    """
+    if not len(jobs):
+        raise SweepError('No simulations specified.')
+    shape = (len(jobs), len(jobs[0][0]), len(time))
+    if out:
+        result = np.lib.format.open_memmap(out, mode = 'w+', dtype = float, shape = shape)
+    else:
+        result = np.empty(shape, dtype = float)
+
+    if batch > 1:
+        tasks = [(i, (np.array([p0 for (p0, _) in jobs[i:i + batch]]),
+                      [r for (_, r) in jobs[i:i + batch]])) for i in range(0, len(jobs), batch)]
+    else:
+        tasks = list(enumerate(jobs))
+
+    def collect(results):
+        for done, (index, ny) in enumerate(results, 1):
+            if batch > 1:
+                result[index:index + len(ny)] = ny
+            else:
+                result[index] = ny
+            logger.debug(f'Sweep: finished task {index} ({done}/{len(tasks)}).')
+
+    def run(task):
+        index, (p0, r) = task
+        return index, simulate(p0, time, r, **kwargs)
+
+    collect(fork_map(run, tasks, workers = workers, chunksize = chunksize, ordered = False))
+    if out:
+        result.flush()
+    return result
+
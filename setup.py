@@ -32,6 +32,9 @@ setup(
         'numpy',
         'matplotlib',
         'seaborn'],
+    extras_require = {
+        'numba': ['numba'],
+        },
     packages = find_packages(),
     test_suite = 'tests',
     entry_points = {
@@ -0,0 +1,61 @@
+#
+# Unittests for benchmarks/generators.py and benchmarks/run_benchmarks.py
+#
+
+import os
+import sys
+import unittest
+
+from crnsimulator import parse_crn_string
+from crnsimulator.reactiongraph import ReactionNode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'benchmarks'))
+from generators import GENERATORS, random_mass_action, cascade, oscillator
+from run_benchmarks import benchmark, compare, startup, STAGES, SYMBOLIC, STARTUP_TARGETS
+
+class TestBenchmarks(unittest.TestCase):
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def test_generators(self):
+        crn, species = parse_crn_string(random_mass_action(50))
+        self.assertEqual(len(species), 50)
+        self.assertEqual(len(crn), 100)
+        self.assertTrue(all(len(p) <= len(r) for r, p, _ in crn))
+        self.assertEqual(random_mass_action(50), random_mass_action(50))
+
+        crn, species = parse_crn_string(cascade(10))
+        self.assertEqual(len(species), 11)
+        self.assertEqual(species['Z0'], ('constant', 1))
+
+        crn, species = parse_crn_string(oscillator(3))
+        self.assertEqual(sorted(species), ['S0', 'S1', 'S2'])
+        self.assertEqual([float(k[0]) for _, _, k in crn], [0.2, 0.4, 0.7])
+
+    def test_benchmark(self):
+        for generator in GENERATORS:
+            results = benchmark(generator, 10, repeat = 1)
+            self.assertEqual([r['stage'] for r in results], list(STAGES))
+            for r in results:
+                self.assertGreaterEqual(r['wall'], 0)
+                self.assertGreaterEqual(r['peak_memory'], 0)
+
+        results = benchmark('oscillator', 10, repeat = 1, memory = False, sympy_limit = 5)
+        skipped = [r['stage'] for r in results if 'skipped' in r]
+        self.assertEqual(skipped, list(SYMBOLIC))
+        self.assertIsNone(results[-1]['peak_memory'])
+
+        old = {'results': results}
+        new = {'results': [dict(r, wall = 2 * r['wall']) if r['stage'] == 'integrate' else r
+                           for r in results]}
+        self.assertEqual(compare(old, old), [])
+        self.assertEqual([s[2] for s in compare(new, old)], ['integrate'])
+
+    def test_startup(self):
+        results = startup(repeat = 1)
+        self.assertEqual([r['stage'] for r in results], list(STARTUP_TARGETS))
+        self.assertTrue(all(r['wall'] > 0 for r in results))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#
+# Unittests for crnsimulator.cache
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.cache import ODELibCache, crn_digest, read_digest
+
+class TestODELibCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+        shutil.rmtree(self.directory)
+
+    def test_digest(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.2], [['B'], ['A'], 0.4]]
+        svars = ['A', 'B']
+        d1 = crn_digest(crn, svars)
+        self.assertEqual(d1, crn_digest([[['B', 'A'], ['B', 'B'], 0.2],
+                                         [['B'], ['A'], 0.4]], svars))
+        self.assertNotEqual(d1, crn_digest(crn, ['B', 'A']))
+        self.assertNotEqual(d1, crn_digest(crn, svars, jacobian = True))
+        self.assertNotEqual(d1, crn_digest(crn, svars, const = [True, False]))
+        self.assertNotEqual(d1, crn_digest(crn, svars, concvect = [0.1, 0]))
+        self.assertNotEqual(d1, crn_digest(crn[:1], svars))
+        self.assertEqual(d1, crn_digest(crn, svars, const = [False, False]))
+
+        RG = ReactionGraph(crn)
+        filename = os.path.join(self.directory, 'lib.py')
+        RG.write_ODE_lib(sorted_vars = svars, filename = filename, digest = d1)
+        self.assertEqual(read_digest(filename), d1)
+        RG.write_ODE_lib(sorted_vars = svars, filename = filename)
+        self.assertEqual(read_digest(filename), None)
+
+    def test_lru_eviction(self):
+        cache = ODELibCache(self.directory, maxsize = 25)
+        self.assertIsNone(cache.lookup('a'))
+        for e, key in enumerate('abc'):
+            tmp = os.path.join(self.directory, 'tmp.py')
+            with open(tmp, 'w') as f:
+                f.write('x' * 10)
+            os.utime(tmp, (e, e))
+            path = cache.store(key, tmp)
+            os.utime(path, (e, e))
+            if key == 'b':
+                self.assertEqual(cache.lookup('a'), cache.path('a'))
+        # 'b' was the least recently used library.
+        self.assertIsNotNone(cache.lookup('a'))
+        self.assertIsNone(cache.lookup('b'))
+        self.assertIsNotNone(cache.lookup('c'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,10 @@
 # Written by Stefan Badelt (badelt@caltech.edu).
 #
 
+import io
 import unittest
 from pyparsing import ParseException
-from crnsimulator.crn_parser import parse_crn_string
+from crnsimulator.crn_parser import parse_crn_string, crn_document_setup, iter_crn
 
 class TestCRNparser(unittest.TestCase):
 
@@ -213,6 +214,49 @@ class TestCRNparser(unittest.TestCase):
         self.assertEqual(o1, output_processed1)
         self.assertEqual(o2, output_processed2)
 
+    def test_fast_path(self):
+        # The fast path must return exactly what pyparsing returns.
+        document = crn_document_setup()
+        inputs = ["A + 2B -> C [k = 1.0]",
+                  "A+2 B->C[1e-5] # comment\n\n  2A <=> [kf=1.5e+3, kr= 7]",
+                  "A @ i 1; B @constant 1.2e3\r\n0A <=> B\t[fw = 1, bw = 2]",
+                  "<=> A [3, 4]; -> ; A_1 + b2 -> 12c",
+                  "A -> B C -> D # fallback to pyparsing",
+                  "A -> B [k = 1]\n2A @ initial 3\nA + B <=> C [kf = 1, rv = 2]"]
+        for data in inputs:
+            self.assertEqual(parse_crn_string(data, process = False),
+                             document.parseString(data).asList())
+
+        for data in ["A -> B [kf = 1]", "A -> B;", "# nothing", "", "A <=> B [1]\nC -> D",
+                     "A -> B [k = 1.]", "A @ in 1", "A + -> B"]:
+            with self.assertRaises(ParseException):
+                document.parseString(data)
+            with self.assertRaises(ParseException):
+                parse_crn_string(data)
+
+
+    def test_streaming(self):
+        input_string = """# Comment
+        A @ initial 50; A + B -> C [k = 77]
+        <=> C [kf = 18, kr = 77] # comment
+        B @ constant 3
+        X + 2Y <=> Z
+        """
+        o1, o2 = parse_crn_string(input_string)
+        species = dict()
+        stream = iter_crn(io.StringIO(input_string), species)
+        self.assertEqual(next(stream), o1[0])
+        self.assertEqual(species, {'A': ('initial', 50), 'B': ('initial', 0), 'C': ('initial', 0)})
+        self.assertEqual(list(stream), o1[1:])
+        self.assertEqual(species, o2)
+
+        with self.assertRaises(ParseException) as ex:
+            list(iter_crn(io.StringIO("A -> B\n\nA @ i 1; B -> [k = 1.]\n"), dict()))
+        self.assertEqual(ex.exception.lineno, 3)
+        self.assertEqual(ex.exception.line, "A @ i 1; B -> [k = 1.]")
+        self.assertEqual(ex.exception.col, 15)
+        with self.assertRaises(ParseException):
+            list(iter_crn(io.StringIO("# nothing\n"), dict()))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,61 @@
+#
+# Unittests for crnsimulator.ensemble
+#
+
+import unittest
+import numpy as np
+from scipy.integrate import odeint
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.ensemble import Ensemble, simulate_ensemble
+from crnsimulator.sweep import sweep
+
+class TestEnsemble(unittest.TestCase):
+    def setUp(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.2],
+               [['B', 'C'], ['C', 'C'], 0.4],
+               [['C', 'A'], ['A', 'A'], 0.7],
+               [[], ['A'], 0.01]]
+        self.system = ReactionGraph(crn).mass_action_system()
+        self.p0s = np.array([[0.1, 1e-2, 1e-3],
+                             [0.2, 1e-2, 1e-3],
+                             [0.1, 5e-2, 0.0]])
+        self.rates = [None, {'k1': 0.8}, {'k0': 0.1, 'k3': 0}]
+        self.time = np.linspace(0, 50, 20)
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def reference(self):
+        return np.array([odeint(self.system, p0, self.time, (r, ),
+                                rtol = 1e-10, atol = 1e-12).T
+                         for p0, r in zip(self.p0s, self.rates)])
+
+    def test_stacked_system(self):
+        ens = Ensemble(self.system, self.p0s, self.rates)
+        y = self.p0s.ravel()
+        dy = ens(y).reshape(3, 3)
+        J = ens.jacobian(y).toarray()
+        for b, (p0, r) in enumerate(zip(self.p0s, self.rates)):
+            self.assertTrue(np.allclose(dy[b], self.system(p0, 0, r)))
+            block = J[3 * b: 3 * b + 3, 3 * b: 3 * b + 3]
+            self.assertTrue(np.allclose(block, self.system.dense_jacobian(p0, 0, r)))
+        self.assertEqual(ens.jacobian(y).nnz, 3 * 9)
+
+    def test_integrate(self):
+        ref = self.reference()
+        for method in ['odeint', 'LSODA', 'BDF', 'Radau']:
+            ny = Ensemble(self.system, self.p0s, self.rates).integrate(
+                    self.time, method = method, rtol = 1e-8, atol = 1e-10)
+            self.assertEqual(ny.shape, (3, 3, 20))
+            self.assertTrue(np.allclose(ny, ref, rtol = 1e-4, atol = 1e-8))
+
+    def test_batched_sweep(self):
+        ref = self.reference()
+        jobs = list(zip(self.p0s, self.rates))
+        ny = sweep(lambda p0s, time, rs, **kw: simulate_ensemble(self.system, p0s, time, rs, **kw),
+                   jobs, self.time, workers = 1, batch = 2, rtol = 1e-8, atol = 1e-10)
+        self.assertTrue(np.allclose(ny, ref, rtol = 1e-4, atol = 1e-8))
+
+if __name__ == '__main__':
+    unittest.main()
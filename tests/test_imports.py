@@ -0,0 +1,64 @@
+#
+# Unittests for the lazy imports of crnsimulator
+#
+
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ['sympy', 'pyparsing', 'scipy.integrate', 'matplotlib']
+
+def loaded(code, modules = HEAVY):
+    """ Returns the modules that are imported by a fresh interpreter running code. """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    code += f"\nimport sys\nprint(' '.join(m for m in {modules!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], env = env, check = True,
+                         capture_output = True, text = True).stdout
+    return out.split()
+
+class TestImports(unittest.TestCase):
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def test_package(self):
+        self.assertEqual(loaded('import crnsimulator'), [])
+        self.assertEqual(loaded('import crnsimulator.simulator'), ['pyparsing'])
+        self.assertEqual(loaded('from crnsimulator import ReactionGraph'), [])
+        self.assertEqual(loaded('from crnsimulator import parse_crn_string'), ['pyparsing'])
+
+    def test_odelib(self):
+        RG = ReactionGraph([[['A', 'B'], ['C'], 1.0], [['C'], ['A', 'B'], 0.5]])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename, _ = RG.write_ODE_lib(['A', 'B', 'C'], [1, 0.5, 0],
+                                           filename = os.path.join(tmpdir, 'odesystem.py'))
+            code = f"import runpy, sys\nsys.argv = [{filename!r}, '--t8', '1', '--nxy']\n" + \
+                   "sys.stdout = open(os.devnull, 'w')\n" + \
+                   f"runpy.run_path({filename!r}, run_name = '__main__')\n" + \
+                   "sys.stdout = sys.__stdout__"
+            self.assertEqual(loaded('import os\n' + code), ['scipy.integrate'])
+
+    def test_standalone(self):
+        # Generated libraries run without crnsimulator (except for plotting).
+        RG = ReactionGraph([[['A', 'X'], ['B', 'X'], 1.0], [['B'], ['A'], 0.5]])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename, _ = RG.write_ODE_lib(['A', 'B', 'X'], [1, 0, 2],
+                                           const = [False, False, True],
+                                           filename = os.path.join(tmpdir, 'odesystem.py'))
+            code = "import runpy, sys\nsys.modules['crnsimulator'] = None\n" + \
+                   f"sys.argv = [{filename!r}, '--t-lin', '3', '--nxy']\n" + \
+                   f"runpy.run_path({filename!r}, run_name = '__main__')"
+            out = subprocess.run([sys.executable, '-c', code], check = True,
+                                 capture_output = True, text = True).stdout
+        lines = [list(map(float, l.split())) for l in out.splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0], [0, 1, 0, 2])
+        self.assertAlmostEqual(lines[-1][1], 0.2, places = 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#
+# Unittests for crnsimulator.jit
+#
+
+import unittest
+import numpy as np
+
+import crnsimulator.jit
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.massaction import MassActionSystem
+from crnsimulator.jit import NumbaMassActionSystem, mass_action_rhs
+
+class TestJIT(unittest.TestCase):
+    def setUp(self):
+        crn = [[['A', 'B', 'B'], ['C'], 0.3],
+               [['C'], ['A', 'A', 'D'], 1.5],
+               [[], ['B'], 0.01],
+               [['D', 'A'], [], 2],
+               [['B', 'B'], ['B', 'E'], 0.7]]
+        self.RG = ReactionGraph(crn)
+        self.svars = ['E', 'D', 'C', 'B', 'A']
+        self.const = [False, False, False, True, False]
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def test_kernels(self):
+        reactions = self.RG.indexed_reactions(self.svars)
+        ref = MassActionSystem(self.svars, reactions, self.const)
+        jit = NumbaMassActionSystem(self.svars, reactions, self.const)
+        for x in np.random.default_rng(1).random((5, 5)):
+            self.assertTrue(np.allclose(jit(x), ref(x)))
+            self.assertTrue(np.allclose(jit(x, 0, {'k1': 3}), ref(x, 0, {'k1': 3})))
+            self.assertTrue(np.allclose(jit.dense_jacobian(x), ref.dense_jacobian(x)))
+        # Batched states use the numpy implementation.
+        X = np.random.default_rng(2).random((5, 3))
+        self.assertTrue(np.allclose(jit(X), ref(X)))
+
+        # The kernels are plain python functions without numba.
+        func = getattr(mass_action_rhs, 'py_func', mass_action_rhs)
+        x = np.array([1., 2., 3., 4., 5.])
+        out = func(x, jit.k, jit._fptr, jit._fidx, *jit._S, np.zeros(5), np.zeros(5))
+        self.assertTrue(np.allclose(out, ref(x)))
+
+    def test_backend(self):
+        time = np.linspace(0, 10, 20)
+        p0 = np.array([0, 0, 0.5, 0.1, 1.0])
+        ref = self.RG.compile(self.svars, const = self.const, jacobian = True, backend = 'numpy')
+        lib = self.RG.compile(self.svars, const = self.const, jacobian = True, backend = 'numba')
+        self.assertTrue(np.allclose(lib.simulate(p0, time), ref.simulate(p0, time)))
+
+        backup, crnsimulator.jit.numba = crnsimulator.jit.numba, None
+        try:
+            with self.assertLogs('crnsimulator.reactiongraph', level = 'WARNING'):
+                system = self.RG.mass_action_system(self.svars, jit = True)
+            self.assertNotIsInstance(system, NumbaMassActionSystem)
+        finally:
+            crnsimulator.jit.numba = backup
+
+if __name__ == '__main__':
+    unittest.main()
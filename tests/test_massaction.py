@@ -0,0 +1,92 @@
+#
+# Unittests for crnsimulator.massaction
+#
+
+import os
+import unittest
+import numpy as np
+from scipy.integrate import odeint
+
+from crnsimulator import get_integrator
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+
+class TestMassActionSystem(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'test_massaction_file.py'
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_stoichiometry(self):
+        crn = [[['A', 'B', 'B'], ['C'], 5],
+               [[], ['A'], 0.5],
+               [['C'], [], 2]]
+        RG = ReactionGraph(crn)
+        system = RG.mass_action_system()
+        self.assertEqual(system.svars, ['A', 'B', 'C'])
+        self.assertEqual(system.reactants.toarray().tolist(),
+                         [[1, 0, 0], [2, 0, 0], [0, 0, 1]])
+        self.assertEqual(system.products.toarray().tolist(),
+                         [[0, 1, 0], [0, 0, 0], [1, 0, 0]])
+        self.assertEqual(system.rates, {'k0': 5, 'k1': 0.5, 'k2': 2})
+
+        x = np.array([0.3, 0.7, 0.2])
+        v = system.flux(x)
+        self.assertTrue(np.allclose(v, [5 * 0.3 * 0.7**2, 0.5, 2 * 0.2]))
+        self.assertTrue(np.allclose(system(x), [-v[0] + v[1], -2 * v[0], v[0] - v[2]]))
+        self.assertTrue(np.allclose(system.flux(x, {'k1': 3}), [v[0], 3, v[2]]))
+
+        system = RG.mass_action_system(const = [False, True, False])
+        self.assertTrue(np.allclose(system(x), [-v[0] + v[1], 0, v[0] - v[2]]))
+
+    def test_generated_odesystem(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.2],
+               [['B', 'C'], ['C', 'C'], 0.4],
+               [['C', 'A'], ['A', 'A'], 0.7],
+               [['A', 'A'], ['D'], '0.1']]
+        RG = ReactionGraph(crn)
+        svars = ['B', 'C', 'A', 'D']
+        filename, odename = RG.write_ODE_lib(sorted_vars = svars, filename = self.filename)
+        odesys = get_integrator(filename, function = odename)
+        system = RG.mass_action_system(sorted_vars = svars)
+
+        p0 = np.array([0.1, 1e-2, 1e-3, 0])
+        self.assertTrue(np.allclose(system(p0, 0, None), odesys(p0, 0, None)))
+
+        time = np.linspace(0, 100, num = 50)
+        ny1 = odeint(odesys, p0, time, (None, ), rtol = 1e-10, atol = 1e-12)
+        ny2 = odeint(system, p0, time, (None, ), rtol = 1e-10, atol = 1e-12)
+        self.assertTrue(np.allclose(ny1, ny2))
+
+    def test_sparse_jacobian(self):
+        crn = [[['A', 'B', 'B'], ['C'], 5],
+               [['C', 'A'], ['A', 'A'], 0.7],
+               [[], ['D'], 0.5],
+               [['D'], ['E'], 2]]
+        RG = ReactionGraph(crn)
+        svars = ['A', 'B', 'C', 'D', 'E']
+        filename, odename = RG.write_ODE_lib(sorted_vars = svars, jacobian = True,
+                                             filename = self.filename)
+        jacobian = get_integrator(filename, function = 'jacobian')
+        system = RG.mass_action_system(sorted_vars = svars)
+
+        x = np.array([0.3, 0.7, 0.2, 0.0, 0.1])
+        J = system.jacobian(x)
+        self.assertEqual(J.nnz, 10)
+        self.assertTrue(np.allclose(J.toarray(), jacobian(x, 0, None)))
+        self.assertTrue(np.array_equal(system.jacobian_sparsity.toarray(),
+                                       (J.toarray() != 0).astype(int)))
+
+        with open(filename) as f:
+            self.assertEqual(sum(1 for l in f if l.startswith("    J[")), 10)
+
+        # Finite differences
+        eps = 1e-7
+        fd = np.array([(system(x + eps * np.eye(5)[j]) - system(x)) / eps
+                        for j in range(5)]).T
+        self.assertTrue(np.allclose(J.toarray(), fd, atol = 1e-5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#
+# Unittests for crnsimulator.output
+#
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from crnsimulator.output import write_nxy, write_time_course, OutputError
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.time = np.linspace(0, 10, 7)
+        self.ny = np.array([np.sin(self.time), np.cos(self.time), np.full(7, np.nan)])
+        self.svars = ['A', 'B', 'C']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_nxy(self):
+        ref = ' '.join(['{:15s}'.format(x) for x in ['time'] + self.svars]) + '\n'
+        for i in zip(self.time, *self.ny):
+            ref += ' '.join(map("{:.9e}".format, i)) + '\n'
+        for chunksize in [1, 5, 2**16]:
+            out = io.StringIO()
+            write_nxy(out, self.time, self.ny, self.svars, header = True, chunksize = chunksize)
+            self.assertEqual(out.getvalue(), ref)
+
+    def test_binary_formats(self):
+        ref = np.column_stack((self.time, self.ny.T))
+
+        fn = write_time_course(os.path.join(self.directory, 'x.npy'),
+                               self.time, self.ny, self.svars)
+        self.assertTrue(np.array_equal(np.load(fn), ref, equal_nan = True))
+
+        fn = write_time_course(os.path.join(self.directory, 'x.npz'),
+                               self.time, self.ny, self.svars)
+        data = np.load(fn)
+        self.assertTrue(np.array_equal(data['ny'], self.ny, equal_nan = True))
+        self.assertEqual(list(data['svars']), self.svars)
+
+        fn = write_time_course(os.path.join(self.directory, 'x.f32'),
+                               self.time, self.ny, self.svars)
+        data = np.fromfile(fn, dtype = np.float32).reshape(7, 4)
+        self.assertTrue(np.allclose(data, ref, equal_nan = True))
+
+        fn = write_time_course(os.path.join(self.directory, 'x.bin'),
+                               self.time, self.ny, self.svars, fmt = 'raw64')
+        data = np.fromfile(fn, dtype = np.float64).reshape(7, 4)
+        self.assertTrue(np.array_equal(data, ref, equal_nan = True))
+
+        with self.assertRaises(OutputError):
+            write_time_course(os.path.join(self.directory, 'x.xyz'),
+                              self.time, self.ny, self.svars)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#
+# Unittests for crnsimulator.profiling
+#
+
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+from argparse import ArgumentParser
+
+from crnsimulator import profiling
+from crnsimulator.profiling import Profiler, ProfilingError
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.odelib_template import add_integrator_args
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        crn = [[['A', 'B'], ['C'], 1.0],
+               [['C'], ['A', 'B'], 0.5],
+               [['C', 'E'], ['D', 'E'], 0.3]]
+        self.RG = ReactionGraph(crn)
+        self.svars = ['A', 'B', 'C', 'D', 'E']
+        self.p0 = [1, 0.5, 0, 0, 0.1]
+        self.time = np.linspace(0, 10, 11)
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+        profiling.stop()
+
+    def test_phases(self):
+        prof = Profiler(memory = True)
+        with prof.phase('outer'):
+            with prof.phase('inner'):
+                x = np.ones(2**23)
+                x += 1
+            del x
+        inner, outer = prof.phases
+        self.assertEqual((inner['name'], inner['depth']), ('inner', 1))
+        self.assertEqual((outer['name'], outer['depth']), ('outer', 0))
+        self.assertGreaterEqual(outer['wall'], inner['wall'])
+        if inner['peak_memory'] is not None: # Linux only
+            self.assertGreater(inner['peak_memory'], 2**25)
+            self.assertGreaterEqual(outer['peak_memory'], inner['peak_memory'])
+
+        # By default, the peak memory of the process is not reset.
+        prof = Profiler()
+        with prof.phase('none'):
+            pass
+        self.assertIsNone(prof.phases[0]['peak_memory'])
+
+        # Without an active profiler phases do nothing.
+        with profiling.phase('none'):
+            pass
+        self.assertIsNone(profiling.active())
+        profiling.start()
+        with self.assertRaises(ProfilingError):
+            profiling.start()
+
+    def test_solvers(self):
+        odelib = self.RG.compile(self.svars, jacobian = True)
+        ref = odelib.simulate(self.p0, self.time)
+        with profiling.profile() as prof:
+            ny = odelib.simulate(self.p0, self.time)
+            odelib.simulate(self.p0, self.time, method = 'BDF')
+        self.assertIsNone(profiling.active())
+        # Profiling does not change the results.
+        self.assertTrue(np.array_equal(ny, ref))
+        odeint, bdf = prof.solvers
+        self.assertEqual(odeint['solver'], 'odeint')
+        self.assertGreater(odeint['steps'], 0)
+        self.assertEqual(prof.calls['rhs'], odeint['rhs_evaluations'] + bdf['rhs_evaluations'])
+        self.assertEqual(prof.calls['jacobian'],
+                         odeint['jacobian_evaluations'] + bdf['jacobian_evaluations'])
+        self.assertGreater(bdf['lu_decompositions'], 0)
+
+        # The reduced system reports to the same profiler.
+        odelib = self.RG.compile(self.svars, reduce = True, backend = 'numpy')
+        with profiling.profile() as prof:
+            odelib.simulate(self.p0, self.time)
+        self.assertEqual(prof.solvers[0]['rhs_evaluations'], prof.calls['rhs'])
+
+    def test_integrate(self):
+        parser = ArgumentParser()
+        add_integrator_args(parser)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report = os.path.join(tmpdir, 'profile.json')
+            args = parser.parse_args(['--p0', 'A=1', 'B=0.5', '--t8', '10',
+                                      '--profile', report])
+            with profiling.profile():
+                odelib = self.RG.compile(self.svars, jacobian = True)
+            odelib.integrate(args)
+            with open(report) as fh:
+                data = json.load(fh)
+        self.assertEqual([p['name'] for p in data['phases']], ['integration', 'output'])
+        self.assertEqual(data['solvers'][0]['solver'], 'odeint')
+        self.assertGreater(data['calls']['rhs'], 0)
+        self.assertGreater(data['total']['wall'], 0)
+        self.assertIsNone(profiling.active())
+
+    def test_compile(self):
+        with profiling.profile() as prof:
+            self.RG.compile(self.svars, reduce = True)
+        self.assertEqual([p['name'] for p in prof.phases], ['odes', 'codegen', 'compile'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,11 @@ class Test_ReactionGraph(unittest.TestCase):
         self.assertEqual(sorted(RG.reactants), ['A', 'B'])
         self.assertEqual(sorted(RG.products), ['C'])
 
+        # Reactions can be consumed from a stream.
+        RG = ReactionGraph(rxn for rxn in [[['A'], ['B'], 1], [['B'], ['C'], 2]])
+        self.assertEqual(sorted(RG.species), ['A', 'B', 'C'])
+        self.assertEqual(len(RG.reactions), 2)
+
         # TODO: structure of M and R is variable, cannot check it like this
         # M, R = RG.get_odes()
         # rM = {'A': [['-18', 'A', 'B'], ['-99', 'A']], 'C': [['18', 'A', 'B'], ['99', 'A']], 'B': [['-18', 'A', 'B']], 'E': [['99', 'A']]}
@@ -50,6 +55,70 @@ class Test_ReactionGraph(unittest.TestCase):
         # self.assertDictEqual(M, rM)
         # self.assertDictEqual(R, rR)
 
+    def test_indexed_representation(self):
+        crn = [[['A', 'B', 'B'], ['C'], 5], [['C'], ['A', 'D'], 7], [[], ['B'], 1]]
+        RG = ReactionGraph(crn)
+        self.assertEqual(RG.species, ['A', 'B', 'C', 'D'])
+        self.assertEqual(dict(RG.species_index), {'A': 0, 'B': 1, 'C': 2, 'D': 3})
+        self.assertEqual(RG.rates, [5, 7, 1])
+
+        indptr, indices, counts = RG.reactant_csr
+        self.assertEqual(list(indptr), [0, 2, 3, 3])
+        self.assertEqual(list(indices), [0, 1, 2])
+        self.assertEqual(list(counts), [1, 2, 1])
+        indptr, indices, counts = RG.product_csr
+        self.assertEqual(list(indptr), [0, 1, 3, 4])
+        self.assertEqual(list(indices), [2, 0, 3, 1])
+
+        # The node-based interface.
+        r0, r1, r2 = RG.reactions
+        self.assertEqual([r.name for r in RG.reactions], ['RXN:0', 'RXN:1', 'RXN:2'])
+        self.assertIs(RG.reactions[0], r0)
+        self.assertEqual(list(RG.nodes), [r0, 'A', 'B', 'C', r1, 'D', r2])
+        self.assertEqual(RG.nodes[r1], {'rate': 7})
+        self.assertEqual(RG.edges[('B', r0)], 2)
+        self.assertEqual(RG.number_of_edges('B', r0), 2)
+        self.assertEqual(RG.number_of_edges(r1, 'D'), 1)
+        self.assertEqual(RG.predecessors(r0), {'A', 'B'})
+        self.assertEqual(RG.successors('C'), {r1})
+        self.assertEqual(RG.predecessors('B'), {r2})
+        self.assertEqual(sorted(RG.reactants), ['A', 'B', 'C'])
+        self.assertEqual(sorted(RG.products), ['A', 'B', 'C', 'D'])
+
+        # Views are updated when reactions are added.
+        RG.add_reaction([['D'], ['E'], 3])
+        self.assertEqual(len(RG.reactions), 4)
+        self.assertIs(RG.reactions[0], r0)
+        self.assertEqual(sorted(RG.reactants), ['A', 'B', 'C', 'D'])
+        self.assertEqual(list(RG.reactant_csr[0]), [0, 2, 3, 3, 4])
+        self.assertEqual(RG.indexed_reactions(['E', 'D', 'C', 'B', 'A']),
+                         [[[3, 3, 4], [2], 5], [[2], [1, 4], 7], [[], [3], 1], [[1], [0], 3]])
+
+    def test_incremental_odes(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.2],
+               [['B', 'C'], ['C', 'C'], 0.4],
+               [['C', 'A'], ['A', 'A'], 0.7]]
+        more = [[['B', 'D'], ['A'], 0.1], [[], ['D', 'D'], 0.3]]
+        RG = ReactionGraph(crn)
+        V, M, J, R = RG.ode_system(jacobian = True, rate_dict = True)
+        self.assertEqual(RG._odes[True].size, 3)
+        rowC = RG._odes[True].row(RG.species_index['C'])
+
+        for rxn in more:
+            RG.add_reaction(rxn)
+            V, M, J, R = RG.ode_system(jacobian = True, rate_dict = True)
+        self.assertEqual(RG._odes[True].size, 5)
+        # Rows that are not affected by the new reactions are not recomputed.
+        self.assertIs(RG._odes[True].row(RG.species_index['C']), rowC)
+
+        ref = ReactionGraph(crn + more)
+        rV, rM, rJ, rR = ref.ode_system(jacobian = True, rate_dict = True)
+        self.assertEqual(V, rV)
+        self.assertEqual(M, rM)
+        self.assertEqual(J, rJ)
+        self.assertEqual(R, rR)
+        self.assertEqual(J, M.jacobian(V))
+
 
 if __name__ == '__main__':
     unittest.main()
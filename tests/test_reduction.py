@@ -0,0 +1,131 @@
+#
+# Unittests for crnsimulator.reduction
+#
+
+import sys
+import unittest
+from unittest import mock
+import numpy as np
+from scipy.integrate import odeint
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.reduction import (conservation_laws, constant_laws, ReducedSystem,
+                                    ReductionError)
+from crnsimulator.sweep import sweep
+
+class TestReduction(unittest.TestCase):
+    def setUp(self):
+        # An enzyme cycle: E + S <=> ES -> E + P, P -> S, with a buffered cofactor X.
+        crn = [[['E', 'S'], ['ES'], 2.0],
+               [['ES'], ['E', 'S'], 0.5],
+               [['ES', 'X'], ['E', 'P', 'X'], 1.0],
+               [['P'], ['S'], 0.1]]
+        self.RG = ReactionGraph(crn)
+        self.svars = ['E', 'S', 'ES', 'P', 'X']
+        self.const = [False, False, False, False, True]
+        self.p0 = [0.1, 1.0, 0, 0, 2.0]
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def test_conservation_laws(self):
+        L, pivots = self.RG.conservation_laws(self.svars, self.const)
+        # Total enzyme, total substrate and the constant species.
+        self.assertEqual(len(L), 3)
+        S = self.RG.mass_action_system(self.svars, self.const).stoichiometry.toarray()
+        self.assertTrue(np.allclose(L @ S, 0))
+        self.assertTrue(np.allclose(L[:, pivots], np.eye(3)))
+        self.assertIn(4, pivots)
+
+        # Conservation laws are computed per connected component.
+        L, pivots = conservation_laws(np.array([[1, 0], [-1, 0], [0, 1], [0, -1]]))
+        self.assertEqual(L.tolist(), [[1, 1, 0, 0], [0, 0, 1, 1]])
+        self.assertEqual(pivots, [1, 3])
+
+    def test_reduced_system(self):
+        system = self.RG.mass_action_system(self.svars, self.const)
+        laws = self.RG.conservation_laws(self.svars, self.const)
+        red = ReducedSystem(lambda x, t: system(x), lambda x, t: system.jacobian(x),
+                            laws, self.p0)
+        self.assertEqual(len(red.free), 2)
+        self.assertTrue(np.allclose(red.expand(red.z0), self.p0))
+
+        # The Jacobian of the full system is singular, the reduced one is not.
+        x = np.array([0.05, 0.5, 0.05, 0.45, 2.0])
+        z = x[red.free]
+        self.assertTrue(np.allclose(red.expand(z), x))
+        self.assertEqual(np.linalg.matrix_rank(system.dense_jacobian(x)), 2)
+        self.assertEqual(np.linalg.matrix_rank(red.dense_jacobian(z)), 2)
+        # Compare with finite differences.
+        eps = 1e-7
+        fd = np.column_stack([(red(z + eps * e) - red(z - eps * e)) / (2 * eps)
+                              for e in np.eye(len(z))])
+        self.assertTrue(np.allclose(red.dense_jacobian(z), fd, atol = 1e-6))
+
+        time = np.linspace(0, 20, 11)
+        ref = odeint(system, self.p0, time, (None,), atol = 1e-10, rtol = 1e-10).T
+        for method in ('odeint', 'LSODA', 'BDF'):
+            ny = red.integrate(time, method = method, atol = 1e-10, rtol = 1e-10)
+            self.assertTrue(np.allclose(ny, ref, atol = 1e-6))
+
+        with self.assertRaises(ReductionError):
+            ReducedSystem(None, None, (np.array([[2., 2., 0, 0, 0]]), [0]), self.p0)
+
+    def test_odelib(self):
+        time = np.linspace(0, 20, 11)
+        ref = self.RG.compile(self.svars, const = self.const).simulate(self.p0, time)
+        for kwargs in ({}, {'jacobian': True}, {'backend': 'numpy'}):
+            odelib = self.RG.compile(self.svars, const = self.const, reduce = True, **kwargs)
+            self.assertEqual(len(odelib.conservation[0]), 3)
+            for method in ('odeint', 'BDF'):
+                ny = odelib.simulate(self.p0, time, method = method)
+                self.assertTrue(np.allclose(ny, ref, atol = 1e-6))
+                self.assertTrue(np.all(ny[4] == 2.0))
+
+    def test_no_laws(self):
+        RG = ReactionGraph([[['X', 'X'], ['X', 'X', 'X'], 1.0], [['X'], [], 2.0]])
+        odelib = RG.compile(['X'], reduce = True)
+        self.assertEqual(np.shape(odelib.conservation[0]), (0, 1))
+        # X = 2 is unstable, below it X decays.
+        self.assertTrue(np.allclose(odelib.steady_state([1.5]), [0.0]))
+        ny = odelib.simulate([1.0], np.linspace(0, 1, 11))
+        self.assertTrue(np.all(ny[0, 1:] < 1.0))
+
+    def test_constant_species(self):
+        L, pivots = constant_laws([False, True, False, True])
+        self.assertEqual(L.tolist(), [[0, 1, 0, 0], [0, 0, 0, 1]])
+        self.assertEqual(pivots, [1, 3])
+
+        # Constant species are bound to p0, the solver only sees dynamic species.
+        odelib = self.RG.compile(self.svars, const = self.const, jacobian = True)
+        time = np.linspace(0, 20, 11)
+        ny = odelib.simulate(self.p0, time)
+        self.assertEqual(ny.shape, (5, 11))
+        self.assertTrue(np.all(ny[4] == 2.0))
+        system = self.RG.mass_action_system(self.svars, self.const)
+        ref = odeint(system, self.p0, time, (None,)).T
+        self.assertTrue(np.allclose(ny, ref, atol = 1e-6))
+
+        tt, nt = odelib.simulate(self.p0, np.linspace(0, 1e4, 101), 
+                                 stop_at_steady_state = 1e-9, truncate = True)
+        self.assertLess(nt.shape[1], 101)
+        self.assertEqual(len(tt), nt.shape[1])
+        self.assertNotIn(tt[-1], np.linspace(0, 1e4, 101))
+        self.assertTrue(np.all(nt[4] == 2.0))
+        self.assertTrue(np.allclose(nt[:, -1], odelib.steady_state(self.p0), atol = 1e-6))
+
+        # Without crnsimulator (a standalone library) all species are integrated.
+        with mock.patch.dict(sys.modules, {'crnsimulator.reduction': None}):
+            nf = odelib.simulate(self.p0, time)
+        self.assertTrue(np.allclose(nf, ny, atol = 1e-6))
+        self.assertTrue(np.all(nf[4] == 2.0))
+
+        # A sweep over the constant concentration does not regenerate the library.
+        jobs = [(np.array([0.1, 1.0, 0, 0, x]), None) for x in (0.5, 2.0)]
+        result = sweep(odelib.simulate, jobs, time, workers = 1)
+        self.assertTrue(np.allclose(result[1], ny))
+        self.assertTrue(np.all(result[0, 4] == 0.5))
+        self.assertTrue(np.all(result[0, 3, 1:] < result[1, 3, 1:]))
+
+if __name__ == '__main__':
+    unittest.main()
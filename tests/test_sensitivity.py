@@ -0,0 +1,105 @@
+#
+# Unittests for crnsimulator.sensitivity
+#
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from unittest import mock
+from argparse import ArgumentParser
+from scipy.integrate import odeint
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.sensitivity import Sensitivity, SensitivityError, forward_sensitivity
+from crnsimulator.odelib_template import add_integrator_args
+
+class TestSensitivity(unittest.TestCase):
+    def setUp(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.2],
+               [['B', 'C'], ['C', 'C'], 0.4],
+               [['C', 'A'], ['A', 'A'], 0.7],
+               [['A'], [], 0.01]]
+        self.RG = ReactionGraph(crn)
+        self.svars = ['A', 'B', 'C']
+        self.p0 = [1, 0.1, 0.01]
+        self.time = np.linspace(0, 50, 11)
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def finite_differences(self, system, params):
+        fd = []
+        for j in params:
+            h = 1e-6 * system.k[j]
+            kp, km = system.k.copy(), system.k.copy()
+            kp[j] += h
+            km[j] -= h
+            yp = odeint(system, self.p0, self.time, (kp,), atol = 1e-12, rtol = 1e-12)
+            ym = odeint(system, self.p0, self.time, (km,), atol = 1e-12, rtol = 1e-12)
+            fd.append((yp - ym) / (2 * h))
+        return np.stack(fd, axis = 2)
+
+    def test_sensitivity(self):
+        system = self.RG.mass_action_system(self.svars)
+        fd = self.finite_differences(system, range(4))
+        ref = odeint(system, self.p0, self.time, (None,), atol = 1e-10, rtol = 1e-10).T
+        for method in ('odeint', 'LSODA', 'BDF'):
+            ny, sens = forward_sensitivity(system, self.p0, self.time, method = method,
+                                           atol = 1e-10, rtol = 1e-10)
+            self.assertEqual(sens.shape, (11, 3, 4))
+            self.assertTrue(np.allclose(ny, ref, atol = 1e-6))
+            self.assertTrue(np.allclose(sens, fd, atol = 1e-4))
+
+        # A subset of the rates.
+        ny, sens = forward_sensitivity(system, self.p0, self.time, params = ['k2', 'k0'],
+                                       atol = 1e-10, rtol = 1e-10)
+        self.assertTrue(np.allclose(sens, fd[:, :, [2, 0]], atol = 1e-4))
+
+        with self.assertRaises(SensitivityError):
+            Sensitivity(system, self.p0, params = ['k9'])
+
+    def test_jacobian(self):
+        system = self.RG.mass_action_system(self.svars)
+        sens = Sensitivity(system, self.p0, params = ['k1'])
+        y = np.random.default_rng(0).random(6)
+        J = sens.jacobian(y).toarray()
+        self.assertTrue(np.allclose(J[:3, :3], system.dense_jacobian(y[:3])))
+        self.assertTrue(np.allclose(J[3:, 3:], system.dense_jacobian(y[:3])))
+        self.assertTrue(np.all(J[:3, 3:] == 0) and np.all(J[3:, :3] == 0))
+        # The sensitivity block of the RHS: J @ s + S[:, p] * prod(x**R[:, p])
+        x, s = y[:3], y[3:]
+        dv = np.array([0, -1, 1]) * x[1] * x[2]
+        self.assertTrue(np.allclose(sens(y)[3:], system.dense_jacobian(x) @ s + dv))
+
+    def test_odelib(self):
+        odelib = self.RG.compile(self.svars, rate_dict = True)
+        r = dict(odelib.rates, k0 = 0.3)
+        ny, sens = odelib.sensitivity(self.p0, self.time, r, params = ['k0'], atol = 1e-10,
+                                      rtol = 1e-10)
+        system = self.RG.mass_action_system(self.svars)
+        ref = forward_sensitivity(system, self.p0, self.time, r, params = ['k0'], atol = 1e-10,
+                                  rtol = 1e-10)
+        self.assertTrue(np.allclose(sens, ref[1]))
+        ref = odelib.simulate(self.p0, self.time, r, atol = 1e-10, rtol = 1e-10)
+        self.assertTrue(np.allclose(ny, ref, atol = 1e-8))
+
+    def test_integrate(self):
+        odelib = self.RG.compile(self.svars, rate_dict = True)
+        parser = ArgumentParser()
+        add_integrator_args(parser)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = os.path.join(tmpdir, 'sens.npz')
+            args = parser.parse_args(['--p0', 'A=1', 'B=0.1', 'C=0.01', '--t8', '50',
+                                      '--t-lin', '11', '--sensitivity', out,
+                                      '--sensitivity-rates', 'k0', 'k3'])
+            # The results are written to the .npz file, there is nothing to plot.
+            with mock.patch.object(odelib.logger, 'warning') as warning:
+                odelib.integrate(args)
+            warning.assert_not_called()
+            data = np.load(out)
+            self.assertEqual(data['sensitivity'].shape, (11, 3, 2))
+            self.assertEqual(list(data['rates']), ['k0', 'k3'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ from __future__ import unicode_literals
 
 import os
 import unittest
+import numpy as np
 from argparse import ArgumentParser
 
 from crnsimulator import get_integrator
@@ -104,3 +105,146 @@ class testSolver(unittest.TestCase):
              0.06646052036496547,
              0.068597456334669946,
              0.16135065552033576))
+
+    def test_compile_in_memory(self):
+        crn = "2X <=> 3X; X -> [k=0.1]"
+        crn, _ = parse_crn_string(crn, process=True)
+
+        # Split CRN into irreversible reactions
+        new = []
+        for [r, p, k] in crn:
+            if len(k) == 2:
+                new.append([r, p, k[0]])
+                new.append([p, r, k[1]])
+            else:
+                new.append([r, p, k[0]])
+        crn = new
+
+        RG = ReactionGraph(crn)
+
+        self.args.p0 = ['1=0.5']
+        self.args.t_log = 10
+        self.args.t0 = 0.1
+        self.args.t8 = 10
+
+        odelib = RG.compile(jacobian = True)
+        self.assertFalse(os.path.exists(self.filename))
+        self.assertTrue(callable(odelib.odesystem))
+        self.assertTrue(callable(odelib.jacobian))
+        simu = list(odelib.integrate(self.args))
+        self.assertEqual(simu[0], (0.10000000000000001, 0.5))
+        self.assertAlmostEqual(simu[-1][1], 0.88535344232897151, places = 6)
+
+        odelib = RG.compile(backend = 'numpy')
+        simu = list(odelib.integrate(self.args))
+        self.assertEqual(simu[0], (0.10000000000000001, 0.5))
+        self.assertAlmostEqual(simu[-1][1], 0.88535344232897151, places = 6)
+
+        odelib = RG.compile(filename = self.filename)
+        self.assertTrue(os.path.exists(self.filename))
+        integrate = get_integrator(self.filename)
+        self.assertEqual(list(odelib.integrate(self.args)), list(integrate(self.args)))
+
+    def test_zero_jacobian(self):
+        RG = ReactionGraph([[[], ['A'], 1.0], [[], ['B'], 2.0]])
+        for flux in (False, True):
+            odelib = RG.compile(['A', 'B'], jacobian = True, flux = flux)
+            J = odelib.jacobian(np.array([1., 1.]), 0, None)
+            self.assertTrue(np.array_equal(J, np.zeros((2, 2))))
+            ny = odelib.simulate([0, 0], [0, 1])
+            self.assertTrue(np.allclose(ny[:, -1], [1, 2]))
+
+    def test_flux_codegen(self):
+        crn = [[['A', 'B', 'B'], ['C'], 0.3],
+               [['C'], ['A', 'A', 'D'], 1.5],
+               [[], ['B'], 0.01],
+               [['D', 'A'], [], 2],
+               [['B', 'B'], ['B', 'E'], 0.7],
+               [['E'], ['E', 'E'], 1e-3]]
+        RG = ReactionGraph(crn)
+        svars = ['E', 'D', 'C', 'B', 'A']
+        x = np.array([0.3, 0.2, 0.5, 0.1, 1.0])
+        for const in [None, [False, False, True, False, False]]:
+            for rate_dict in [False, True]:
+                ref = RG.compile(svars, const = const, jacobian = True, rate_dict = rate_dict)
+                lib = RG.compile(svars, const = const, jacobian = True, rate_dict = rate_dict,
+                                 flux = True)
+                self.assertTrue(np.allclose(lib.odesystem(x, 0, None), ref.odesystem(x, 0, None)))
+                self.assertTrue(np.allclose(lib.jacobian(x, 0, None), ref.jacobian(x, 0, None)))
+                self.assertEqual(lib.jacobian_sparsity().nnz, ref.jacobian_sparsity().nnz)
+
+        V, M, J, R, F, P = RG._flux_source(svars, None, True, True)
+        self.assertEqual(F[0], '_v0 = k0*A*B**2')
+        self.assertEqual(M[1], '_v1 - _v3')
+        self.assertEqual(M[3], '-2*_v0 + _v2 - _v4')
+        self.assertEqual(P[:2], ['_dv0_4 = k0*B**2', '_dv0_3 = 2*k0*B*A'])
+
+    def test_solver_methods(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.2],
+               [['B', 'C'], ['C', 'C'], 0.4],
+               [['C', 'A'], ['A', 'A'], 0.7],
+               [['A'], [], 0.01]]
+        RG = ReactionGraph(crn)
+
+        self.args.p0 = ['A=0.1', 'B=1e-2', 'C=1e-3']
+        self.args.t8 = 100
+        self.args.t_lin = 5
+
+        odelib = RG.compile(jacobian = True)
+        pattern = odelib.jacobian_sparsity().toarray()
+        self.assertEqual(pattern.tolist(), [[1, 1, 1], [1, 1, 1], [1, 1, 1]])
+
+        ref = np.array(list(odelib.integrate(self.args)))
+        for method in ['LSODA', 'BDF', 'Radau']:
+            self.args.method = method
+            for jac, backend in [(True, 'sympy'), (False, 'sympy'), (False, 'numpy')]:
+                odelib = RG.compile(jacobian = jac, backend = backend)
+                simu = np.array(list(odelib.integrate(self.args)))
+                self.assertTrue(np.allclose(simu, ref, rtol = 1e-3, atol = 1e-9))
+
+        odelib = RG.compile(filename = self.filename)
+        time = np.linspace(0, 100, 5)
+        ny = odelib.simulate([0.1, 1e-2, 1e-3], time, method = 'BDF')
+        self.assertTrue(np.allclose(ny, ref[:, 1:].T, rtol = 1e-3, atol = 1e-9))
+
+    def test_stop_at_steady_state(self):
+        crn = [[['A', 'B'], ['C'], 1.0],
+               [['C'], ['A', 'B'], 0.5]]
+        odelib = ReactionGraph(crn).compile(jacobian = True)
+        time = np.linspace(0, 1000, 101)
+        ref = odelib.simulate([1, 0.5, 0], time)
+
+        ny = odelib.simulate([1, 0.5, 0], time, stop_at_steady_state = 1e-9)
+        self.assertEqual(ny.shape, ref.shape)
+        self.assertTrue(np.allclose(ny, ref, atol = 1e-7))
+        self.assertTrue(np.all(ny[:, -1] == ny[:, -2]))
+
+        tt, nt = odelib.simulate([1, 0.5, 0], time, method = 'BDF', 
+                                 stop_at_steady_state = 1e-9, truncate = True)
+        self.assertLess(nt.shape[1], 10)
+        self.assertEqual(len(tt), nt.shape[1])
+        self.assertTrue(np.allclose(nt[:, :-1], ref[:, :nt.shape[1] - 1], atol = 1e-7))
+        # The state at the stop (between two time points) is the last column.
+        self.assertTrue(time[nt.shape[1] - 2] < tt[-1] < time[nt.shape[1] - 1])
+        self.assertTrue(np.allclose(nt[:, -1], ref[:, -1], atol = 1e-7))
+
+        # The stop is before the first time point after t0.
+        ts, ns = odelib.simulate([1, 0.5, 0], [0, 1e4], stop_at_steady_state = 1e-9,
+                                 truncate = True)
+        self.assertEqual(ns.shape, (3, 2))
+        self.assertTrue(0 < ts[1] < 1e4)
+        self.assertTrue(np.allclose(ns[:, -1], ref[:, -1], atol = 1e-7))
+
+        # Already at steady state.
+        ts, ns = odelib.simulate([0, 0, 0], time, stop_at_steady_state = 1e-9, truncate = True)
+        self.assertEqual(ns.shape, (3, 1))
+        self.assertEqual(list(ts), [0])
+
+        self.args.p0 = ['A=1', 'B=0.5']
+        self.args.t8 = 1000
+        self.args.t_lin = 101
+        self.args.stop_at_steady_state = 1e-9
+        self.args.truncate = True
+        out = list(odelib.integrate(self.args))
+        self.assertEqual(len(out), nt.shape[1])
+        self.assertAlmostEqual(out[-1][0], tt[-1], delta = 1)
@@ -0,0 +1,124 @@
+#
+# Unittests for crnsimulator.steadystate
+#
+
+import unittest
+import numpy as np
+from scipy.integrate import odeint
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.reduction import conservation_laws
+from crnsimulator.steadystate import steady_state, SteadyStateError, _Residual, _newton
+
+class TestSteadyState(unittest.TestCase):
+    def setUp(self):
+        crn = [[['A', 'B'], ['C'], 1.0],
+               [['C'], ['A', 'B'], 0.5],
+               [['C', 'E'], ['D', 'E'], 0.3],
+               [['D'], ['A', 'B'], 0.1]]
+        self.RG = ReactionGraph(crn)
+        self.svars = ['A', 'B', 'C', 'D', 'E']
+        self.const = [False, False, False, False, True]
+        self.p0 = [1, 0.5, 0, 0, 2]
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def test_conservation_laws(self):
+        system = self.RG.mass_action_system(self.svars, self.const)
+        S = system.stoichiometry.toarray()
+        L, pivots = conservation_laws(system.stoichiometry)
+        self.assertTrue(np.array_equal(system.stoichiometry.toarray(), S))
+        self.assertEqual(L.shape, (3, 5))
+        self.assertTrue(np.allclose(L @ system.stoichiometry.toarray(), 0))
+        self.assertTrue(np.allclose(L[:, pivots], np.eye(3)))
+        # The constant species has a trivial conservation law.
+        self.assertIn([0, 0, 0, 0, 1], L.tolist())
+
+        L, pivots = conservation_laws(np.zeros((2, 0)))
+        self.assertEqual(L.tolist(), [[1, 0], [0, 1]])
+        L, pivots = conservation_laws(np.array([[1], [-1]]))
+        self.assertEqual((L.tolist(), pivots), ([[1, 1]], [1]))
+        L, pivots = conservation_laws(np.array([[1, 0], [0, 1]]))
+        self.assertEqual((L.shape, pivots), ((0, 2), []))
+
+    def test_steady_state(self):
+        system = self.RG.mass_action_system(self.svars, self.const)
+        laws = conservation_laws(system.stoichiometry)
+        ref = odeint(system, self.p0, [0, 1e4], (None,), atol = 1e-12, rtol = 1e-12)[-1]
+        for method in ('newton', 'ptc'):
+            x = steady_state(system, system.jacobian, self.p0, laws, method = method)
+            self.assertTrue(np.allclose(x, ref, atol = 1e-9))
+            self.assertTrue(np.allclose(system(x), 0, atol = 1e-12))
+
+        # Newton finds the unstable steady state X = 0, which is rejected,
+        # PTC follows the dynamics.
+        system = ReactionGraph([[['A', 'X'], ['X', 'X'], 1.0],
+                                [['X'], ['A'], 0.3]]).mass_action_system(['A', 'X'])
+        laws = conservation_laws(system.stoichiometry)
+        F = _Residual(system, system.jacobian, np.array([1, 1e-3]), laws)
+        self.assertTrue(np.allclose(_newton(F, np.array([1, 1e-3]), 1e-12, 1e-10, 50),
+                                    [1.001, 0]))
+        self.assertFalse(F.stable(np.array([1.001, 0])))
+        self.assertTrue(F.stable(np.array([0.3, 0.701])))
+        for method in ('newton', 'ptc'):
+            x = steady_state(system, system.jacobian, [1, 1e-3], laws, method = method)
+            self.assertTrue(np.allclose(x, [0.3, 0.701]))
+
+        with self.assertRaises(SteadyStateError):
+            steady_state(system, system.jacobian, [1, 1e-3], laws, method = 'euler')
+
+    def test_roundoff(self):
+        # The residual of the converged state is at round-off, where the
+        # line search of Newton cannot decrease it any further.
+        crn = [[['A', 'B'], ['C'], 2.0],
+               [['C'], ['A', 'B'], 1.0],
+               [['C'], ['D', 'B'], 1.0],
+               [['D'], ['A'], 1.0],
+               [['X'], ['X', 'A'], 1.0],
+               [['A'], [], 1.0]]
+        system = ReactionGraph(crn).mass_action_system(['A', 'B', 'C', 'D', 'X'],
+                                                       [False, False, False, False, True])
+        laws = conservation_laws(system.stoichiometry)
+        p0 = [0, 0.4, 0, 0, 1]
+        ref = odeint(system, p0, [0, 1e4], (None,), atol = 1e-12, rtol = 1e-12)[-1]
+        for method in ('newton', 'ptc'):
+            x = steady_state(system, system.jacobian, p0, laws, method = method)
+            self.assertTrue(np.allclose(x, ref, atol = 1e-9))
+            # Starting from the steady state returns it.
+            self.assertTrue(np.allclose(steady_state(system, system.jacobian, x, laws,
+                                                     method = method), x))
+
+    def test_boundary(self):
+        # Newton overshoots to the boundary state D = 0, which the dynamics
+        # never reach from D(0) > 0.
+        system = ReactionGraph([[['D', 'C'], ['D', 'D'], 1.0],
+                                [['D'], ['C'], 1.0]]).mass_action_system(['C', 'D'])
+        laws = conservation_laws(system.stoichiometry)
+        p0 = [1.9, 0.1]
+        F = _Residual(system, system.jacobian, np.array(p0), laws)
+        self.assertTrue(np.allclose(_newton(F, np.array(p0), 1e-12, 1e-10, 50), [2, 0]))
+        ref = odeint(system, p0, [0, 1e3], (None,), atol = 1e-12, rtol = 1e-12)[-1]
+        self.assertTrue(np.allclose(ref, [1, 1]))
+        for method in ('newton', 'ptc'):
+            x = steady_state(system, system.jacobian, p0, laws, method = method)
+            self.assertTrue(np.allclose(x, ref, atol = 1e-9))
+        # Without the stability test, large systems use PTC.
+        x = steady_state(system, system.jacobian, p0, laws, max_dense = 1)
+        self.assertTrue(np.allclose(x, ref, atol = 1e-9))
+
+    def test_odelib(self):
+        ref = None
+        for kwargs in ({}, {'jacobian': True}, {'backend': 'numpy'}):
+            odelib = self.RG.compile(self.svars, const = self.const, **kwargs)
+            x = odelib.steady_state(self.p0)
+            ref = x if ref is None else ref
+            self.assertTrue(np.allclose(x, ref))
+        self.assertTrue(np.allclose(x[[0, 2, 3]].sum(), 1))
+        self.assertTrue(np.allclose(x, odelib.simulate(self.p0, [0, 1e4])[:, -1], atol = 1e-6))
+        # Rates can be changed as for the simulation.
+        x = odelib.steady_state(self.p0, {'k2': 0})
+        self.assertTrue(np.allclose(x[3], 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#
+# Unittests for crnsimulator.stochastic
+#
+
+import unittest
+import numpy as np
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.stochastic import (IndexedPriorityQueue, StochasticSystem,
+                                     StochasticError, P2Quantile, EnsembleStatistics,
+                                     stochastic_ensemble)
+
+class TestStochastic(unittest.TestCase):
+    def tearDown(self):
+        ReactionNode.rid = 0
+
+    def test_priority_queue(self):
+        rng = np.random.default_rng(0)
+        keys = rng.random(50).tolist()
+        queue = IndexedPriorityQueue(keys)
+        for _ in range(500):
+            i, key = int(rng.integers(50)), float(rng.random())
+            keys[i] = key
+            queue.update(i, key)
+            self.assertEqual(queue.top(), (int(np.argmin(keys)), min(keys)))
+        self.assertEqual(sorted(queue.heap), list(range(50)))
+        self.assertTrue(all(queue.heap[p] == i for i, p in enumerate(queue.pos)))
+
+    def test_dependencies(self):
+        crn = [[['A', 'B'], ['C'], 1],
+               [['C'], ['C', 'D'], 1],
+               [['D'], [], 1],
+               [['B'], ['B'], 1]]
+        system = ReactionGraph(crn).stochastic_system(['A', 'B', 'C', 'D'])
+        self.assertEqual(system.dependencies, [[0, 1, 3], [1, 2], [2], [3]])
+        self.assertEqual(system.propensities([3, 2, 1, 0]).tolist(), [6, 1, 0, 2])
+
+        system = StochasticSystem(['A'], [[[0, 0, 0], [], 0.5]])
+        self.assertEqual(system.propensities([4]).tolist(), [0.5 * 4 * 3 * 2])
+        self.assertEqual(system.propensities([2]).tolist(), [0])
+
+    def test_ssa(self):
+        # Decay: the mean follows the ODE solution.
+        system = StochasticSystem(['A'], [[[0], [], 1.0]])
+        time = [0, 1, 2]
+        ys = np.array([system.ssa([200], time, seed = s)[0] for s in range(300)])
+        self.assertTrue(np.allclose(ys.mean(axis = 0), 200 * np.exp(-np.array(time)), rtol = 0.05))
+        self.assertTrue(np.all(np.diff(ys, axis = 1) <= 0))
+
+        # Birth-death: stationary Poisson distribution with mean 10.
+        system = StochasticSystem(['A', 'X'], [[[1], [0, 1], 10.0], [[0], [], 1.0]],
+                                  const = [False, True])
+        y = system.ssa([0, 1], np.linspace(0, 500, 5001), seed = 1)
+        self.assertTrue(np.all(y[1] == 1))
+        self.assertAlmostEqual(y[0, 100:].mean(), 10, delta = 1)
+        self.assertAlmostEqual(y[0, 100:].var(), 10, delta = 2)
+
+        # Reproducible.
+        a = system.ssa([0, 1], [0, 5, 10], seed = 7)
+        b = system.ssa([0, 1], [0, 5, 10], seed = 7)
+        self.assertTrue(np.array_equal(a, b))
+
+        with self.assertRaises(StochasticError):
+            system.ssa([0, 1], [0, 1e6], seed = 1, max_steps = 100)
+        with self.assertRaises(StochasticError):
+            system.ssa([-1, 1], [0, 1])
+
+    def test_simulate(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.02],
+               [['B'], [], 0.1]]
+        odelib = ReactionGraph(crn).compile(rate_dict = True)
+        time = np.linspace(0, 10, 5)
+        ny = odelib.simulate([100, 5], time, method = 'ssa', seed = 3)
+        self.assertEqual(ny.shape, (2, 5))
+        self.assertEqual(ny[:, 0].tolist(), [100, 5])
+        self.assertTrue(np.array_equal(ny, odelib.simulate([100, 5], time, method = 'ssa', seed = 3)))
+        # The rates can be changed as for the ODE simulation.
+        ny = odelib.simulate([100, 5], time, {'k0': 0, 'k1': 0}, method = 'ssa', seed = 3)
+        self.assertTrue(np.all(ny.T == [100, 5]))
+
+    def test_tau_leap(self):
+        # Dimerization and decay with large counts: close to the exact SSA.
+        system = StochasticSystem(['A', 'B'], [[[0, 0], [1], 1e-5],
+                                               [[1], [0, 0], 0.1],
+                                               [[0], [], 0.01]])
+        self.assertEqual(system.vector_propensities([10, 3], system.k).tolist(),
+                         system.propensities([10, 3]).tolist())
+        time = [0, 5, 20]
+        ref = np.mean([system.ssa([20000, 0], time, seed = s) for s in range(5)], axis = 0)
+        for implicit in (False, True):
+            ys = np.array([system.tau_leap([20000, 0], time, seed = s, implicit = implicit)
+                           for s in range(5)])
+            self.assertTrue(np.all(ys >= 0))
+            self.assertTrue(np.allclose(ys.mean(axis = 0), ref, rtol = 0.02))
+            self.assertTrue(np.array_equal(ys[0], system.tau_leap([20000, 0], time,
+                                                                  seed = 0, implicit = implicit)))
+
+        # Low counts: critical reactions are exact, counts never become negative.
+        system = StochasticSystem(['A'], [[[0], [], 1.0]])
+        time = [0, 1, 2]
+        ys = np.array([system.tau_leap([50], time, seed = s) for s in range(300)])
+        self.assertTrue(np.all(ys >= 0) and np.all(np.diff(ys, axis = 1) <= 0))
+        self.assertTrue(np.allclose(ys.mean(axis = 0), 50 * np.exp(-np.array(time)), rtol = 0.1))
+
+        crn = [[['A', 'B'], ['B', 'B'], 0.02], [['B'], [], 0.1]]
+        odelib = ReactionGraph(crn).compile()
+        ny = odelib.simulate([100, 5], np.linspace(0, 10, 5), method = 'tau-leap', seed = 3)
+        self.assertEqual(ny[:, 0].tolist(), [100, 5])
+
+    def test_statistics(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size = (2000, 2, 3))
+        stats = EnsembleStatistics((2, 3), quantiles = (0.1, 0.5, 0.9))
+        for x in X:
+            stats.update(x)
+        self.assertEqual(stats.count, 2000)
+        self.assertTrue(np.allclose(stats.mean, X.mean(axis = 0)))
+        self.assertTrue(np.allclose(stats.variance, X.var(axis = 0, ddof = 1)))
+        for p, q in stats.quantiles.items():
+            self.assertTrue(np.allclose(q, np.quantile(X, p, axis = 0), atol = 0.1))
+
+        q = P2Quantile(0.5, (1,))
+        for x in [3, 1, 2]:
+            q.update([x])
+        self.assertEqual(q.value.tolist(), [2])
+
+    def test_ensemble(self):
+        crn = [[['A', 'B'], ['B', 'B'], 0.02],
+               [['B'], [], 0.1]]
+        odelib = ReactionGraph(crn).compile()
+        time = np.linspace(0, 10, 5)
+        a = stochastic_ensemble(odelib.simulate, [100, 5], time, 20, seed = 1,
+                                workers = 1, method = 'ssa')
+        b = stochastic_ensemble(odelib.simulate, [100, 5], time, 20, seed = 1,
+                                workers = 2, method = 'ssa')
+        self.assertEqual(a.count, 20)
+        self.assertTrue(np.array_equal(a.mean, b.mean))
+        self.assertTrue(np.array_equal(a.variance, b.variance))
+        self.assertTrue(np.array_equal(a.quantiles[0.5], b.quantiles[0.5]))
+        self.assertEqual(a.mean[:, 0].tolist(), [100, 5])
+        self.assertTrue(np.all(a.variance[:, 0] == 0))
+        self.assertTrue(np.any(a.variance[:, -1] > 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#
+# Unittests for crnsimulator.sweep
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from argparse import ArgumentParser
+
+from crnsimulator.reactiongraph import ReactionGraph, ReactionNode
+from crnsimulator.odelib_template import add_integrator_args
+from crnsimulator import sweep as sweepmodule
+from crnsimulator.sweep import read_sweep_table, sweep_jobs, sweep, fork_map, SweepError
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.table = os.path.join(self.directory, 'sweep.tsv')
+        with open(self.table, 'w') as f:
+            f.write("# A sweep over initial concentrations and rates\n")
+            f.write("A\tk1\n")
+            f.write("0.1\t0.4\n")
+            f.write("0.2\t0.4\n")
+            f.write("0.1\t0.8\n")
+        crn = [[['A', 'B'], ['B', 'B'], 0.2],
+               [['B', 'C'], ['C', 'C'], 0.4],
+               [['C', 'A'], ['A', 'A'], 0.7]]
+        self.RG = ReactionGraph(crn)
+
+    def tearDown(self):
+        ReactionNode.rid = 0
+        shutil.rmtree(self.directory)
+
+    def test_sweep_jobs(self):
+        header, table = read_sweep_table(self.table)
+        self.assertEqual(header, ['A', 'k1'])
+        self.assertEqual(table.shape, (3, 2))
+
+        jobs = sweep_jobs(header, table, ['A', 'B', 'C'], [0, 1e-2, 0],
+                          {'k0': 0.2, 'k1': 0.4, 'k2': 0.7})
+        self.assertEqual(len(jobs), 3)
+        self.assertEqual(list(jobs[1][0]), [0.2, 1e-2, 0])
+        self.assertEqual(jobs[2][1], {'k0': 0.2, 'k1': 0.8, 'k2': 0.7})
+
+        with self.assertRaises(SweepError):
+            sweep_jobs(['X'], table[:, :1], ['A', 'B', 'C'], [0, 0, 0], {})
+
+    def test_fork_map(self):
+        offset = 10 # closures are inherited by the workers
+        square = lambda x: x * x + offset
+        for workers in (1, 2):
+            self.assertEqual(list(fork_map(square, range(5), workers = workers)),
+                             [10, 11, 14, 19, 26])
+            result = fork_map(square, range(5), workers = workers, ordered = False)
+            self.assertEqual(sorted(result), [10, 11, 14, 19, 26])
+            self.assertEqual(sweepmodule._worker, dict())
+
+    def test_sweep(self):
+        odelib = self.RG.compile(rate_dict = True)
+        header, table = read_sweep_table(self.table)
+        jobs = sweep_jobs(header, table, odelib.svars, [0, 1e-2, 1e-3], odelib.rates)
+        time = np.linspace(0, 100, 10)
+
+        ref = np.array([odelib.simulate(p0, time, r) for (p0, r) in jobs])
+        ny1 = sweep(odelib.simulate, jobs, time, workers = 1)
+        self.assertTrue(np.array_equal(ny1, ref))
+        out = os.path.join(self.directory, 'sweep.npy')
+        ny2 = sweep(odelib.simulate, jobs, time, workers = 2, out = out)
+        self.assertTrue(np.allclose(ny2, ref))
+        self.assertTrue(np.allclose(np.load(out), ref))
+        self.assertFalse(np.allclose(ref[0], ref[2]))
+
+    def test_integrate_sweep(self):
+        parser = ArgumentParser()
+        add_integrator_args(parser)
+        out = os.path.join(self.directory, 'sweep.npy')
+        args = parser.parse_args(['--p0', 'B=1e-2', 'C=1e-3', '--t-lin', '10',
+                                  '--sweep', self.table, '--sweep-output', out,
+                                  '--sweep-workers', '2'])
+        for backend in ['sympy', 'numpy']:
+            odelib = self.RG.compile(rate_dict = True, backend = backend)
+            result = odelib.integrate(args)
+            self.assertEqual(result.shape, (3, 3, 10))
+            self.assertTrue(np.allclose(np.load(out), result))
+
+    def test_hardcoded_rates(self):
+        odelib = self.RG.compile()
+        self.assertEqual(odelib.rates, {})
+        parser = ArgumentParser()
+        odelib.add_integrator_args(parser, rate_sweeps = bool(odelib.rates))
+        self.assertNotIn('rates', parser._option_string_actions['--sweep'].help)
+        args = parser.parse_args(['--p0', 'B=1e-2', 'C=1e-3', '--t-lin', '10',
+                                  '--sweep', self.table, '--sweep-workers', '1'])
+        with self.assertRaises(SweepError) as err:
+            odelib.integrate(args)
+        self.assertIn('hard-coded', str(err.exception))
+
+        # Sweeps over initial concentrations do not need rate names.
+        header, table = read_sweep_table(self.table)
+        jobs = sweep_jobs(header[:1], table[:, :1], odelib.svars, [0, 1e-2, 1e-3], odelib.rates)
+        self.assertEqual(jobs[1][1], None)
+        ny = sweep(odelib.simulate, jobs, np.linspace(0, 100, 10), workers = 1)
+        self.assertEqual(ny.shape, (3, 3, 10))
+
+if __name__ == '__main__':
+    unittest.main()